@@ -0,0 +1,329 @@
+"""
+Reader, writer and probe benchmarks on synthetic videos generated with ffmpeg's lavfi sources.
+
+    python benchmark/run_benchmarks.py --out results.json
+    python benchmark/run_benchmarks.py --quick --out quick.json --compare results.json
+
+Videos are generated once in --workdir (testsrc2 + a sine tone, libx264 / aac) and reused by later runs.
+Every case is repeated --repeat times; the median and the minimum are reported, with the peak RSS of
+python and its ffmpeg children during the case.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import threading
+import statistics
+import subprocess as sp
+import numpy as np
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from easy_video import EasyReader
+from easy_video.ffmpeg_infos import ffmpeg_parse_infos, FFMPEG_BINARY
+from easy_video.ffmpeg_writer import FFMPEG_VideoWriter
+
+RESULTS_VERSION = 1
+
+# (width, height), gop (frames), duration (seconds)
+FULL_MATRIX = {
+    "sizes": [(320, 240), (1280, 720), (1920, 1080)],
+    "gops": [12, 250],
+    "durations": [10, 60],
+}
+QUICK_MATRIX = {
+    "sizes": [(320, 240), (1280, 720)],
+    "gops": [30],
+    "durations": [5],
+}
+FPS = 30
+AUDIO_FPS = 44100
+
+class RSSSampler:
+    """Peak RSS (bytes) of this process and its children (ffmpeg), sampled in a background thread."""
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self.process = psutil.Process()
+        self.stopped = threading.Event()
+
+    def sample(self):
+        rss = self.process.memory_info().rss
+        for child in self.process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error: # exited meanwhile
+                pass
+        self.peak = max(self.peak, rss)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+
+def ffmpeg_version():
+    output = sp.run([FFMPEG_BINARY, "-version"], stdout=sp.PIPE, stderr=sp.DEVNULL).stdout
+    return output.decode("utf8", errors="ignore").splitlines()[0] if output else None
+
+def git_commit():
+    try:
+        output = sp.run(
+            ["git", "rev-parse", "HEAD"], stdout=sp.PIPE, stderr=sp.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout
+        return output.decode().strip() or None
+    except OSError:
+        return None
+
+def generate_video(workdir, size, gop, duration, regenerate=False):
+    """testsrc2 video with a 440 Hz stereo tone, reused if it exists"""
+    filename = os.path.join(workdir, "bench_%dx%d_g%d_%ds.mp4" % (size[0], size[1], gop, duration))
+    if os.path.exists(filename) and not regenerate:
+        return filename
+    cmd = [
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc2=size=%dx%d:rate=%d:duration=%d" % (size[0], size[1], FPS, duration),
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=%d:duration=%d" % (AUDIO_FPS, duration),
+        "-c:v", "libx264", "-preset", "veryfast", "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+        "-pix_fmt", "yuv420p", "-c:a", "aac", "-ac", "2", "-shortest", filename + ".tmp.mp4",
+    ]
+    sp.run(cmd, check=True)
+    os.replace(filename + ".tmp.mp4", filename)
+    return filename
+
+def measure(fn, repeat):
+    """Run fn() `repeat` times. fn returns a dict of counts (frames, samples, bytes) of one run."""
+    times, counts, peak_rss = [], {}, 0
+    for _ in range(repeat):
+        with RSSSampler() as sampler:
+            start = time.perf_counter()
+            counts = fn() or {}
+            times.append(time.perf_counter() - start)
+        peak_rss = max(peak_rss, sampler.peak)
+    metrics = {
+        "time_median": statistics.median(times),
+        "time_min": min(times),
+        "peak_rss_mb": peak_rss / 2 ** 20,
+    }
+    for name, count in counts.items():
+        metrics[name] = count
+        # throughput of the median run
+        metrics[name + "_per_sec"] = count / metrics["time_median"] if metrics["time_median"] > 0 else None
+    return metrics
+
+def bench_probe(filename, repeat):
+    results = []
+    for decode_file in (False, True):
+        metrics = measure(lambda: ffmpeg_parse_infos(filename, decode_file=decode_file) and None, repeat)
+        results.append(("probe", {"decode_file": decode_file}, metrics))
+    return results
+
+def bench_decode(filename, size, repeat, chunksize=64):
+    def decode(**kwargs):
+        def run():
+            with EasyReader(filename, **kwargs) as reader:
+                n_frames = sum(len(chunk) for chunk in reader.video_array_chunk_iterator(chunksize=chunksize))
+            return {"frames": n_frames}
+        return run
+
+    half = (size[0] // 2 // 2 * 2, size[1] // 2 // 2 * 2)
+    variants = [
+        {"pixel_format": "rgb24"},
+        {"pixel_format": "rgba"},
+        {"pixel_format": "rgb24", "decode_file": False},
+    ]
+    for resize_algo in ("bicubic", "bilinear", "lanczos", "area"):
+        variants.append({"target_resolution": half, "resize_algo": resize_algo})
+    variants.append({"target_video_fps": FPS // 2})
+    return [("decode", params, measure(decode(**params), repeat)) for params in variants]
+
+def bench_clips(filename, n_frames, repeat, clip_frames=16):
+    """Latency of a clip at several offsets: decoded from the start (get_video_array) or seeked (lazy_video_array)"""
+    results = []
+    for fraction in (0.0, 0.25, 0.5, 0.9):
+        start = int(fraction * max(n_frames - clip_frames, 0))
+
+        def from_start():
+            with EasyReader(filename, decode_file=False) as reader:
+                return {"frames": len(reader.get_video_array(start=start, end=start + clip_frames))}
+
+        def seeked():
+            with EasyReader(filename, decode_file=False) as reader:
+                with reader.lazy_video_array() as frames:
+                    return {"frames": len(frames[start:start + clip_frames])}
+
+        results.append(("clip", {"offset": start, "method": "get_video_array"}, measure(from_start, repeat)))
+        results.append(("clip", {"offset": start, "method": "lazy_video_array"}, measure(seeked, repeat)))
+    return results
+
+def bench_audio_video(filename, repeat, chunksize=64):
+    def paired():
+        with EasyReader(filename, load_video=True, load_audio=True, audio_fps=16000, audio_nchannels=1) as reader:
+            n_frames, n_samples = 0, 0
+            for video_array, audio_array in reader.video_array_audio_array_chunk_iterator(chunksize=chunksize):
+                n_frames += len(video_array)
+                n_samples += len(audio_array)
+        return {"frames": n_frames, "audio_samples": n_samples}
+
+    def audio_only(audio_fps, audio_nchannels, audio_dtype):
+        def run():
+            with EasyReader(
+                filename, load_video=False, load_audio=True,
+                audio_fps=audio_fps, audio_nchannels=audio_nchannels, audio_dtype=audio_dtype,
+            ) as reader:
+                n_samples = sum(len(chunk) for chunk in reader.audio_array_chunk_iterator())
+            return {"audio_samples": n_samples}
+        return run
+
+    results = [("audio_video", {"chunksize": chunksize, "audio_fps": 16000}, measure(paired, repeat))]
+    for audio_fps, audio_nchannels, audio_dtype in ((16000, 1, "float32"), (AUDIO_FPS, 2, "float64")):
+        params = {"audio_fps": audio_fps, "audio_nchannels": audio_nchannels, "audio_dtype": audio_dtype}
+        results.append(("audio", params, measure(audio_only(audio_fps, audio_nchannels, audio_dtype), repeat)))
+    return results
+
+def bench_encode(filename, workdir, repeat, presets, max_frames=300, chunksize=64):
+    """Encode the first max_frames frames. They are decoded once to a raw file and read back one chunk
+    at a time, so only one chunk is in python (300 frames of 1080p would be 1.8GB) and only encoding is timed."""
+    raw_file = os.path.join(workdir, "bench_encode.rgb")
+    with EasyReader(filename, decode_file=False) as reader, open(raw_file, "wb") as f:
+        size = reader.size
+        n_frames = 0
+        for video_array in reader.video_array_chunk_iterator(chunksize=chunksize):
+            video_array = video_array[:max_frames - n_frames]
+            f.write(video_array.tobytes())
+            n_frames += len(video_array)
+            if n_frames == max_frames:
+                break
+    output = os.path.join(workdir, "bench_encode.mp4")
+
+    def encode(preset):
+        def run():
+            buffer = np.empty((chunksize, size[1], size[0], 3), dtype=np.uint8)
+            writer = FFMPEG_VideoWriter(output, size, FPS, preset=preset)
+            with open(raw_file, "rb") as f:
+                while True:
+                    n_read = f.readinto(memoryview(buffer).cast("B")) // buffer[0].nbytes
+                    if n_read == 0:
+                        break
+                    writer.write_frames(buffer[:n_read])
+            writer.close()
+            return {"frames": n_frames}
+        return run
+
+    results = [("encode", {"preset": preset, "codec": "libx264"}, measure(encode(preset), repeat)) for preset in presets]
+    os.remove(raw_file)
+    if os.path.exists(output):
+        os.remove(output)
+    return results
+
+def case_key(result):
+    return (result["benchmark"], result["video"], json.dumps(result["params"], sort_keys=True))
+
+def compare(results, baseline_path):
+    """Print the ratio of the median times to a previous run (> 1: slower than the baseline)"""
+    with open(baseline_path) as f:
+        baseline = {case_key(result): result for result in json.load(f)["results"]}
+    print("\n%-12s %-32s %-56s %10s %10s %7s" % ("benchmark", "video", "params", "base (s)", "now (s)", "ratio"))
+    for result in results:
+        base = baseline.get(case_key(result))
+        if base is None:
+            continue
+        base_time, now_time = base["metrics"]["time_median"], result["metrics"]["time_median"]
+        ratio = now_time / base_time if base_time > 0 else float("nan")
+        print("%-12s %-32s %-56s %10.4f %10.4f %7.2f" % (
+            result["benchmark"], result["video"], json.dumps(result["params"], sort_keys=True)[:56],
+            base_time, now_time, ratio,
+        ))
+
+def parse_size(text):
+    w, h = text.lower().split("x")
+    return (int(w), int(h))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="benchmark_results.json", help="json results")
+    parser.add_argument("--workdir", default=os.path.join(os.path.expanduser("~"), ".cache", "easy_video", "benchmark"), help="generated videos")
+    parser.add_argument("--quick", action="store_true", help="small matrix, one repeat")
+    parser.add_argument("--repeat", type=int, default=None, help="runs per case (default 3, 1 with --quick)")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=None, help="e.g. 320x240 1920x1080")
+    parser.add_argument("--gops", nargs="+", type=int, default=None)
+    parser.add_argument("--durations", nargs="+", type=int, default=None, help="seconds")
+    parser.add_argument("--presets", nargs="+", default=["ultrafast", "veryfast", "medium"], help="libx264 presets to encode with")
+    parser.add_argument("--only", nargs="+", default=None, choices=["probe", "decode", "clip", "audio_video", "encode"])
+    parser.add_argument("--regenerate", action="store_true", help="generate the videos again")
+    parser.add_argument("--compare", default=None, help="json results of a previous run")
+    args = parser.parse_args()
+
+    matrix = QUICK_MATRIX if args.quick else FULL_MATRIX
+    sizes = args.sizes or matrix["sizes"]
+    gops = args.gops or matrix["gops"]
+    durations = args.durations or matrix["durations"]
+    repeat = args.repeat or (1 if args.quick else 3)
+    only = set(args.only) if args.only else {"probe", "decode", "clip", "audio_video", "encode"}
+    os.makedirs(args.workdir, exist_ok=True)
+
+    results = []
+
+    def add(video, cases):
+        for benchmark, params, metrics in cases:
+            result = {"benchmark": benchmark, "video": video, "params": params, "metrics": metrics}
+            results.append(result)
+            print("\033[92m%-12s %-32s %s: %.4f s\033[0m" % (
+                benchmark, video, json.dumps(params, sort_keys=True), metrics["time_median"]
+            ))
+
+    for size in sizes:
+        for gop in gops:
+            for duration in durations:
+                filename = generate_video(args.workdir, size, gop, duration, args.regenerate)
+                video = os.path.basename(filename)
+                n_frames = duration * FPS
+                if "probe" in only:
+                    add(video, bench_probe(filename, repeat))
+                if "decode" in only:
+                    add(video, bench_decode(filename, size, repeat))
+                if "clip" in only:
+                    add(video, bench_clips(filename, n_frames, repeat))
+                if "audio_video" in only:
+                    add(video, bench_audio_video(filename, repeat))
+            # encoding depends on the frame size only
+            if "encode" in only:
+                filename = generate_video(args.workdir, size, gops[0], durations[0], args.regenerate)
+                add("%dx%d" % size, bench_encode(filename, args.workdir, repeat, args.presets))
+
+    output = {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "ffmpeg": ffmpeg_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "memory_gb": psutil.virtual_memory().total / 2 ** 30,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(output, f, indent=1)
+    print("results saved to %s" % args.out)
+
+    if args.compare is not None:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
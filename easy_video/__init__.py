@@ -1,3 +1,16 @@
 from .video_reader import EasyReader
+from .lazy_array import LazyVideoArray
+from .multi_resolution_reader import EasyMultiResolutionReader
+from .memory_input import MemoryInput
+from .concat_reader import EasyConcatReader, probe_clips
+from .manifest import VideoManifest
+from .sync_reader import EasySyncReader
+from .audio_cache import AudioCache
+from .audio_features import AudioFeatureExtractor, mel_filterbank
 from .video_writer import EasyWriter
-from .utils import mp4list, array_video_to_tensor, tensor_video_to_array, resize_video_tensor, centercrop_resize_video_tensor, resize_video_array, centercrop_resize_video_array
\ No newline at end of file
+from .async_reader import AsyncEasyReader
+from .async_writer import AsyncEasyWriter
+from .async_process import set_async_ffmpeg_process_limit
+from .utils import mp4list, wavlist, scan_files, array_video_to_tensor, tensor_video_to_array, resize_video_tensor, centercrop_resize_video_tensor, resize_video_array, centercrop_resize_video_array, resize_video_array_iterator, centercrop_resize_video_array_iterator
+from .stats import ReaderStats, WriterStats, get_global_reader_stats, reset_global_reader_stats, add_reader_stats_hook, remove_reader_stats_hook
+from .governor import set_ffmpeg_process_limit, get_ffmpeg_governor, get_ffmpeg_governor_stats, list_ffmpeg_processes, kill_all_ffmpeg_processes
@@ -0,0 +1,175 @@
+import os
+import signal
+import asyncio
+import subprocess as sp
+from collections import deque
+from .governor import STDERR_RING_BUFFER_LINES
+from .memory_input import MemoryInput, FEED_CHUNK_SIZE
+from .os_dependency import IS_POSIX_OS, cross_platform_popen_params
+
+class AsyncFFMPEGLimiter:
+    """
+    Limit on concurrent ffmpeg processes started by the async readers and writers.
+    The waiting tasks are suspended, no thread is blocked. None means unlimited.
+    The semaphore is created in the running event loop, on first use after `configure`.
+    """
+    def __init__(self, max_processes=None):
+        self.configure(max_processes)
+
+    def configure(self, max_processes=None):
+        assert max_processes is None or max_processes >= 1, "max_processes must be >= 1"
+        self.max_processes = max_processes
+        self.semaphore = None
+
+    async def acquire(self):
+        """return a release function, to call once when the process exited"""
+        if self.max_processes is None:
+            return lambda: None
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_processes)
+        semaphore = self.semaphore
+        await semaphore.acquire()
+        released = []
+
+        def release():
+            if not released:
+                released.append(True)
+                semaphore.release()
+        return release
+
+_LIMITER = AsyncFFMPEGLimiter()
+
+def set_async_ffmpeg_process_limit(max_processes=None):
+    """
+    e.g. 1000 clips read by as many tasks, at most 8 ffmpeg processes at once:
+    set_async_ffmpeg_process_limit(8)
+    """
+    _LIMITER.configure(max_processes)
+
+class AsyncFFMPEGProcess:
+    """
+    An ffmpeg subprocess on asyncio streams, started in a slot of the async limiter.
+    stderr is drained into a bounded ring buffer by a task, a MemoryInput read over stdin is fed by another.
+    """
+    def __init__(self, proc, release, stdin_source=None):
+        self.proc = proc
+        self.release = release
+        self.stderr_lines = deque(maxlen=STDERR_RING_BUFFER_LINES)
+        self.stderr_task = asyncio.ensure_future(self._drain_stderr()) if proc.stderr is not None else None
+        self.feed_task = asyncio.ensure_future(self._feed(stdin_source)) if stdin_source is not None else None
+        self.discard_task = None
+
+    @classmethod
+    async def start(cls, cmd, stdin=sp.DEVNULL, stdout=sp.PIPE, stderr=sp.PIPE, stdin_source=None, limit=1 << 16):
+        """`stdin_source`: a MemoryInput written to stdin (then closed)"""
+        release = await _LIMITER.acquire()
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=sp.PIPE if stdin_source is not None else stdin,
+                stdout=stdout,
+                stderr=stderr,
+                limit=limit,
+                **cross_platform_popen_params({}),
+            )
+        except BaseException:
+            release()
+            raise
+        return cls(proc, release, stdin_source)
+
+    async def _drain_stderr(self):
+        try:
+            while True:
+                line = await self.proc.stderr.readline()
+                if not line:
+                    break
+                self.stderr_lines.append(line.decode("utf8", errors="ignore"))
+        except (OSError, ValueError):
+            pass
+
+    async def _feed(self, source):
+        try:
+            data = source.data if isinstance(source, MemoryInput) else memoryview(source).cast("B")
+            for inx in range(0, len(data), FEED_CHUNK_SIZE):
+                self.proc.stdin.write(data[inx:inx + FEED_CHUNK_SIZE])
+                await self.proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError): # ffmpeg stopped reading, e.g. closed early
+            pass
+        finally:
+            self.proc.stdin.close()
+
+    def stderr_text(self):
+        return "".join(list(self.stderr_lines))
+
+    @property
+    def returncode(self):
+        return self.proc.returncode
+
+    async def read(self, nbytes):
+        """Read nbytes from stdout, fewer at the end of the stream"""
+        try:
+            return await self.proc.stdout.readexactly(nbytes)
+        except asyncio.IncompleteReadError as err:
+            return err.partial
+
+    async def wait(self, timeout=None):
+        """Wait for ffmpeg to exit, kill it after `timeout` seconds (TimeoutError). Then release the slot."""
+        try:
+            try:
+                await asyncio.wait_for(self.proc.wait(), timeout)
+            except asyncio.TimeoutError:
+                self.kill()
+                await self.proc.wait()
+                raise TimeoutError(f"ffmpeg did not finish within {timeout} seconds and was killed.\n\n{self.stderr_text()}")
+        except BaseException:
+            # cancelled while waiting: never leave the process behind
+            self.kill()
+            raise
+        finally:
+            await self._finish_tasks()
+            self.release()
+
+    async def stop(self, timeout=5):
+        """Terminate ffmpeg, kill it if it does not exit within `timeout` seconds, and release the slot."""
+        self.send_signal(signal.SIGTERM)
+        if self.proc.stdout is not None and self.discard_task is None:
+            # the unread output is discarded, so the pipe reaches EOF and wait() returns
+            self.discard_task = asyncio.ensure_future(self._discard_stdout())
+        try:
+            await self.wait(timeout)
+        except TimeoutError:
+            pass
+
+    async def _discard_stdout(self):
+        try:
+            while await self.proc.stdout.read(1 << 20):
+                pass
+        except (OSError, ValueError):
+            pass
+
+    def kill(self):
+        """Kill ffmpeg without waiting (safe outside of the event loop, e.g. in __del__)"""
+        self.send_signal(signal.SIGKILL if IS_POSIX_OS else signal.SIGTERM)
+
+    def send_signal(self, sig):
+        if self.proc.returncode is not None:
+            return
+        try:
+            if IS_POSIX_OS:
+                # not Popen.send_signal: it polls first, and could reap the exit status before asyncio's child watcher
+                os.kill(self.proc.pid, sig)
+            else:
+                self.proc.terminate()
+        except ProcessLookupError:
+            pass
+
+    async def _finish_tasks(self):
+        """Stop feeding stdin, and give the stderr drainer a second to read the last lines"""
+        if self.feed_task is not None and not self.feed_task.done():
+            self.feed_task.cancel()
+        tasks = [task for task in (self.feed_task, self.stderr_task, self.discard_task) if task is not None]
+        if tasks:
+            await asyncio.wait(tasks, timeout=1)
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,334 @@
+import asyncio
+import numpy as np
+from .video_reader import EasyReader, STATE_VERSION, check_file_identity, frame_hash
+from .memory_input import MemoryInput
+from .async_process import AsyncFFMPEGProcess
+
+class AsyncEasyReader:
+    """
+    EasyReader on asyncio subprocess streams: reading a chunk suspends the task instead of blocking the event loop.
+
+    # Example - many videos read concurrently in one event loop, at most 8 ffmpeg processes
+    set_async_ffmpeg_process_limit(8)
+
+    async def read(filename):
+        async with await AsyncEasyReader.open(filename, load_video=True, load_audio=True) as reader:
+            async for video_array, audio_array in reader.video_array_audio_array_chunk_iterator(chunksize=128):
+                ...
+
+    await asyncio.gather(*[read(filename) for filename in filenames])
+
+    Arguments, attributes (video_fps, size, n_frames, audio_fps, infos, ...) and returned arrays are the
+    ones of EasyReader, the methods are coroutines and the iterators are async iterators.
+    Probing the file runs in a thread (`open`), the ffmpeg processes write to asyncio pipes.
+    If a task reading from the reader is cancelled, the position in the stream is lost: the ffmpeg processes
+    are killed, and the next read raises. `close()` (or leaving `async with`) always stops them.
+    """
+    def __init__(self, filename, load_video=True, load_audio=False, **kwargs):
+        # probe and options of a sync reader, without its processes
+        self.reader = EasyReader(filename, load_video=False, load_audio=False, **kwargs)
+        self.load_video = load_video
+        self.load_audio = load_audio
+        if load_video:
+            assert self.reader.video_found, "Video not found"
+        if load_audio:
+            assert self.reader.audio_found, "Audio not found"
+        if load_video and load_audio:
+            self.reader.per_frame_audio_frames = int(self.reader.audio_fps // self.reader.video_fps)
+        self.video_proc = None
+        self.audio_proc = None
+        self.broken = False
+        self.video_position = 0
+        self.audio_position = 0
+        self.last_frame = None
+
+    def __getattr__(self, name):
+        # infos and options of the sync reader
+        if name == "reader":
+            raise AttributeError(name)
+        return getattr(self.reader, name)
+
+    @classmethod
+    async def open(cls, filename, **kwargs):
+        """Probe `filename` in a thread, then start the ffmpeg processes"""
+        reader = await asyncio.to_thread(cls, filename, **kwargs)
+        try:
+            await reader.start()
+        except BaseException:
+            await reader.close()
+            raise
+        return reader
+
+    async def start(self):
+        """Start the ffmpeg processes at the beginning of the file"""
+        self.broken = False
+        self.reader.video_seek_time = None
+        self.reader.audio_seek_sample = 0
+        self.video_position = 0
+        self.audio_position = 0
+        self.last_frame = None
+        if self.load_video and self.video_proc is None:
+            self.video_proc = await self.start_proc(self.reader.video_cmd(), self.reader.filename, self.reader.frame_bytesize)
+        if self.load_audio and self.audio_proc is None:
+            self.audio_proc = await self.start_proc(self.reader.audio_cmd(), self.reader.audiofilename, self.reader.audio_buffersize)
+
+    async def start_proc(self, cmd, source, buffersize):
+        stdin_source = source if isinstance(source, MemoryInput) and source.uses_stdin else None
+        return await AsyncFFMPEGProcess.start(cmd, stdin_source=stdin_source, limit=max(1 << 16, buffersize))
+
+    async def restart(self):
+        self.reader.stats_add("n_restarts", 1)
+        await self.close()
+        await self.start()
+
+    async def read(self, proc, nbytes):
+        """Read from a process, killing the processes if the read is cancelled"""
+        if self.broken:
+            raise RuntimeError("A read was cancelled, the position in the stream is lost: close the reader")
+        try:
+            with self.reader.stats_timer("read_time"):
+                return await proc.read(nbytes)
+        except BaseException:
+            self.broken = True
+            self.kill()
+            raise
+
+    async def get_frames(self, n_frames):
+        """
+        Get n_frames from the video process stdout
+        return a numpy array of shape (n_frames, h, w, depth), (0~255)
+        """
+        if self.video_proc is None:
+            raise Exception("Video not loaded")
+        s = await self.read(self.video_proc, n_frames * self.reader.frame_bytesize)
+        with self.reader.stats_timer("convert_time"):
+            result = np.frombuffer(s, dtype="uint8")
+            result.shape = (len(s) // self.reader.frame_bytesize, self.reader.h, self.reader.w, self.reader.depth)
+        self.reader.stats_add("bytes_read", len(s))
+        self.reader.stats_add("frames_read", result.shape[0])
+        self.video_position += result.shape[0]
+        if result.shape[0] > 0:
+            self.last_frame = result[-1].copy()
+        return result
+
+    async def get_audios(self, audio_n_frames, is_raw_audio=False):
+        """
+        Get audio_n_frames samples from the audio process stdout
+        return a numpy array of shape (n_samples, n_channels), (-1~1)
+        """
+        if self.audio_proc is None:
+            raise Exception("Audio not loaded")
+        sample_nbytes = self.reader.audio_nchannels * self.reader.audio_nbytes
+        s = await self.read(self.audio_proc, int(audio_n_frames * sample_nbytes))
+        self.reader.stats_add("bytes_read", len(s))
+        self.reader.stats_add("audio_frames_read", len(s) // sample_nbytes)
+        self.audio_position += len(s) // sample_nbytes
+        with self.reader.stats_timer("convert_time"):
+            return self.reader.audio_bytes_to_array(s, is_raw_audio=is_raw_audio)
+
+    async def throw_away(self, proc, nbytes):
+        """Throw away nbytes of a process stdout, reading at most ram_memory_max bytes at a time"""
+        self.reader.stats_add("bytes_discarded", nbytes)
+        with self.reader.stats_timer("discard_time"):
+            while nbytes > 0:
+                s = await self.read(proc, min(nbytes, self.reader.ram_memory_max))
+                if not s:
+                    break
+                nbytes -= len(s)
+
+    async def throw_away_video_frames(self, n_frames):
+        self.video_position += n_frames
+        self.last_frame = None
+        await self.throw_away(self.video_proc, n_frames * self.reader.frame_bytesize)
+
+    async def throw_away_audio_per_frames(self, n_frames):
+        audio_n_frames = self.reader.audio_n_frames_by_video_n_frames(n_frames)
+        self.audio_position += audio_n_frames
+        await self.throw_away(self.audio_proc, audio_n_frames * self.reader.audio_nchannels * self.reader.audio_nbytes)
+
+    async def video_array_chunk_iterator(self, chunksize=128, dtype=np.uint8):
+        """
+        Get video frames from the video process stdout
+        return a numpy array of shape (chunksize, h, w, depth), (0~255)
+        """
+        for i in range(self.video_position, self.reader.n_frames, chunksize):
+            array = (await self.get_frames(chunksize)).astype(dtype)
+            if array.shape[0] == 0: # if the last chunk is empty,
+                break
+            yield array
+
+    async def video_array_audio_array_chunk_iterator(self, chunksize=128, dtype=np.uint8):
+        """
+        Get video frames and the audio of the same frames
+        return a numpy array of shape (chunksize, h, w, depth), (0~255), and audio array (audio_fps/video_fps) * chunksize, n_channels, (-1~1)
+        """
+        for i in range(self.video_position, self.reader.n_frames, chunksize):
+            # both pipes are read concurrently
+            video_array, audio_array = await asyncio.gather(
+                self.get_frames(chunksize),
+                self.get_audios(self.reader.audio_n_frames_by_video_n_frames(chunksize)),
+            )
+            if video_array.shape[0] == 0: # if the last chunk is empty,
+                break
+            yield video_array.astype(dtype), audio_array
+
+    async def audio_array_chunk_iterator(self, chunksize=None, is_raw_audio=False):
+        """
+        Get the audio in blocks of `chunksize` samples (default: 10 seconds)
+        return a numpy array of shape (chunksize, n_channels), (-1~1). The last block is shorter.
+        """
+        if chunksize is None:
+            chunksize = int(self.reader.audio_fps * 10)
+        while True:
+            audio_array = await self.get_audios(chunksize, is_raw_audio=is_raw_audio)
+            n_samples = len(audio_array) // self.reader.audio_nchannels if is_raw_audio else len(audio_array)
+            if n_samples == 0:
+                break
+            yield audio_array
+            if n_samples < chunksize:
+                break
+
+    async def goto_frame(self, start):
+        """Move to frame `start`, restarting the processes if it is already passed"""
+        if start < self.video_position:
+            await self.restart()
+        n_frames = start - self.video_position
+        if self.load_video:
+            await self.throw_away_video_frames(n_frames)
+        if self.load_audio:
+            await self.throw_away_audio_per_frames(n_frames)
+
+    async def get_video_array(self, start=0, end=-1):
+        """
+        Get the video frames from start to end (-1: the last frame)
+        return a numpy array of shape (n_frames, h, w, depth), (0~255)
+        """
+        await self.goto_frame(start)
+        end = self.reader.n_frames if end == -1 else end
+        return await self.get_frames(end - start)
+
+    async def get_video_array_audio_array(self, start=0, end=-1):
+        """
+        Get the video frames from start to end (-1: the last frame), and their audio
+        return a numpy array of shape (n_frames, h, w, depth), (0~255), and an audio array (n_samples, n_channels), (-1~1)
+        """
+        await self.goto_frame(start)
+        end = self.reader.n_frames if end == -1 else end
+        # a tuple, like EasyReader.get_video_array_audio_array (gather returns a list)
+        return tuple(await asyncio.gather(
+            self.get_frames(end - start),
+            self.get_audios(self.reader.audio_n_frames_by_video_n_frames(end - start)),
+        ))
+
+    async def get_audio_array(self, is_raw_audio=False):
+        """
+        Get all remaining audio samples from the audio process stdout
+        return a numpy array of shape (n_samples, n_channels), (-1~1)
+        """
+        max_audio_n_frames = (round(self.reader.audio_duration) + 1) * self.reader.audio_fps
+        return await self.get_audios(max_audio_n_frames, is_raw_audio=is_raw_audio)
+
+    def state(self):
+        """Position of the reader, resumed by `AsyncEasyReader.from_state` or `EasyReader.from_state`"""
+        self.reader.video_position = self.video_position
+        self.reader.audio_position = self.audio_position
+        self.reader.last_frame = self.last_frame
+        state = self.reader.state()
+        state["options"].update(load_video=self.load_video, load_audio=self.load_audio)
+        return state
+
+    @classmethod
+    async def from_state(cls, state, check_files=True, **kwargs):
+        """Open a reader at a position saved by `state()`, as EasyReader.from_state"""
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"unsupported state version {state.get('version')}")
+        if check_files:
+            for identity in (state["file"], state["audio_file"]):
+                if identity is not None:
+                    check_file_identity(identity)
+        options = dict(state["options"], **kwargs)
+        if options["target_resolution"] is not None: # json turns tuples into lists
+            options["target_resolution"] = tuple(options["target_resolution"])
+        reader = await asyncio.to_thread(cls, state["file"]["path"], **options)
+        try:
+            await reader.seek(state["video_position"], state["audio_position"], last_frame_hash=state["last_frame_hash"])
+        except BaseException:
+            await reader.close()
+            raise
+        return reader
+
+    async def seek(self, video_position=0, audio_position=0, last_frame_hash=None):
+        """Restart the processes at video frame `video_position` and audio sample `audio_position`, as EasyReader.seek"""
+        self.broken = False
+        if self.load_video:
+            await self.seek_video(video_position, last_frame_hash)
+        if self.load_audio:
+            await self.seek_audio(audio_position)
+
+    async def seek_video(self, position, last_frame_hash=None, use_keyframes=True):
+        if self.video_proc is not None:
+            await self.video_proc.stop(self.reader.close_timeout)
+            self.video_proc = None
+        verify = last_frame_hash is not None and position > 0
+        self.reader.video_seek_time, start = None, 0
+        if verify and use_keyframes:
+            self.reader.video_seek_time, start = await asyncio.to_thread(self.reader.keyframe_seek_point, position - 1)
+        self.video_proc = await self.start_proc(self.reader.video_cmd(), self.reader.filename, self.reader.frame_bytesize)
+        self.video_position = start
+        self.last_frame = None
+        if not verify:
+            await self.throw_away_video_frames(position - start)
+            return
+
+        await self.throw_away_video_frames(position - 1 - start)
+        frame = await self.get_frames(1)
+        if frame.shape[0] == 1 and frame_hash(frame[0]) == last_frame_hash:
+            return
+        if self.reader.video_seek_time is not None:
+            # the seek did not land on the same frames, decode from the start
+            self.reader.stats_add("n_restarts", 1)
+            return await self.seek_video(position, last_frame_hash, use_keyframes=False)
+        raise ValueError(f"{self.reader.filename}: frame {position - 1} differs from the saved state")
+
+    async def seek_audio(self, position):
+        if self.audio_proc is not None:
+            await self.audio_proc.stop(self.reader.close_timeout)
+            self.audio_proc = None
+        self.reader.audio_seek_sample = position
+        self.audio_proc = await self.start_proc(self.reader.audio_cmd(), self.reader.audiofilename, self.reader.audio_buffersize)
+        self.audio_position = position
+
+    def kill(self):
+        for proc in (self.video_proc, self.audio_proc):
+            if proc is not None:
+                proc.kill()
+
+    async def close(self):
+        """Terminate the ffmpeg processes (killed after close_timeout seconds)"""
+        procs = [proc for proc in (self.video_proc, self.audio_proc) if proc is not None]
+        self.video_proc = None
+        self.audio_proc = None
+        if procs:
+            await asyncio.gather(*[proc.stop(self.reader.close_timeout) for proc in procs])
+
+    def stderr_tail(self):
+        """Last lines ffmpeg wrote to stderr, per process."""
+        return {
+            name: proc.stderr_text()
+            for name, proc in (("video", self.video_proc), ("audio", self.audio_proc))
+            if proc is not None
+        }
+
+    def __del__(self):
+        try:
+            self.kill()
+        except Exception:
+            pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        for memory_input in self.reader.memory_inputs:
+            memory_input.close()
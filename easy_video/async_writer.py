@@ -0,0 +1,142 @@
+import io
+import asyncio
+import subprocess as sp
+import numpy as np
+from .ffmpeg_infos import FFMPEG_BINARY
+from .ffmpeg_writer import raw_video_input_params, video_codec_params, output_params, stream_target
+from .async_process import AsyncFFMPEGProcess
+
+class AsyncEasyWriter:
+    """
+    FFMPEG_VideoWriter on asyncio subprocess streams: writing frames suspends the task while ffmpeg catches up.
+
+    # Example - transcode while reading, in one event loop
+    async with await AsyncEasyReader.open("input.mp4") as reader:
+        async with await AsyncEasyWriter.open("output.mp4", size=reader.size, fps=reader.video_fps) as writer:
+            async for video_array in reader.video_array_chunk_iterator(chunksize=128):
+                await writer.write_frames(video_array)
+
+    filename: a path, or None to keep the encoded file in memory (`getvalue()`, needs a streamable `format`).
+    Leaving `async with` normally waits for ffmpeg to finish the file. On an exception or a cancellation,
+    ffmpeg is killed and the file is left incomplete.
+    """
+    def __init__(
+        self,
+        filename,
+        size,
+        fps,
+        codec="libx264",
+        audiofile=None,
+        preset="slow",
+        bitrate=None,
+        threads=None,
+        ffmpeg_params=None,
+        pixel_format="rgb24",
+        close_timeout=None,
+        format=None,
+    ):
+        if stream_target(filename) and filename is not None:
+            raise ValueError("AsyncEasyWriter writes to a path, or to memory with filename=None")
+        self.filename = filename if filename is not None else "<memory>"
+        self.buffer = io.BytesIO() if filename is None else None
+        self.close_timeout = close_timeout
+        self.codec = codec
+        self.cmd = [FFMPEG_BINARY, "-y", "-loglevel", "error"] + raw_video_input_params(size, fps, pixel_format)
+        if audiofile is not None:
+            self.cmd.extend(["-i", audiofile, "-acodec", "aac"])
+        self.cmd.extend(video_codec_params(codec, preset, size, bitrate=bitrate, threads=threads, ffmpeg_params=ffmpeg_params))
+        self.cmd.extend(output_params(filename, format))
+        self.proc = None
+        self.copy_task = None
+
+    @classmethod
+    async def open(cls, filename, size, fps, **kwargs):
+        """Create the writer and start ffmpeg"""
+        writer = cls(filename, size, fps, **kwargs)
+        await writer.start()
+        return writer
+
+    async def start(self):
+        self.proc = await AsyncFFMPEGProcess.start(
+            self.cmd,
+            stdin=sp.PIPE,
+            stdout=sp.PIPE if self.buffer is not None else sp.DEVNULL,
+        )
+        if self.buffer is not None:
+            self.copy_task = asyncio.ensure_future(self._copy_output(self.proc.proc.stdout))
+
+    async def _copy_output(self, stream):
+        while True:
+            data = await stream.read(1 << 20)
+            if not data:
+                break
+            self.buffer.write(data)
+
+    async def write_frames(self, frames_array):
+        """Write (n_frames, h, w, depth) uint8 frames, waiting while the pipe to ffmpeg is full"""
+        if self.proc is None:
+            raise IOError(f"{self.filename}: the writer is closed")
+        proc = self.proc
+        try:
+            proc.proc.stdin.write(memoryview(np.ascontiguousarray(frames_array)).cast("B"))
+            await proc.proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as err:
+            await self.abort()
+            raise IOError(
+                f"{err}\n\nFFMPEG encountered the following error while writing file {self.filename}:\n\n {proc.stderr_text()}"
+            )
+        except BaseException:
+            # cancelled mid-write, the file can't be completed
+            await self.abort()
+            raise
+
+    async def write_frame(self, img_array):
+        """Writes one frame in the file."""
+        await self.write_frames(img_array[None])
+
+    async def close(self):
+        """Close ffmpeg stdin and wait for it to finish the file. IOError if ffmpeg failed."""
+        if self.proc is None:
+            return
+        proc, self.proc = self.proc, None
+        try:
+            proc.proc.stdin.close()
+            await proc.wait(self.close_timeout)
+            if self.copy_task is not None:
+                await self.copy_task
+        except BaseException:
+            if self.copy_task is not None:
+                self.copy_task.cancel()
+            raise
+        if proc.returncode != 0:
+            raise IOError(f"FFMPEG encountered the following error while writing file {self.filename}:\n\n {proc.stderr_text()}")
+
+    async def abort(self):
+        """Kill ffmpeg, leaving the file incomplete"""
+        if self.proc is not None:
+            proc, self.proc = self.proc, None
+            proc.kill()
+            await proc.wait()
+        if self.copy_task is not None:
+            self.copy_task.cancel()
+
+    def getvalue(self):
+        """Encoded bytes of a writer created with filename=None. Call after `close()`."""
+        assert self.buffer is not None, "getvalue() is only available with filename=None"
+        return self.buffer.getvalue()
+
+    def __del__(self):
+        try:
+            if self.proc is not None:
+                self.proc.kill()
+        except Exception:
+            pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.close()
+        else:
+            await self.abort()
@@ -0,0 +1,148 @@
+import os
+import json
+import uuid
+import hashlib
+import subprocess as sp
+import numpy as np
+from .ffmpeg_infos import ffmpeg_parse_infos, cross_platform_popen_params, FFMPEG_BINARY
+from .governor import get_ffmpeg_governor
+from .video_reader import file_identity
+
+def default_audio_cache_dir():
+    """EASY_VIDEO_AUDIO_CACHE, or ~/.cache/easy_video/audio"""
+    return os.environ.get(
+        "EASY_VIDEO_AUDIO_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "easy_video", "audio")
+    )
+
+class AudioCache:
+    """
+    Decode the audio of a file once, and read it at any sample rate and number of channels.
+
+    # Example - 16kHz mono for ASR and 48kHz stereo for another model, one decode
+    cache = AudioCache("/data/audio_cache")
+    cache.prefetch("input.mp4", [(16000, 1), (48000, 2)]) # optional: every variant from one ffmpeg process
+    audio_16k = cache.get_audio_array("input.mp4", audio_fps=16000, audio_nchannels=1) # (n_samples, 1), (-1~1)
+    audio_48k = cache.get_audio_array("input.mp4", audio_fps=48000, audio_nchannels=2)
+
+    The samples are stored as raw float32 files, named after the identity of the source file (path, size, mtime),
+    so a file changed on disk gets a new entry. Arrays are returned as read-only memory maps.
+    The audio is decoded once at its native rate. Other variants are resampled by ffmpeg from the cached
+    samples (no decode), and cached as well.
+    """
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir if cache_dir is not None else default_audio_cache_dir()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, filename):
+        identity = file_identity(filename)
+        return hashlib.blake2b(json.dumps(identity, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+    def meta_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def samples_path(self, key, audio_fps, audio_nchannels):
+        return os.path.join(self.cache_dir, f"{key}_{int(audio_fps)}_{int(audio_nchannels)}.f32")
+
+    def load_meta(self, key):
+        try:
+            with open(self.meta_path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def get_audio_array(self, filename, audio_fps=None, audio_nchannels=None):
+        """
+        Audio of `filename` at audio_fps / audio_nchannels (default: native), decoded on the first call.
+        return a read-only float32 memory map of shape (n_samples, n_channels), (-1~1)
+        """
+        key = self.key(filename)
+        meta = self.load_meta(key)
+        if meta is None:
+            meta = self.prefetch(filename, [(audio_fps, audio_nchannels)])
+        audio_fps = audio_fps if audio_fps is not None else meta["audio_fps"]
+        audio_nchannels = audio_nchannels if audio_nchannels is not None else meta["audio_nchannels"]
+
+        path = self.samples_path(key, audio_fps, audio_nchannels)
+        if not os.path.exists(path):
+            self.prefetch(filename, [(audio_fps, audio_nchannels)])
+        if os.path.getsize(path) == 0:
+            return np.zeros((0, audio_nchannels), dtype=np.float32)
+        return np.memmap(path, dtype=np.float32, mode="r").reshape(-1, audio_nchannels)
+
+    def prefetch(self, filename, variants=()):
+        """
+        Cache the native audio and the (audio_fps, audio_nchannels) `variants` of `filename` with one ffmpeg process:
+        it decodes the file if the native audio is not cached yet, and reads the cached samples otherwise.
+        return the metadata of the entry (native audio_fps and audio_nchannels)
+        """
+        key = self.key(filename)
+        meta = self.load_meta(key)
+        if meta is None:
+            infos = ffmpeg_parse_infos(filename, decode_file=False)
+            if not infos["audio_found"]:
+                raise ValueError(f"{filename} has no audio")
+            meta = {
+                "identity": file_identity(filename),
+                "audio_fps": infos["audio_fps"],
+                "audio_nchannels": infos.get("audio_nchannels") or 2,
+                "audio_channel_layout": infos.get("audio_channel_layout") if infos.get("audio_nchannels") else None,
+            }
+            native = (meta["audio_fps"], meta["audio_nchannels"])
+            source = ["-i", filename, "-vn"]
+        else:
+            native = (meta["audio_fps"], meta["audio_nchannels"])
+            # the layout of the source, so channels are mixed as when decoding the file
+            layout = ["-ch_layout", meta["audio_channel_layout"]] if meta.get("audio_channel_layout") else []
+            source = (
+                ["-f", "f32le", "-ar", "%d" % native[0], "-ac", "%d" % native[1]]
+                + layout
+                + ["-i", self.samples_path(key, *native)]
+            )
+
+        outputs = [native] if not os.path.exists(self.samples_path(key, *native)) else []
+        for audio_fps, audio_nchannels in variants:
+            variant = (audio_fps or native[0], audio_nchannels or native[1])
+            if variant not in outputs and not os.path.exists(self.samples_path(key, *variant)):
+                outputs.append(variant)
+        if outputs:
+            self.run_ffmpeg(key, source, outputs)
+        if self.load_meta(key) is None:
+            with open(self.meta_path(key) + ".tmp", "w") as f:
+                json.dump(meta, f)
+            os.replace(self.meta_path(key) + ".tmp", self.meta_path(key))
+        return meta
+
+    def run_ffmpeg(self, key, source, outputs):
+        """One ffmpeg process writing every (audio_fps, audio_nchannels) of `outputs` as raw float32 files"""
+        # converted in the graph, so the downmix is normalized like the s16 output of EasyReader
+        # (float output is not normalized by default)
+        n = len(outputs)
+        graph = ["[0:a:0]asplit=%d%s" % (n, "".join("[s%d]" % inx for inx in range(n)))]
+        for inx, (audio_fps, audio_nchannels) in enumerate(outputs):
+            graph.append(
+                "[s%d]aresample=%d:rematrix_maxval=1,aformat=sample_fmts=flt:channel_layouts=%dc[a%d]"
+                % (inx, audio_fps, audio_nchannels, inx)
+            )
+        tmp_paths = [self.samples_path(key, *output) + ".%s.tmp" % uuid.uuid4().hex for output in outputs]
+
+        cmd = [FFMPEG_BINARY, "-y", "-loglevel", "error"] + source + ["-filter_complex", ";".join(graph)]
+        for inx, tmp_path in enumerate(tmp_paths):
+            cmd += ["-map", "[a%d]" % inx, "-f", "f32le", "-acodec", "pcm_f32le", tmp_path]
+        popen_params = cross_platform_popen_params(
+            {"stdout": sp.DEVNULL, "stderr": sp.PIPE, "stdin": sp.DEVNULL}
+        )
+        proc, _, error = get_ffmpeg_governor().communicate(cmd, popen_params)
+        if proc.returncode != 0:
+            for tmp_path in tmp_paths:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            raise IOError(f"Error caching the audio:\n\n{error.decode('utf8', errors='ignore')}")
+        # renamed when complete, so readers never see a partial file
+        for output, tmp_path in zip(outputs, tmp_paths):
+            os.replace(tmp_path, self.samples_path(key, *output))
+
+    def clear(self):
+        """Remove every cached file"""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith((".f32", ".json", ".tmp")):
+                os.remove(os.path.join(self.cache_dir, name))
@@ -0,0 +1,153 @@
+import numpy as np
+
+def hz_to_mel(frequencies):
+    """Slaney mel scale: linear below 1 kHz, logarithmic above (as librosa's default)"""
+    frequencies = np.asanyarray(frequencies, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    logstep = np.log(6.4) / 27.0
+    return np.where(
+        frequencies >= min_log_hz,
+        min_log_hz / f_sp + np.log(np.maximum(frequencies, min_log_hz) / min_log_hz) / logstep,
+        frequencies / f_sp,
+    )
+
+def mel_to_hz(mels):
+    mels = np.asanyarray(mels, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    return np.where(mels >= min_log_mel, min_log_hz * np.exp(logstep * (mels - min_log_mel)), f_sp * mels)
+
+def mel_filterbank(audio_fps, n_fft, n_mels=80, fmin=0.0, fmax=None):
+    """Triangular mel filters with slaney area normalization, shape (n_mels, n_fft // 2 + 1)"""
+    fmax = fmax if fmax is not None else audio_fps / 2
+    fft_frequencies = np.linspace(0, audio_fps / 2, 1 + n_fft // 2)
+    mel_frequencies = mel_to_hz(np.linspace(hz_to_mel(fmin), hz_to_mel(fmax), n_mels + 2))
+    fdiff = np.diff(mel_frequencies)
+    ramps = mel_frequencies[:, None] - fft_frequencies[None, :]
+    lower = -ramps[:-2] / fdiff[:-1, None]
+    upper = ramps[2:] / fdiff[1:, None]
+    weights = np.maximum(0, np.minimum(lower, upper))
+    weights *= (2.0 / (mel_frequencies[2:n_mels + 2] - mel_frequencies[:n_mels]))[:, None]
+    return weights.astype(np.float32)
+
+class AudioFeatureExtractor:
+    """
+    Streaming STFT / (log-)mel features, aligned to video frames.
+
+    # Example - 4 log-mel frames per video frame, fed chunk by chunk
+    extractor = AudioFeatureExtractor(audio_fps=16000, video_fps=25, features_per_frame=4, n_mels=80)
+    for audio_array in reader.audio_array_chunk_iterator():
+        features = extractor.push(audio_array) # (n_features, 80), every feature whose window is complete
+    features = extractor.flush() # the last ones, zero padded
+
+    Feature j is centered on audio sample round(j * audio_fps / (video_fps * features_per_frame)),
+    so feature j * features_per_frame is centered on the timestamp of video frame j, without drift
+    (even when audio_fps / video_fps is not an integer, e.g. 29.97 fps). The window is zero padded
+    before the start of the audio. Pushed samples are kept only until no window needs them anymore,
+    and every feature is computed once, in one vectorized pass per push.
+    Multichannel audio is averaged to mono.
+
+    - win_length: window (hann) in samples, default 25 ms. n_fft: fft size, default win_length.
+    - mel: mel filterbank (n_mels bands, slaney scale) on the power spectrum, otherwise the spectrum (n_fft // 2 + 1 bins).
+    - log: log(x + log_offset). power: 2 for power, 1 for magnitude.
+    """
+    def __init__(
+            self,
+            audio_fps,
+            video_fps,
+            features_per_frame=1,
+            win_length=None,
+            n_fft=None,
+            n_mels=80,
+            fmin=0.0,
+            fmax=None,
+            mel=True,
+            log=True,
+            power=2.0,
+            log_offset=1e-6,
+        ):
+        self.audio_fps = audio_fps
+        self.video_fps = video_fps
+        self.features_per_frame = features_per_frame
+        self.win_length = win_length if win_length is not None else int(round(0.025 * audio_fps))
+        self.n_fft = n_fft if n_fft is not None else self.win_length
+        assert self.n_fft >= self.win_length, "n_fft must be >= win_length"
+        # periodic hann window, centered in n_fft
+        window = np.hanning(self.win_length + 1)[:-1]
+        pad = (self.n_fft - self.win_length) // 2
+        self.window = np.pad(window, (pad, self.n_fft - self.win_length - pad)).astype(np.float32)
+        self.mel_basis = mel_filterbank(audio_fps, self.n_fft, n_mels, fmin, fmax) if mel else None
+        self.log = log
+        self.power = power
+        self.log_offset = log_offset
+        self.n_features = n_mels if mel else self.n_fft // 2 + 1
+        self.reset()
+
+    def reset(self):
+        """Forget the pushed audio, the next push starts at sample 0"""
+        self.half = self.n_fft // 2
+        # samples from absolute index buffer_start, starting with the zero padding of the first windows
+        self.buffer = np.zeros(self.half, dtype=np.float32)
+        self.buffer_start = -self.half
+        self.n_samples = 0
+        self.next_feature = 0
+
+    def feature_centers(self, indices):
+        """audio sample on which features `indices` are centered"""
+        return np.round(np.asarray(indices) * (self.audio_fps / (self.video_fps * self.features_per_frame))).astype(np.int64)
+
+    def push(self, audio_array):
+        """
+        Add (n_samples,) or (n_samples, n_channels) audio following the previous pushes.
+        return the features (n, n_features) whose windows are complete, in order.
+        """
+        audio_array = np.asarray(audio_array, dtype=np.float32)
+        if audio_array.ndim == 2:
+            audio_array = audio_array.mean(axis=1, dtype=np.float32)
+        self.buffer = np.concatenate([self.buffer, audio_array])
+        self.n_samples += len(audio_array)
+        return self.compute(self.n_samples)
+
+    def flush(self):
+        """
+        Features centered on the remaining pushed samples, with the windows zero padded after the end.
+        This ends the stream, `reset()` before pushing another one.
+        """
+        self.buffer = np.concatenate([self.buffer, np.zeros(self.n_fft, dtype=np.float32)])
+        return self.compute(self.n_samples + self.n_fft, max_center=self.n_samples)
+
+    def compute(self, buffer_end, max_center=None):
+        """Features of every window ending before sample `buffer_end` (and centered before max_center)"""
+        step = self.audio_fps / (self.video_fps * self.features_per_frame)
+        # candidates: a few more than the estimate, filtered exactly below
+        last = int((buffer_end - self.n_fft + self.half) / step) + 2
+        indices = np.arange(self.next_feature, max(last, self.next_feature))
+        centers = self.feature_centers(indices)
+        keep = centers - self.half + self.n_fft <= buffer_end
+        if max_center is not None:
+            keep &= centers < max_center
+        centers = centers[keep]
+        if len(centers) == 0:
+            return np.zeros((0, self.n_features), dtype=np.float32)
+        self.next_feature += len(centers)
+
+        # (n, n_fft) windows gathered from the buffer
+        starts = centers - self.half - self.buffer_start
+        frames = self.buffer[starts[:, None] + np.arange(self.n_fft)[None, :]]
+        frames *= self.window
+        spectrum = np.abs(np.fft.rfft(frames, axis=1)).astype(np.float32)
+        if self.power != 1:
+            spectrum **= self.power
+        features = spectrum @ self.mel_basis.T if self.mel_basis is not None else spectrum
+        if self.log:
+            np.log(features + self.log_offset, out=features)
+
+        # drop the samples no window needs anymore
+        next_start = int(self.feature_centers(self.next_feature)) - self.half
+        drop = min(max(next_start - self.buffer_start, 0), len(self.buffer))
+        self.buffer = self.buffer[drop:]
+        self.buffer_start += drop
+        return features
@@ -0,0 +1,296 @@
+"""
+easy-video: batch operations over video folders.
+
+# Example
+easy-video extract-audio videos/ --out-dir audios/ --workers 4
+easy-video combine videos/ --audio-dir audios/ --out-dir combined/
+easy-video transcode videos/ --out-dir videos_256/ --target-resolution 256 256 --centercrop --workers 4
+
+Inputs are files or folders (searched with `scan_files`, the relative paths are kept in --out-dir).
+Every finished job is appended to a journal (--journal, default <out-dir>/.easy_video_journal.jsonl):
+a new run skips the jobs done with the same source file and options, and the outputs newer than their sources.
+Outputs are written in a hidden .easy_video_partial folder next to them and moved when complete, an interrupted job leaves no output.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .video_writer import EasyWriter
+from .utils import scan_files
+
+JOURNAL_NAME = ".easy_video_journal.jsonl"
+# hidden folder of the outputs being written: not listed by scan_files, even if a killed run leaves files in it
+PARTIAL_DIR = ".easy_video_partial"
+
+def source_stamp(filename):
+    """(size, mtime_ns) of a file, what the journal compares to know if a source changed"""
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def partial_filename(filename):
+    """filename in the hidden PARTIAL_DIR next to it, with the same extension (ffmpeg picks the format from it)"""
+    file_dir, file_name = os.path.split(filename)
+    return os.path.join(file_dir, PARTIAL_DIR, file_name)
+
+def remove_partial_dirs(jobs):
+    """Remove the empty PARTIAL_DIRs of the outputs of jobs"""
+    for partial_dir in {os.path.dirname(partial_filename(job["dst"])) for job in jobs}:
+        try:
+            os.rmdir(partial_dir)
+        except OSError: # missing, or files of a job still running
+            pass
+
+class JobJournal:
+    """
+    Append-only jsonl of finished jobs ({"key", "status", "sources", "params", "time", "error"}),
+    one line per job, flushed when written, so a killed run loses at most the running jobs.
+    The last line of a key wins.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError: # line cut by a kill
+                        continue
+                    self.records[record["key"]] = record
+        journal_dir = os.path.dirname(path)
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+        self.file = open(path, "a")
+
+    def is_done(self, job):
+        record = self.records.get(job["key"])
+        return (
+            record is not None
+            and record["status"] == "done"
+            and record["params"] == job["params"]
+            and record["sources"] == [source_stamp(src) for src in job["sources"]]
+            and os.path.exists(job["dst"])
+        )
+
+    def params_changed(self, job):
+        record = self.records.get(job["key"])
+        return record is not None and record["params"] != job["params"]
+
+    def write(self, record):
+        with self.lock:
+            self.records[record["key"]] = record
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+def is_up_to_date(job):
+    """The output exists and is newer than all the sources"""
+    if not os.path.exists(job["dst"]):
+        return False
+    dst_mtime = os.stat(job["dst"]).st_mtime_ns
+    return all(os.stat(src).st_mtime_ns <= dst_mtime for src in job["sources"])
+
+def find_inputs(inputs, exts):
+    """(file, input root) of the input files and of the files in the input folders"""
+    found = []
+    for path in inputs:
+        if os.path.isdir(path):
+            found.extend((filename, path) for filename in scan_files(path, exts=exts, sort=True))
+        elif os.path.isfile(path):
+            found.append((path, os.path.dirname(path)))
+        else:
+            raise FileNotFoundError(path)
+    return found
+
+def output_filename(src, root, args, ext):
+    """src with the extension ext, in --out-dir (keeping the path relative to its input folder) or next to it"""
+    rel = os.path.relpath(src, root) if args.out_dir is not None else src
+    dst = os.path.splitext(rel)[0] + args.suffix + ext
+    return os.path.join(args.out_dir, dst) if args.out_dir is not None else dst
+
+def build_jobs(args):
+    jobs = []
+    for src, root in find_inputs(args.inputs, args.ext):
+        if args.command == "extract-audio":
+            dst = output_filename(src, root, args, ".wav")
+            sources = [src]
+            params = {"audio_fps": args.audio_fps, "audio_nchannels": args.audio_nchannels}
+        elif args.command == "combine":
+            audio_root = args.audio_dir if args.audio_dir is not None else root
+            audio_file = os.path.join(audio_root, os.path.splitext(os.path.relpath(src, root))[0] + "." + args.audio_ext.lstrip("."))
+            dst = output_filename(src, root, args, os.path.splitext(src)[1])
+            sources = [src, audio_file]
+            params = {}
+        else:
+            dst = output_filename(src, root, args, "." + args.format.lstrip(".") if args.format else os.path.splitext(src)[1])
+            sources = [src]
+            params = {
+                "target_resolution": args.target_resolution,
+                "target_video_fps": args.target_video_fps,
+                "resize_algo": args.resize_algo,
+                "centercrop": args.centercrop,
+                "video_codec": args.video_codec,
+                "preset": args.preset,
+                "bitrate": args.bitrate,
+                "audio_codec": args.audio_codec,
+            }
+        if any(os.path.abspath(dst) == os.path.abspath(source) for source in sources):
+            raise ValueError(f"{dst} would overwrite its source, use --out-dir or --suffix")
+        jobs.append({
+            "key": f"{args.command}:{os.path.abspath(src)}->{os.path.abspath(dst)}",
+            "command": args.command,
+            "src": src,
+            "dst": dst,
+            "sources": sources,
+            "params": params,
+        })
+    return jobs
+
+def run_job(job, threads=None):
+    """Run one job into a temporary file and rename it to the output. Returns (time, error or None)."""
+    start = time.perf_counter()
+    try:
+        execute_job(job, threads)
+    except Exception as err:
+        return time.perf_counter() - start, f"{type(err).__name__}: {err}"
+    return time.perf_counter() - start, None
+
+def execute_job(job, threads=None):
+    for source in job["sources"]:
+        if not os.path.exists(source):
+            raise FileNotFoundError(source)
+    partial = partial_filename(job["dst"])
+    os.makedirs(os.path.dirname(partial), exist_ok=True)
+    params = job["params"]
+    try:
+        if job["command"] == "extract-audio":
+            EasyWriter.extract_audio(job["src"], partial, silent=True, **params)
+        elif job["command"] == "combine":
+            EasyWriter.combine_video_audio(job["sources"][0], job["sources"][1], partial, silent=True)
+        else:
+            EasyWriter.transcode(job["src"], partial, threads=threads, silent=True, **params)
+        os.replace(partial, job["dst"])
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+def print_summary(results, n_skipped, total_time):
+    done = [result for result in results if result["status"] == "done"]
+    failed = [result for result in results if result["status"] == "failed"]
+    print(f"\033[92m {len(done)} done, {n_skipped} skipped, {len(failed)} failed in {total_time:.1f}s \033[0m")
+    if done:
+        times = sorted(result["time"] for result in done)
+        slowest = max(done, key=lambda result: result["time"])
+        print(
+            f"\033[92m job time: mean {sum(times) / len(times):.2f}s, median {times[len(times) // 2]:.2f}s, "
+            f"max {slowest['time']:.2f}s ({slowest['src']}) \033[0m"
+        )
+    for result in failed:
+        error = result["error"].strip().splitlines()
+        print(f"\033[91m FAILED {result['src']} ({result['time']:.2f}s): {error[-1] if error else ''} \033[0m")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="easy-video", description="Batch operations over video folders.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("inputs", nargs="+", help="video files or folders (searched with scan_files)")
+    common.add_argument("--ext", nargs="+", default=["mp4"], help="extensions searched in the folders (default: mp4)")
+    common.add_argument("--out-dir", default=None, help="output folder, default next to the inputs")
+    common.add_argument("--suffix", default="", help="added to the output file names")
+    common.add_argument("--workers", type=int, default=1, help="jobs run at once (default: 1)")
+    common.add_argument("--threads", type=int, default=None, help="ffmpeg threads per job (default: cpu count / workers)")
+    common.add_argument("--journal", default=None, help=f"job journal, default <out-dir>/{JOURNAL_NAME}")
+    common.add_argument("--force", action="store_true", help="run the jobs already done or up to date")
+    common.add_argument("--dry-run", action="store_true", help="print the jobs to run and exit")
+
+    extract = subparsers.add_parser("extract-audio", parents=[common], help="EasyWriter.extract_audio, to .wav")
+    extract.add_argument("--audio-fps", type=int, default=None, help="default the source rate")
+    extract.add_argument("--audio-nchannels", type=int, default=2)
+
+    combine = subparsers.add_parser("combine", parents=[common], help="EasyWriter.combine_video_audio")
+    combine.add_argument("--audio-dir", default=None, help="folder of the audio files (same relative paths), default next to the videos")
+    combine.add_argument("--audio-ext", default="wav")
+
+    transcode = subparsers.add_parser("transcode", parents=[common], help="EasyWriter.transcode (resize / fps / centercrop)")
+    transcode.add_argument("--target-resolution", type=int, nargs=2, default=None, metavar=("W", "H"), help="-1 keeps the aspect ratio")
+    transcode.add_argument("--target-video-fps", type=float, default=None)
+    transcode.add_argument("--resize-algo", default="bicubic")
+    transcode.add_argument("--centercrop", action="store_true")
+    transcode.add_argument("--video-codec", default="libx264")
+    transcode.add_argument("--preset", default="slow")
+    transcode.add_argument("--bitrate", default=None)
+    transcode.add_argument("--audio-codec", default="aac")
+    transcode.add_argument("--format", default=None, help="output extension, default the input one")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        jobs = build_jobs(args)
+    except (ValueError, FileNotFoundError) as err:
+        print(f"\033[91m {err} \033[0m")
+        return 2
+    journal_path = args.journal or os.path.join(args.out_dir or ".", JOURNAL_NAME)
+    journal = JobJournal(journal_path)
+
+    to_run = []
+    n_skipped = 0
+    for job in jobs:
+        if not args.force and (journal.is_done(job) or (not journal.params_changed(job) and is_up_to_date(job))):
+            n_skipped += 1
+        else:
+            to_run.append(job)
+    print(f"\033[92m {len(jobs)} jobs: {len(to_run)} to run, {n_skipped} done or up to date \033[0m")
+    if args.dry_run:
+        for job in to_run:
+            print(f" {job['src']} -> {job['dst']}")
+        journal.close()
+        return 0
+
+    workers = max(args.workers, 1)
+    threads = args.threads
+    if threads is None and workers > 1:
+        threads = max((os.cpu_count() or 1) // workers, 1)
+
+    results = []
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(run_job, job, threads): job for job in to_run}
+        for inx, future in enumerate(as_completed(futures)):
+            job = futures[future]
+            job_time, error = future.result()
+            result = {
+                "key": job["key"], "src": job["src"], "dst": job["dst"], "params": job["params"],
+                "status": "done" if error is None else "failed", "time": job_time, "error": error,
+            }
+            if error is None:
+                print(f"\033[92m [{inx + 1}/{len(to_run)}] {job['src']} -> {job['dst']} ({job_time:.2f}s) \033[0m")
+            else:
+                print(f"\033[91m [{inx + 1}/{len(to_run)}] FAILED {job['src']} ({job_time:.2f}s) \033[0m")
+            # identity of the sources when the job ran, a source changed since then is run again
+            result["sources"] = [source_stamp(src) if os.path.exists(src) else None for src in job["sources"]]
+            journal.write(result)
+            results.append(result)
+    except KeyboardInterrupt:
+        print("\033[91m Interrupted, the finished jobs are in the journal, run the same command to resume \033[0m")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        executor.shutdown(wait=True)
+        journal.close()
+        remove_partial_dirs(to_run)
+        print_summary(results, n_skipped, time.perf_counter() - start)
+    return 1 if any(result["status"] == "failed" for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+import os
+import re
+import tempfile
+import time
+import warnings
+import subprocess as sp
+from contextlib import nullcontext
+import numpy as np
+from .ffmpeg_infos import FFmpegInfosParser, cross_platform_popen_params, FFMPEG_BINARY
+from .ffmpeg_reader import compute_target_size
+from .video_reader import EasyReader
+from .governor import get_ffmpeg_governor
+from .stats import ReaderStats, get_global_reader_stats, emit_reader_stats
+
+def probe_clips(filenames, batch_size=64):
+    """
+    Probe many files with one ffmpeg process per `batch_size` files, without decoding.
+    Returns one dict per file with
+      - n_frames: exact number of video frames (video packets, counted by stream copy)
+      - size, fps, codec_name, pix_fmt, rotation: of the first video stream
+    or None if the file can't be read or has no video.
+    """
+    infos = []
+    for start in range(0, len(filenames), batch_size):
+        infos.extend(_probe_batch(filenames[start:start + batch_size]))
+    return infos
+
+def _probe_batch(filenames):
+    cmd = [FFMPEG_BINARY, "-hide_banner"]
+    for filename in filenames:
+        cmd.extend(["-i", filename])
+    for inx in range(len(filenames)):
+        cmd.extend(["-map", "%d:v:0?" % inx])
+    cmd.extend(["-c", "copy", "-f", "framecrc", "-"])
+
+    popen_params = cross_platform_popen_params(
+        {"stdout": sp.PIPE, "stderr": sp.PIPE, "stdin": sp.DEVNULL}
+    )
+    proc, output, error = get_ffmpeg_governor().communicate(cmd, popen_params, probe=True)
+    if proc.returncode != 0:
+        if len(filenames) == 1:
+            return [None]
+        # a single bad file fails the whole batch, probe them one by one
+        return [_probe_batch([filename])[0] for filename in filenames]
+
+    text = error.decode("utf8", errors="ignore")
+    # output stream -> input file, from "Stream #3:0 -> #0:2 (copy)"
+    output_to_input = {
+        int(output_number): int(input_number)
+        for input_number, output_number in re.findall(r"Stream #(\d+):\d+ -> #0:(\d+)", text)
+    }
+    n_frames = {}
+    for line in output.decode("utf8", errors="ignore").splitlines():
+        if line and not line.startswith("#"):
+            input_number = output_to_input[int(line.split(",", 1)[0])]
+            n_frames[input_number] = n_frames.get(input_number, 0) + 1
+
+    # one "Input #i" section per file, parsed on its own
+    head = text.split("\nStream mapping:", 1)[0]
+    sections = [section for section in re.split(r"\n(?=Input #)", head) if section.startswith("Input #")]
+    infos = []
+    for inx, (filename, section) in enumerate(zip(filenames, sections)):
+        if inx not in n_frames:
+            infos.append(None)
+            continue
+        result = FFmpegInfosParser(section, filename, check_duration=False).parse()
+        infos.append({
+            "n_frames": n_frames[inx],
+            "size": tuple(result["video_size"]),
+            "fps": result["video_fps"],
+            "codec_name": result.get("video_codec_name"),
+            "pix_fmt": result.get("video_pix_fmt"),
+            "rotation": abs(result.get("video_rotation", 0)),
+        })
+    return infos
+
+def clip_format(info):
+    """Files with the same format can be decoded through one concat demuxer."""
+    if info is None:
+        return None
+    return (info["codec_name"], info["size"], info["fps"], info["pix_fmt"], info["rotation"])
+
+class EasyConcatReader:
+    """
+    Read many short clips through few long-lived ffmpeg processes (concat demuxer),
+    instead of a probe and a decoder process per clip.
+
+    # Example - 224x224 frames of every clip of a directory
+    with EasyConcatReader(mp4list("clips/"), target_resolution=(224, 224)) as reader:
+        for filename, video_array in reader:
+            print(filename, video_array.shape) # (n_frames, 224, 224, 3)
+
+    Files are probed together without decoding (`probe_clips`), which gives the exact frame count of
+    every file. Consecutive files with the same format (codec, size, fps, pixel format) are decoded by one
+    ffmpeg process, and its output is split into files by these frame counts. A file whose format differs
+    from its neighbours, or that could not be probed, is read with its own EasyReader.
+    Frames are read as stored (no fps conversion), video only.
+
+    `infos`: results of `probe_clips(filenames)`, to skip probing (e.g. from a dataset manifest).
+    """
+    def __init__(
+            self,
+            filenames,
+            pixel_format="rgb24",
+            target_resolution=None,
+            target_resolution_ratio=None,
+            resize_algo="bicubic",
+            centercrop=False,
+            infos=None,
+            probe_batch_size=64,
+            max_group_size=None,
+            threads=None,
+            collect_stats=False,
+            close_timeout=5,
+        ):
+        self.filenames = list(filenames)
+        self.pixel_format = pixel_format
+        self.depth = 4 if pixel_format[-1] == "a" else 3
+        self.target_resolution = target_resolution
+        self.target_resolution_ratio = target_resolution_ratio
+        self.resize_algo = resize_algo
+        self.centercrop = centercrop
+        self.threads = threads
+        self.close_timeout = close_timeout
+        self.stats = ReaderStats(parent=get_global_reader_stats()) if collect_stats else None
+        self.proc = None
+
+        if infos is None:
+            with self.stats_timer("probe_time"):
+                infos = probe_clips(self.filenames, batch_size=probe_batch_size)
+        assert len(infos) == len(self.filenames), "infos must have one entry per file"
+        self.infos = infos
+
+        # runs of consecutive files with the same format
+        self.groups = []
+        for inx, info in enumerate(infos):
+            if (
+                self.groups
+                and clip_format(info) is not None
+                and clip_format(info) == clip_format(infos[self.groups[-1][-1]])
+                and (max_group_size is None or len(self.groups[-1]) < max_group_size)
+            ):
+                self.groups[-1].append(inx)
+            else:
+                self.groups.append([inx])
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def stats_timer(self, field):
+        if self.stats is None:
+            return nullcontext()
+        return self.stats.timer(field)
+
+    def stats_add(self, field, value):
+        if self.stats is not None:
+            self.stats.add(field, value)
+
+    def __iter__(self):
+        """Yields (filename, video_array) for every file, in order. video_array: (n_frames, h, w, depth), (0~255)"""
+        for group in self.groups:
+            if len(group) == 1:
+                yield self.filenames[group[0]], self.read_single(group[0])
+            else:
+                yield from self.read_group(group)
+
+    def read_single(self, inx):
+        with EasyReader(
+            self.filenames[inx],
+            pixel_format=self.pixel_format,
+            target_resolution=self.target_resolution,
+            target_resolution_ratio=self.target_resolution_ratio,
+            resize_algo=self.resize_algo,
+            centercrop=self.centercrop,
+            threads=self.threads,
+            collect_stats=self.stats is not None,
+            close_timeout=self.close_timeout,
+        ) as reader:
+            return reader.get_video_array()
+
+    def group_size(self, info):
+        """(source size after rotation and centercrop, output size) of a group"""
+        size = info["size"]
+        if info["rotation"] in [90, 270]:
+            size = (size[1], size[0])
+        if self.centercrop:
+            size = (min(size), min(size))
+        return size, tuple(compute_target_size(size, self.target_resolution, self.target_resolution_ratio))
+
+    def video_filter_params(self, source_size, size):
+        filters = []
+        if self.centercrop:
+            filters.append("crop=%d:%d" % source_size)
+        if size != source_size:
+            filters.append("scale=%d:%d" % size)
+        if not filters:
+            return []
+        params = ["-vf", ",".join(filters)]
+        if filters[-1].startswith("scale"):
+            params += ["-sws_flags", self.resize_algo]
+        return params
+
+    def read_group(self, group):
+        source_size, (w, h) = self.group_size(self.infos[group[0]])
+        frame_bytesize = w * h * self.depth
+
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as list_file:
+            for inx in group:
+                path = os.path.abspath(self.filenames[inx]).replace("'", "'\\''")
+                list_file.write(f"file '{path}'\n")
+
+        threads = self.threads if self.threads is not None else get_ffmpeg_governor().threads()
+        cmd = (
+            [FFMPEG_BINARY]
+            + (["-threads", str(threads)] if threads is not None else [])
+            + ["-f", "concat", "-safe", "0", "-i", list_file.name]
+            # passthrough: exactly one output frame per decoded frame, even across files
+            + ["-loglevel", "error", "-an", "-sn", "-fps_mode", "passthrough", "-f", "image2pipe"]
+            + self.video_filter_params(source_size, (w, h))
+            + ["-pix_fmt", self.pixel_format, "-vcodec", "rawvideo", "-"]
+        )
+        popen_params = cross_platform_popen_params(
+            {"bufsize": frame_bytesize + 100, "stdout": sp.PIPE, "stderr": sp.PIPE, "stdin": sp.DEVNULL}
+        )
+        start = time.perf_counter()
+        self.proc, queue_time = get_ffmpeg_governor().popen(cmd, popen_params)
+        self.stats_add("queue_time", queue_time)
+        self.stats_add("spawn_time", time.perf_counter() - start - queue_time)
+        self.stats_add("n_spawns", 1)
+        try:
+            for inx in group:
+                n_frames = self.infos[inx]["n_frames"]
+                with self.stats_timer("read_time"):
+                    s = self.proc.stdout.read(n_frames * frame_bytesize)
+                with self.stats_timer("convert_time"):
+                    result = np.frombuffer(s, dtype="uint8")
+                    result.shape = (len(s) // frame_bytesize, h, w, self.depth)
+                self.stats_add("bytes_read", len(s))
+                self.stats_add("frames_read", result.shape[0])
+                if result.shape[0] != n_frames:
+                    warnings.warn(f"{self.filenames[inx]}: decoded {result.shape[0]} frames instead of {n_frames}")
+                yield self.filenames[inx], result
+            if self.proc.stdout.read(frame_bytesize):
+                warnings.warn(
+                    f"ffmpeg decoded more frames than counted for {self.filenames[group[0]]} .. {self.filenames[group[-1]]},"
+                    " frames may be assigned to the wrong files"
+                )
+        finally:
+            self.close_proc()
+            os.remove(list_file.name)
+
+    def close_proc(self):
+        if self.proc is None:
+            return
+        proc, self.proc = self.proc, None
+        if proc.poll() is None:
+            proc.terminate()
+        proc.stdout.close()
+        try:
+            proc.wait(timeout=self.close_timeout)
+        except sp.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        get_ffmpeg_governor().release_proc(proc)
+
+    def close(self):
+        self.close_proc()
+        if self.stats is not None and self.filenames:
+            emit_reader_stats(self.filenames[0], self.stats)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
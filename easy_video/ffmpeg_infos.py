@@ -6,6 +6,8 @@ import subprocess as sp
 import os
 
 from .os_dependency import FFMPEG_BINARY, cross_platform_popen_params
+from .governor import get_ffmpeg_governor
+from .memory_input import MemoryInput, is_memory_input, input_name, stdin_param, stdin_data
 
 class FFmpegInfosParser:
     """Finite state ffmpeg `-i` command option file information parser.
@@ -94,7 +96,10 @@ class FFmpegInfosParser:
         # chapters by input file
         input_chapters = []
 
-        for line in self.infos.splitlines()[1:]:
+        # skip log lines printed before the first input, e.g. "[wav @ 0x...] Guessed Channel Layout"
+        lines = self.infos.splitlines()
+        first_input = next((inx for inx, line in enumerate(lines) if line.startswith("Input #")), 0)
+        for line in lines[first_input + 1:]:
             if (
                 self.duration_tag_separator == "time="
                 and self.check_duration
@@ -333,6 +338,8 @@ class FFmpegInfosParser:
     def parse_audio_stream_data(self, line):
         """Parses data from "Stream ... Audio" line."""
         global_data, stream_data = ({"audio_found": True}, {})
+        match_codec = re.search(r"Audio: (\w+)", line)
+        stream_data["codec_name"] = match_codec.group(1) if match_codec else None
         try:
             stream_data["fps"] = int(re.search(r" (\d+) Hz", line).group(1))
         except (AttributeError, ValueError):
@@ -343,15 +350,41 @@ class FFmpegInfosParser:
         stream_data["bitrate"] = (
             int(match_audio_bitrate.group(1)) if match_audio_bitrate else None
         )
-        if self._current_stream["default"]:
+        match_layout = re.search(r" \d+ Hz, ([^,]+)", line)
+        stream_data["channel_layout"] = match_layout.group(1).strip() if match_layout else None
+        stream_data["nchannels"] = self.parse_audio_nchannels(stream_data["channel_layout"])
+        # first audio stream, if no stream is flagged as default (e.g. streamed matroska)
+        if self._current_stream["default"] or "audio_fps" not in self.result:
             global_data["audio_fps"] = stream_data["fps"]
+            global_data["audio_nchannels"] = stream_data["nchannels"]
+            global_data["audio_channel_layout"] = stream_data["channel_layout"]
             global_data["audio_bitrate"] = stream_data["bitrate"]
+            global_data["audio_codec_name"] = stream_data["codec_name"]
         return (global_data, stream_data)
 
+    def parse_audio_nchannels(self, channel_layout):
+        """Number of channels of a channel layout, e.g. "stereo", "5.1(side)", "3 channels" """
+        if channel_layout is None:
+            return None
+        layout = channel_layout.split("(")[0].strip()
+        match_channels = re.match(r"(\d+) channels", layout)
+        if match_channels:
+            return int(match_channels.group(1))
+        layouts = {
+            "mono": 1, "stereo": 2, "downmix": 2, "2.1": 3, "3.0": 3, "3.1": 4, "4.0": 4, "quad": 4,
+            "4.1": 5, "5.0": 5, "5.1": 6, "6.0": 6, "hexagonal": 6, "6.1": 7, "7.0": 7, "7.1": 8, "octagonal": 8,
+        }
+        return layouts.get(layout)
+
     def parse_video_stream_data(self, line):
         """Parses data from "Stream ... Video" line."""
         global_data, stream_data = ({"video_found": True}, {})
 
+        # codec and pixel format, of the form "Video: h264 (High) (...), yuv420p(progressive), ..."
+        match_codec = re.search(r"Video: (\w+)[^,]*, (\w+)", line)
+        stream_data["codec_name"] = match_codec.group(1) if match_codec else None
+        stream_data["pix_fmt"] = match_codec.group(2) if match_codec else None
+
         try:
             match_video_size = re.search(r" (\d+)x(\d+)[,\s]", line)
             if match_video_size:
@@ -408,6 +441,9 @@ class FFmpegInfosParser:
             global_data["video_bitrate"] = stream_data.get("bitrate", None)
         if self._current_stream["default"] or "video_fps" not in self.result:
             global_data["video_fps"] = stream_data["fps"]
+        if self._current_stream["default"] or "video_codec_name" not in self.result:
+            global_data["video_codec_name"] = stream_data["codec_name"]
+            global_data["video_pix_fmt"] = stream_data["pix_fmt"]
 
         return (global_data, stream_data)
 
@@ -484,10 +520,13 @@ def ffmpeg_parse_infos(
     - ``"video_n_frames"``
     - ``"video_duration"``
     - ``"video_bitrate"``
+    - ``"video_codec_name"``
+    - ``"video_pix_fmt"``
     - ``"video_metadata"``
     - ``"audio_found"``
     - ``"audio_fps"``
     - ``"audio_bitrate"``
+    - ``"audio_codec_name"``
     - ``"audio_metadata"``
 
     Note that "video_duration" is slightly smaller than "duration" to avoid
@@ -497,7 +536,8 @@ def ffmpeg_parse_infos(
     ----------
 
     filename
-      Name of the file parsed, only used to raise accurate error messages.
+      Name of the file parsed. Can also be bytes, a memoryview, a readable
+      file object or a MemoryInput, which are fed to ffmpeg over stdin.
 
     infos
       Information returned by FFmpeg.
@@ -514,8 +554,22 @@ def ffmpeg_parse_infos(
       This is needed for some files in order to get the correct duration (see
       https://github.com/Zulko/moviepy/pull/1222).
     """
+    if is_memory_input(filename) and not isinstance(filename, MemoryInput):
+        with MemoryInput(filename) as source:
+            return ffmpeg_parse_infos(
+                source,
+                check_duration=check_duration,
+                fps_source=fps_source,
+                decode_file=decode_file,
+                print_infos=print_infos,
+            )
+
     # Open the file in a pipe, read output
-    cmd = [FFMPEG_BINARY, "-hide_banner", "-i", filename]
+    governor = get_ffmpeg_governor()
+    cmd = [FFMPEG_BINARY, "-hide_banner"]
+    if decode_file and governor.threads() is not None:
+        cmd.extend(["-threads", str(governor.threads())])
+    cmd.extend(["-i", input_name(filename)])
     if decode_file:
         cmd.extend(["-f", "null", "-"])
 
@@ -524,12 +578,12 @@ def ffmpeg_parse_infos(
             "bufsize": 10**5,
             "stdout": sp.PIPE,
             "stderr": sp.PIPE,
-            "stdin": sp.DEVNULL,
+            "stdin": stdin_param(filename),
         }
     )
 
-    proc = sp.Popen(cmd, **popen_params)
-    (output, error) = proc.communicate()
+    # decode_file decodes the whole file: it waits for a slot like the readers, only header reads don't
+    proc, output, error = governor.communicate(cmd, popen_params, input=stdin_data(filename), probe=not decode_file)
     infos = error.decode("utf8", errors="ignore")
 
     proc.terminate()
@@ -548,15 +602,14 @@ def ffmpeg_parse_infos(
             decode_file=decode_file,
         ).parse()
     except Exception as exc:
-        if os.path.isdir(filename):
+        if not isinstance(filename, MemoryInput) and os.path.isdir(filename):
             raise IsADirectoryError(f"'{filename}' is a directory")
-        elif not os.path.exists(filename):
+        elif not isinstance(filename, MemoryInput) and not os.path.exists(filename):
             raise FileNotFoundError(f"'{filename}' not found")
         else:
             try: # try decode_file=False for wav files
-                cmd_new = [FFMPEG_BINARY, "-hide_banner", "-i", filename]
-                proc = sp.Popen(cmd_new, **popen_params)
-                (output, error) = proc.communicate()
+                cmd_new = [FFMPEG_BINARY, "-hide_banner", "-i", input_name(filename)]
+                proc, output, error = governor.communicate(cmd_new, popen_params, input=stdin_data(filename), probe=True)
                 infos = error.decode("utf8", errors="ignore")
 
                 proc.terminate()
@@ -576,6 +629,80 @@ def ffmpeg_parse_infos(
                 raise IOError(f"Error passing `ffmpeg -i` command output:\n\n{infos}") from exc
 
 
+def ffmpeg_video_packets(filename):
+    """Get the (pts, dts, is_keyframe) of every packet of the first video stream, in seconds.
+
+    The packets are stream copied to ffmpeg's ``framecrc`` muxer, so nothing is decoded.
+    Packets are returned in decoding order.
+    """
+    if is_memory_input(filename) and not isinstance(filename, MemoryInput):
+        with MemoryInput(filename) as source:
+            return ffmpeg_video_packets(source)
+
+    cmd = [
+        FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-i", input_name(filename),
+        "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-",
+    ]
+    popen_params = cross_platform_popen_params(
+        {
+            "bufsize": 10**5,
+            "stdout": sp.PIPE,
+            "stderr": sp.PIPE,
+            "stdin": stdin_param(filename),
+        }
+    )
+    proc, output, error = get_ffmpeg_governor().communicate(cmd, popen_params, input=stdin_data(filename), probe=True)
+    if proc.returncode != 0:
+        raise IOError(
+            f"Error reading the video packets of '{filename}':\n\n{error.decode('utf8', errors='ignore')}"
+        )
+
+    time_base = 1.0
+    packets = []
+    for line in output.decode("utf8", errors="ignore").splitlines():
+        if line.startswith("#tb 0:"):
+            num, den = line.split(":", 1)[1].strip().split("/")
+            time_base = int(num) / int(den)
+        elif line and not line.startswith("#"):
+            # stream, dts, pts, duration, size, crc[, F=flags]. F is omitted for keyframes.
+            fields = [field.strip() for field in line.split(",")]
+            flags = int(fields[6][2:], 16) if len(fields) > 6 and fields[6].startswith("F=") else 1
+            packets.append((int(fields[2]) * time_base, int(fields[1]) * time_base, bool(flags & 1)))
+    return packets
+
+def ffmpeg_keyframe_times(filename):
+    """Get the sorted timestamps (in seconds) of the video keyframes of a file, without decoding."""
+    return sorted(pts for pts, _, is_keyframe in ffmpeg_video_packets(filename) if is_keyframe)
+
+def ffmpeg_video_stream_params(filename, trace_headers=True):
+    """Get the profile (e.g. 'High'), the level (level_idc of the SPS, None if unknown) and the
+    time base denominator (tbn) of the first video stream, from its first packet, without decoding."""
+    cmd = (
+        [FFMPEG_BINARY, "-hide_banner", "-i", filename, "-map", "0:v:0", "-c", "copy"]
+        + (["-bsf:v", "trace_headers"] if trace_headers else [])
+        + ["-frames:v", "1", "-f", "null", "-"]
+    )
+    popen_params = cross_platform_popen_params(
+        {"stdout": sp.DEVNULL, "stderr": sp.PIPE, "stdin": sp.DEVNULL}
+    )
+    proc, _, error = get_ffmpeg_governor().communicate(cmd, popen_params, probe=True)
+    text = error.decode("utf8", errors="ignore")
+    if trace_headers and "is not supported by the bitstream filter" in text:
+        # trace_headers only knows a few codecs (h264, hevc, av1, vp9...): no level for the others
+        return ffmpeg_video_stream_params(filename, trace_headers=False)
+    head = text.split("\nStream mapping:", 1)[0]
+    stream = re.search(r"Stream #0:\d+.*?: Video: \w+(?: \(([^)]*)\))?.*", head)
+    if proc.returncode != 0 or stream is None:
+        raise IOError(f"Error reading the video stream parameters of '{filename}':\n\n{text}")
+    tbn = re.search(r"([\d.]+)(k?) tbn", stream.group(0))
+    level = re.search(r"\s(?:general_)?level_idc\s+\d+ = (\d+)", text)
+    return {
+        "profile": stream.group(1),
+        "level": int(level.group(1)) if level else None,
+        "time_base_den": int(float(tbn.group(1)) * (1000 if tbn.group(2) else 1)) if tbn else None,
+    }
+
+
 if __name__ == "__main__":
     test_video = "/Users/kwonmingi/Codes/macocr/test_vid/vid12_xoobAzitHzs.wav"
     info = ffmpeg_parse_infos(test_video, print_infos=False)
@@ -1,5 +1,35 @@
 import subprocess as sp
+import math
+import time
+from contextlib import nullcontext
 from .ffmpeg_infos import ffmpeg_parse_infos, cross_platform_popen_params, FFMPEG_BINARY
+from .stats import ReaderStats, get_global_reader_stats, emit_reader_stats
+from .governor import get_ffmpeg_governor
+from .memory_input import MemoryInput, is_memory_input, input_name, stdin_param, feed_stdin
+
+def compute_target_size(size, target_resolution=None, target_resolution_ratio=None):
+    """(w, h) of the frames read from a video of `size` (w, h), for a target_resolution or target_resolution_ratio."""
+    # if target_resolution is specified, to resize the video, set the size
+    if target_resolution:
+        if None in target_resolution:
+            ratio = 1
+            for idx, target in enumerate(target_resolution):
+                if target:
+                    ratio = target / size[idx]
+            size = (int(size[0] * ratio), int(size[1] * ratio))
+        else:
+            size = target_resolution
+    if target_resolution_ratio:
+        assert target_resolution is None
+        # round the resolution to the nearest even number
+        size = (int(size[0] * target_resolution_ratio) + int(int(size[0] * target_resolution_ratio) % 2),
+                int(size[1] * target_resolution_ratio) + int(int(size[1] * target_resolution_ratio) % 2))
+
+        if size[0] * target_resolution_ratio - int(size[0] * target_resolution_ratio) != 0:
+            print(f"Warning: target_resolution_ratio {target_resolution_ratio} is not a multiple of the original resolution of height. The resolution is rounded to {size}")
+        if size[1] * target_resolution_ratio - int(size[1] * target_resolution_ratio) != 0:
+            print(f"Warning: target_resolution_ratio {target_resolution_ratio} is not a multiple of the original resolution of width. The resolution is rounded to {size}")
+    return size
 
 class FFMPEGReader:
 
@@ -16,24 +46,47 @@ class FFMPEGReader:
             target_resolution_ratio=None,
             target_video_fps=None,
             resize_algo="lanczos",
+            centercrop=False,
             fps_source="fps",
             audio_fps=None,
             audio_nbytes=2,
             audio_nchannels=2,
+            collect_stats=False,
+            threads=None,
+            close_timeout=5,
+            infos=None,
         ):
+        # bytes, memoryview and file objects are decoded from memory, fed to ffmpeg over stdin
+        self.memory_inputs = [] # MemoryInputs created by this reader, closed on exit
+        if is_memory_input(filename) and not isinstance(filename, MemoryInput):
+            filename = MemoryInput(filename)
+            self.memory_inputs.append(filename)
+        if is_memory_input(audiofilename) and not isinstance(audiofilename, MemoryInput):
+            audiofilename = MemoryInput(audiofilename)
+            self.memory_inputs.append(audiofilename)
         self.filename = filename
+        self.close_timeout = close_timeout
+        # decoder threads. None uses the thread budget of the ffmpeg governor.
+        self.threads = threads
         self.audiofilename = audiofilename if audiofilename is not None else filename
-        infos = ffmpeg_parse_infos(
-            filename,
-            check_duration=check_duration,
-            fps_source=fps_source,
-            decode_file=decode_file,
-            print_infos=print_infos,
-        )
+        self.stats = ReaderStats(parent=get_global_reader_stats()) if collect_stats else None
+        # infos: ffmpeg_parse_infos of filename given by the caller (e.g. VideoManifest.infos), not probed again
+        if infos is None:
+            with self.stats_timer("probe_time"):
+                infos = ffmpeg_parse_infos(
+                    filename,
+                    check_duration=check_duration,
+                    fps_source=fps_source,
+                    decode_file=decode_file,
+                    print_infos=print_infos,
+                )
         self.infos = infos # ['video_found', 'audio_found', 'metadata', 'inputs', 'duration', 'bitrate', 'start', 'default_video_input_number', 'default_video_stream_number', 'video_size', 'video_bitrate', 'video_fps', 'default_audio_input_number', 'default_audio_stream_number', 'audio_fps', 'audio_bitrate', 'video_n_frames', 'video_duration']
         self.ffmpeg_duration = infos["duration"]
 
         self.video_proc = None
+        # input seek of the video process (seconds), and audio samples trimmed from the start (set by EasyReader.seek)
+        self.video_seek_time = None
+        self.audio_seek_sample = 0
         self.video_found = infos["video_found"]
         self.target_video_fps = target_video_fps
 
@@ -48,26 +101,14 @@ class FFMPEGReader:
             self.rotation = abs(infos.get("video_rotation", 0))
             if self.rotation in [90, 270]:
                 self.size = [self.size[1], self.size[0]]
-            # if target_resolution is specified, to resize the video, set the size
-            if target_resolution:
-                if None in target_resolution:
-                    ratio = 1
-                    for idx, target in enumerate(target_resolution):
-                        if target:
-                            ratio = target / self.size[idx]
-                    self.size = (int(self.size[0] * ratio), int(self.size[1] * ratio))
-                else:
-                    self.size = target_resolution
-            if target_resolution_ratio:
-                assert target_resolution is None
-                # round the resolution to the nearest even number
-                self.size = (int(self.size[0] * target_resolution_ratio) + int(int(self.size[0] * target_resolution_ratio) % 2),
-                             int(self.size[1] * target_resolution_ratio) + int(int(self.size[1] * target_resolution_ratio) % 2))
-
-                if self.size[0] * target_resolution_ratio - int(self.size[0] * target_resolution_ratio) != 0:
-                    print(f"Warning: target_resolution_ratio {target_resolution_ratio} is not a multiple of the original resolution of height. The resolution is rounded to {self.size}")
-                if self.size[1] * target_resolution_ratio - int(self.size[1] * target_resolution_ratio) != 0:
-                    print(f"Warning: target_resolution_ratio {target_resolution_ratio} is not a multiple of the original resolution of width. The resolution is rounded to {self.size}")
+            # centercrop: crop the center square with the shorter side, before resizing
+            self.centercrop = centercrop
+            if centercrop:
+                self.size = [min(self.size), min(self.size)]
+                self.crop_size = self.size
+            # size before resizing
+            self.source_size = self.size
+            self.size = self.target_size(target_resolution, target_resolution_ratio)
 
             self.w, self.h = self.size
 
@@ -94,12 +135,13 @@ class FFMPEGReader:
             self.frame_pos = 0
 
         if self.audiofilename != filename:
-            infos = ffmpeg_parse_infos(
-                self.audiofilename,
-                check_duration=check_duration,
-                decode_file=decode_file,
-                print_infos=print_infos,
-            )
+            with self.stats_timer("probe_time"):
+                infos = ffmpeg_parse_infos(
+                    self.audiofilename,
+                    check_duration=check_duration,
+                    decode_file=decode_file,
+                    print_infos=print_infos,
+                )
 
         self.audio_proc = None
         self.audio_found = infos["audio_found"]
@@ -115,103 +157,197 @@ class FFMPEGReader:
             self.audio_codec = "pcm_s%dle" % (8 * self.audio_nbytes)
 
             self.audio_n_frames = int(self.audio_duration * self.audio_fps)
-            self.audio_buffersize = self.audio_n_frames+1
+            # pipe buffer of one second of samples, large reads bypass it
+            self.audio_buffersize = int(self.audio_fps) * self.audio_nchannels * self.audio_nbytes
 
             self.audio_data_type = {1: "int8", 2: "int16", 4: "int32"}[self.audio_nbytes]
 
-
-    def video_proc_initialize(self):
-        if self.video_proc is None:
-            cmd = (
-                [FFMPEG_BINARY]
-                + ["-i", self.filename]
-                + (["-r", str(self.target_video_fps)] if self.target_video_fps is not None else [])
-                + ["-loglevel", "error", "-f", "image2pipe"]
-            )
-
-            # 리사이징이 필요한 경우에만 관련 명령어 추가
-            if self.size != self.origin_size:
-                cmd += [
-                    "-vf",
-                    "scale=%d:%d" % tuple(self.size),
-                    "-sws_flags",
-                    self.resize_algo,
-                ]
-
-            cmd += [
+    def target_size(self, target_resolution=None, target_resolution_ratio=None):
+        """(w, h) of the frames for a target_resolution or target_resolution_ratio, from `self.source_size`."""
+        return compute_target_size(self.source_size, target_resolution, target_resolution_ratio)
+
+    def stats_timer(self, field):
+        """Time a block into `self.stats.<field>`. No-op if stats are disabled."""
+        if self.stats is None:
+            return nullcontext()
+        return self.stats.timer(field)
+
+    def stats_add(self, field, value):
+        if self.stats is not None:
+            self.stats.add(field, value)
+
+    def popen(self, cmd, popen_params):
+        """Start an ffmpeg process in a slot of the ffmpeg governor."""
+        start = time.perf_counter()
+        proc, queue_time = get_ffmpeg_governor().popen(cmd, popen_params)
+        self.stats_add("queue_time", queue_time)
+        self.stats_add("spawn_time", time.perf_counter() - start - queue_time)
+        self.stats_add("n_spawns", 1)
+        return proc
+
+    def threads_params(self):
+        threads = self.threads if self.threads is not None else get_ffmpeg_governor().threads()
+        return ["-threads", str(threads)] if threads is not None else []
+
+    def video_cmd(self):
+        """ffmpeg command writing the raw video frames to stdout"""
+        return (
+            [FFMPEG_BINARY]
+            + self.threads_params()
+            + (["-ss", "%.6f" % self.video_seek_time] if self.video_seek_time else [])
+            + ["-i", input_name(self.filename)]
+            + ["-loglevel", "error", "-f", "image2pipe"]
+            + self.video_filter_params()
+            + [
                 "-pix_fmt",
                 self.pixel_format,
                 "-vcodec",
                 "rawvideo",
                 "-",
             ]
+        )
+
+    def video_proc_initialize(self):
+        if self.video_proc is None:
+            cmd = self.video_cmd()
 
             popen_params = cross_platform_popen_params(
                 {
                     "bufsize": self.bufsize,
                     "stdout": sp.PIPE,
                     "stderr": sp.PIPE,
-                    "stdin": sp.DEVNULL,
+                    "stdin": stdin_param(self.filename),
                 }
             )
 
-            self.video_proc = sp.Popen(cmd, **popen_params)
+            self.video_proc = self.popen(cmd, popen_params)
+            feed_stdin(self.filename, self.video_proc)
+
+    def video_filter_params(self):
+        """ffmpeg output options for target_video_fps, centercrop and target_resolution."""
+        params = ["-r", str(self.target_video_fps)] if self.target_video_fps is not None else []
+        filters = []
+        if self.centercrop:
+            filters.append("crop=%d:%d" % tuple(self.crop_size))
+        # 리사이징이 필요한 경우에만 관련 명령어 추가
+        if self.size != (self.crop_size if self.centercrop else self.origin_size):
+            filters.append("scale=%d:%d" % tuple(self.size))
+        if filters:
+            params += ["-vf", ",".join(filters)]
+            if filters[-1].startswith("scale"):
+                params += ["-sws_flags", self.resize_algo]
+        return params
+
+    def audio_filter_params(self):
+        """ffmpeg output options dropping the first `audio_seek_sample` samples.
+        The samples are trimmed after resampling, so the remaining ones are identical to a full decode."""
+        if not self.audio_seek_sample:
+            return []
+        layout = {1: "mono", 2: "stereo"}.get(self.audio_nchannels, "%dc" % self.audio_nchannels)
+        return [
+            "-af",
+            "aformat=sample_rates=%d:channel_layouts=%s,atrim=start_sample=%d,asetpts=PTS-STARTPTS"
+            % (self.audio_fps, layout, self.audio_seek_sample),
+        ]
+
+    def audio_cmd(self, start_time=None, duration=None, filters=True):
+        """ffmpeg command writing raw audio samples to stdout, from `start_time` (input seek) for `duration` seconds.
+        filters: trim the samples before the reader's position (`audio_filter_params`), False for reads at absolute times."""
+        return (
+            [FFMPEG_BINARY]
+            # rounded down, so the seek does not drop the first sample
+            + (["-ss", "%.6f" % (math.floor(start_time * 1e6) / 1e6)] if start_time else [])
+            + ["-i", input_name(self.audiofilename), "-vn"]
+            + (["-t", "%.6f" % duration] if duration is not None else [])
+            + (self.audio_filter_params() if filters else [])
+            + [
+                "-loglevel",
+                "error",
+                "-f",
+                self.audio_format,
+                "-acodec",
+                self.audio_codec,
+                "-ar",
+                "%d" % self.audio_fps,
+                "-ac",
+                "%d" % self.audio_nchannels,
+                "-",
+            ]
+        )
+
+    def audio_popen_params(self):
+        return cross_platform_popen_params(
+            {
+                "bufsize": self.audio_buffersize,
+                "stdout": sp.PIPE,
+                "stderr": sp.PIPE,
+                "stdin": stdin_param(self.audiofilename),
+            }
+        )
 
     def audio_proc_initialize(self):
         if self.audio_proc is None:
-            cmd = (
-                [FFMPEG_BINARY]
-                + ["-i", self.audiofilename, "-vn"]
-                + [
-                    "-loglevel",
-                    "error",
-                    "-f",
-                    self.audio_format,
-                    "-acodec",
-                    self.audio_codec,
-                    "-ar",
-                    "%d" % self.audio_fps,
-                    "-ac",
-                    "%d" % self.audio_nchannels,
-                    "-",
-                ]
-            )
+            cmd = self.audio_cmd()
+            popen_params = self.audio_popen_params()
 
-            popen_params = cross_platform_popen_params(
-                {
-                    "bufsize": self.audio_buffersize,
-                    "stdout": sp.PIPE,
-                    "stderr": sp.PIPE,
-                    "stdin": sp.DEVNULL,
-                }
-            )
+            self.audio_proc = self.popen(cmd, popen_params)
+            feed_stdin(self.audiofilename, self.audio_proc)
 
-            self.audio_proc = sp.Popen(cmd, **popen_params)
+    def close(self, emit_stats=True, release_inputs=True):
+        """Closes the reader terminating the process, if is still open.
+        If stats are collected, they are passed to the registered stats hooks.
+        release_inputs: remove the temporary files of the in-memory inputs created by this reader
+        (False to restart the processes)."""
+        if emit_stats and self.stats is not None and (self.video_proc or self.audio_proc):
+            emit_reader_stats(self.filename, self.stats)
 
-    def close(self):
-        """Closes the reader terminating the process, if is still open."""
         if self.video_proc:
-            if self.video_proc.poll() is None:
-                self.video_proc.terminate()
-                self.video_proc.stdout.close()
-                self.video_proc.stderr.close()
-                self.video_proc.wait()
+            self.close_proc(self.video_proc)
             self.video_proc = None
 
         if self.audio_proc:
-            if self.audio_proc.poll() is None:
-                self.audio_proc.terminate()
-                self.audio_proc.stdout.close()
-                self.audio_proc.stderr.close()
-                self.audio_proc.wait()
+            self.close_proc(self.audio_proc)
             self.audio_proc = None
 
+        if release_inputs:
+            for memory_input in self.memory_inputs:
+                memory_input.close()
+
+    def close_proc(self, proc):
+        """Terminate `proc`, killing it if it does not exit within `close_timeout` seconds.
+        stderr is closed by its drainer thread."""
+        if proc.poll() is None:
+            proc.terminate()
+        proc.stdout.close()
+        try:
+            proc.wait(timeout=self.close_timeout)
+        except sp.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        get_ffmpeg_governor().release_proc(proc)
+
+    def stderr_tail(self):
+        """Last lines ffmpeg wrote to stderr, per process."""
+        return {
+            name: proc.stderr_drainer.text()
+            for name, proc in (("video", self.video_proc), ("audio", self.audio_proc))
+            if proc is not None and proc.stderr_drainer is not None
+        }
+
     def __del__(self):
         try:
             self.close()
         except Exception:
             pass
 
+    # Support the Context Manager protocol, to ensure that processes are cleaned up.
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 
 
 if __name__ == "__main__":
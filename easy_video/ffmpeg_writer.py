@@ -1,9 +1,277 @@
+import io
+import os
+import struct
 import subprocess as sp
+import threading
+import time
+import warnings
+import numpy as np
 from .ffmpeg_infos import cross_platform_popen_params, FFMPEG_BINARY
+from .os_dependency import IS_POSIX_OS
+from .stats import WriterStats
+from .governor import get_ffmpeg_governor
 
 from tqdm import tqdm
 
+# muxers that can write to a pipe (no seeking back to patch the header), and their options, by extension
+STREAM_FORMATS = {
+    "mp4": ["-f", "mp4", "-movflags", "frag_keyframe+empty_moov+default_base_moof"],
+    "mov": ["-f", "mov", "-movflags", "frag_keyframe+empty_moov+default_base_moof"],
+    "m4a": ["-f", "mp4", "-movflags", "frag_keyframe+empty_moov+default_base_moof"],
+    "mkv": ["-f", "matroska"],
+    "webm": ["-f", "webm"],
+    "ts": ["-f", "mpegts"],
+    "wav": ["-f", "wav"],
+    "mp3": ["-f", "mp3"],
+    "flac": ["-f", "flac"],
+    "ogg": ["-f", "ogg"],
+    "aac": ["-f", "adts"],
+}
+
+def stream_target(filename):
+    """True if a writer target is a writable file object, or None for in-memory bytes."""
+    return filename is None or hasattr(filename, "write")
+
+def target_ext(filename, format=None):
+    """Extension of a writer target: `format`, or the extension of the filename (or of `file.name`)."""
+    if format is not None:
+        return format.lower()
+    name = filename if isinstance(filename, str) else getattr(filename, "name", None)
+    if isinstance(name, str) and "." in name:
+        return name.split(".")[-1].lower()
+    if stream_target(filename):
+        raise ValueError("`format` is needed to write to a stream, e.g. format='mp4'")
+    return ""
+
+def output_params(filename, format=None):
+    """ffmpeg output of a writer target: the filename, or a streamable muxer on stdout."""
+    if not stream_target(filename):
+        return [filename]
+    ext = target_ext(filename, format)
+    if ext not in STREAM_FORMATS:
+        raise ValueError(f"'{ext}' can't be written to a stream, use one of {sorted(STREAM_FORMATS)}")
+    return STREAM_FORMATS[ext] + ["pipe:1"]
+
+def progress_params(stats, stream_output=False):
+    """`-progress` options, and (read_fd, write_fd) of its pipe.
+    When stdout carries the encoded output, the progress goes to an extra pipe (POSIX only)."""
+    if stats is None:
+        return [], None
+    if not stream_output:
+        return ["-progress", "pipe:1"], None
+    assert IS_POSIX_OS, "progress of a writer to a stream is only supported on POSIX systems"
+    read_fd, write_fd = os.pipe()
+    return ["-progress", "pipe:%d" % write_fd], (read_fd, write_fd)
+
+class OutputCopier:
+    """
+    Copies the encoded output from ffmpeg stdout to a writable file object in a background thread,
+    so ffmpeg never blocks on a full stdout pipe while python writes frames to its stdin.
+    If the file object raises, the pipe is closed (ffmpeg exits on the broken pipe) and the error is kept.
+    """
+    def __init__(self, stream, target, chunk_size=1 << 20):
+        self.stream = stream
+        self.target = target
+        self.chunk_size = chunk_size
+        self.error = None
+        self.thread = threading.Thread(target=self._copy, daemon=True)
+        self.thread.start()
+
+    def _copy(self):
+        try:
+            while True:
+                data = self.stream.read1(self.chunk_size)
+                if not data:
+                    break
+                self.target.write(data)
+        except Exception as err:
+            self.error = err
+        finally:
+            self.stream.close()
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+
+def fix_wav_header(f):
+    """Write the RIFF and data chunk sizes of a wav that was streamed (sizes unknown while writing).
+    `f` must be seekable. Files over 4 GiB are left as they are."""
+    end = f.seek(0, io.SEEK_END)
+    if end >= 2 ** 32:
+        return
+    f.seek(0)
+    header = f.read(12)
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:] != b"WAVE":
+        return
+    offset = 12
+    while offset + 8 <= end:
+        f.seek(offset)
+        chunk_id, chunk_size = struct.unpack("<4sI", f.read(8))
+        if chunk_id == b"data":
+            f.seek(4)
+            f.write(struct.pack("<I", end - 8))
+            f.seek(offset + 4)
+            f.write(struct.pack("<I", end - offset - 8))
+            break
+        offset += 8 + chunk_size + chunk_size % 2
+    f.seek(0, io.SEEK_END)
+
+def read_progress(stream, stats, progress_callback=None):
+    """Parse ffmpeg's `-progress` output into `stats` until the stream closes.
+    `progress_callback(stats)` is called after every progress block. Its exceptions are reported with a
+    warning (the first one) and the stream is still drained, otherwise ffmpeg would block writing to it."""
+    block = {}
+    callback_failed = False
+    try:
+        for line in iter(stream.readline, b""):
+            key, _, value = line.decode("utf8", errors="ignore").strip().partition("=")
+            if not key:
+                continue
+            block[key] = value
+            if key == "progress":
+                stats.update_progress(block)
+                if progress_callback is not None:
+                    try:
+                        progress_callback(stats)
+                    except Exception as e:
+                        if not callback_failed:
+                            warnings.warn(f"progress_callback raised {e!r}, further errors are ignored")
+                        callback_failed = True
+                block = {}
+    finally:
+        stream.close()
+
+def start_progress_thread(stream, stats, progress_callback=None):
+    thread = threading.Thread(
+        target=read_progress,
+        args=(stream, stats, progress_callback),
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+def start_encoder(cmd, logfile, stats=None, progress_callback=None, progress_fds=None, output=None, pass_fds=()):
+    """Start an encoder reading from stdin in a slot of the ffmpeg governor.
+    Returns (proc, progress_thread, output_copier). `output`: file object the encoded stdout is copied to.
+    `pass_fds`: other file descriptors ffmpeg inherits (e.g. the read end of an `AudioPipe`)."""
+    popen_params = {
+        "stdout": sp.PIPE if stats is not None or output is not None else sp.DEVNULL,
+        "stderr": logfile,
+        "stdin": sp.PIPE,
+    }
+    if progress_fds is not None or pass_fds:
+        popen_params["pass_fds"] = ([progress_fds[1]] if progress_fds is not None else []) + list(pass_fds)
+    try:
+        proc, queue_time = get_ffmpeg_governor().popen(cmd, cross_platform_popen_params(popen_params))
+    except Exception:
+        if progress_fds is not None:
+            os.close(progress_fds[0])
+        raise
+    finally:
+        # only ffmpeg keeps the write end, so the progress reader sees EOF when it exits
+        if progress_fds is not None:
+            os.close(progress_fds[1])
+
+    progress_thread = None
+    if stats is not None:
+        stats.queue_time = queue_time
+        progress_stream = os.fdopen(progress_fds[0], "rb") if progress_fds is not None else proc.stdout
+        progress_thread = start_progress_thread(progress_stream, stats, progress_callback)
+    output_copier = OutputCopier(proc.stdout, output) if output is not None else None
+    return proc, progress_thread, output_copier
+
+def finish_proc(proc, progress_thread=None, timeout=None, output_copier=None):
+    """Close the encoder stdin and wait for ffmpeg to exit, then release its slot.
+    If it does not exit within `timeout` seconds, it is killed and TimeoutError is raised.
+    If the encoded output could not be written to its file object, IOError is raised."""
+    if proc.stdin is not None and not proc.stdin.closed:
+        try:
+            proc.stdin.close()
+        except OSError: # broken pipe, ffmpeg already exited
+            pass
+    timed_out = False
+    try:
+        proc.wait(timeout=timeout)
+    except sp.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+        timed_out = True
+    if progress_thread is not None:
+        progress_thread.join()
+    if output_copier is not None:
+        output_copier.join()
+    if proc.stdout is not None:
+        proc.stdout.close()
+    get_ffmpeg_governor().release_proc(proc)
+    if timed_out:
+        raise TimeoutError(
+            f"ffmpeg did not finish within {timeout} seconds and was killed.\n\n{read_ffmpeg_error(proc)}"
+        )
+    if output_copier is not None and output_copier.error is not None:
+        raise IOError(f"Error writing the encoded output: {output_copier.error}") from output_copier.error
+
+def read_ffmpeg_error(proc, logfile=None):
+    """Last lines written by ffmpeg to stderr, or to `logfile` if stderr was redirected."""
+    if getattr(proc, "stderr_drainer", None) is not None:
+        return proc.stderr_drainer.text()
+    if logfile is not None and hasattr(logfile, "seek"):
+        # The error was redirected to a logfile with `write_logfile=True`,
+        # so read the error from that file instead
+        logfile.seek(0)
+        return logfile.read()
+    return ""
+
+def video_codec_params(codec, preset, size, bitrate=None, threads=None, ffmpeg_params=None):
+    """ffmpeg output options of the video encoder, shared by the writers and `EasyWriter.transcode`."""
+    params = ["-vcodec", codec, "-preset", preset]
+    if ffmpeg_params is not None:
+        params.extend(ffmpeg_params)
+    if bitrate is not None:
+        params.extend(["-b", bitrate])
+
+    if threads is None:
+        threads = get_ffmpeg_governor().threads()
+    if threads is not None:
+        params.extend(["-threads", str(threads)])
+
+    if (codec == "libx264"):
+        # params.extend(["-crf", "0",])
+        if (size[0] % 2 == 0) and (size[1] % 2 == 0):
+            params.extend(["-pix_fmt", "yuv420p"])
+    return params
+
+def raw_video_input_params(size, fps, pixel_format):
+    """ffmpeg input options for raw frames on stdin"""
+    return [
+        "-f",
+        "rawvideo",
+        "-vcodec",
+        "rawvideo",
+        "-s",
+        "%dx%d" % (size[0], size[1]),
+        "-pix_fmt",
+        pixel_format,
+        "-r",
+        "%.02f" % fps,
+        "-an",
+        "-i",
+        "-",
+    ]
+
+def write_to_proc(proc, data, n_frames, stats=None):
+    """Write raw bytes to the encoder stdin, timing the write if stats are collected."""
+    if stats is None:
+        proc.stdin.write(data)
+        return
+    start = time.perf_counter()
+    proc.stdin.write(data)
+    stats.add_submitted(n_frames, len(data), time.perf_counter() - start)
+
+
 class FFMPEG_AudioWriter:
+    """
+    filename: a path, a writable file object, or None to keep the encoded file in memory (`getvalue()`).
+    File objects and None need a streamable `format` (e.g. 'wav', 'mp3', 'm4a'), unless `file.name` has an extension.
+    """
     def __init__(
         self,
         filename,
@@ -15,20 +283,28 @@ class FFMPEG_AudioWriter:
         input_video=None,
         logfile=None,
         ffmpeg_params=None,
-        chunk_size=4096,
+        chunk_size=1 << 18,
         is_raw_audio=False,
+        threads=None,
+        collect_stats=False,
+        progress_callback=None,
+        close_timeout=None,
+        format=None,
     ):
         if logfile is None:
             logfile = sp.PIPE
         self.logfile = logfile
-        self.filename = filename
+        self.close_timeout = close_timeout
+        self.buffer = io.BytesIO() if filename is None else None
+        self.filename = filename if filename is not None else "<memory>"
+        self.output = self.buffer if filename is None else filename if stream_target(filename) else None
         self.codec = codec
         self.nbytes = nbytes
         self.nchannels = nchannels
         if codec is None:
             self.codec = "pcm_s%dle" % (8 * nbytes)
             codec = self.codec
-        self.ext = self.filename.split(".")[-1]
+        self.ext = target_ext(filename, format)
 
         # order is important
         cmd = [
@@ -36,6 +312,14 @@ class FFMPEG_AudioWriter:
             "-y",
             "-loglevel",
             "error" if logfile == sp.PIPE else "info",
+        ]
+        # machine-readable encoder progress
+        self.stats = None
+        if collect_stats or progress_callback is not None:
+            self.stats = WriterStats(fps_input)
+        params, progress_fds = progress_params(self.stats, self.output is not None)
+        cmd.extend(params)
+        cmd.extend([
             "-f",
             "s%dle" % (8 * nbytes),
             "-acodec",
@@ -46,7 +330,7 @@ class FFMPEG_AudioWriter:
             "%d" % nchannels,
             "-i",
             "-",
-        ]
+        ])
         if input_video is None:
             cmd.extend(["-vn"])
         else:
@@ -56,27 +340,46 @@ class FFMPEG_AudioWriter:
         cmd.extend(["-strict", "-2"])  # needed to support codec 'aac'
         if bitrate is not None:
             cmd.extend(["-ab", bitrate])
+        if threads is None:
+            threads = get_ffmpeg_governor().threads()
+        if threads is not None:
+            cmd.extend(["-threads", str(threads)])
         if ffmpeg_params is not None:
             cmd.extend(ffmpeg_params)
-        cmd.extend([filename])
+        cmd.extend(output_params(filename, format))
 
-        popen_params = cross_platform_popen_params(
-            {"stdout": sp.DEVNULL, "stderr": logfile, "stdin": sp.PIPE}
+        self.proc, self.progress_thread, self.output_copier = start_encoder(
+            cmd, logfile, self.stats, progress_callback, progress_fds, self.output
         )
 
-        self.proc = sp.Popen(cmd, **popen_params)
-
         self.chunk_size = chunk_size
         self.is_raw_audio = is_raw_audio
+        # conversion buffers, reused across writes
+        self.scaled_buffer = None
+        self.samples_buffer = None
 
     def audio_array_to_bytes(self, audio_array):
+        """(-1~1) samples to pcm bytes. Out of range samples saturate instead of wrapping around."""
         if self.is_raw_audio:
             return audio_array.tobytes()
-        audio_array = (audio_array * 2 ** (8 * self.nbytes - 1)).astype(f"int{8*self.nbytes}")
-        return audio_array.tobytes()
+        audio_array = np.asarray(audio_array).reshape(-1)
+        n = len(audio_array)
+        # float64 keeps the precision of 32 bit samples, float32 input stays float32 otherwise
+        work_dtype = np.float64 if self.nbytes == 4 else np.result_type(audio_array.dtype, np.float32)
+        if self.scaled_buffer is None or len(self.scaled_buffer) < n or self.scaled_buffer.dtype != work_dtype:
+            self.scaled_buffer = np.empty(max(n, self.chunk_size * self.nchannels), dtype=work_dtype)
+            self.samples_buffer = np.empty(len(self.scaled_buffer), dtype=f"int{8*self.nbytes}")
+        scaled, samples = self.scaled_buffer[:n], self.samples_buffer[:n]
+
+        scale = 2 ** (8 * self.nbytes - 1)
+        np.multiply(audio_array, scale, out=scaled, casting="unsafe")
+        np.clip(scaled, -scale, scale - 1, out=scaled)
+        np.copyto(samples, scaled, casting="unsafe")
+        # written before the next conversion, so the buffer can be passed without a copy
+        return memoryview(samples).cast("B")
 
     def write_frames_chunk(self, frames_array, silent=False):
-        """TODO: add documentation"""
+        """Write (n_samples, n_channels) audio, `chunk_size` samples per write"""
         if silent:
             tqdm_ = lambda x: x
         else:
@@ -90,19 +393,15 @@ class FFMPEG_AudioWriter:
     def write_frames(self, frames_array):
         """TODO: add documentation"""
         try:
-            self.proc.stdin.write(self.audio_array_to_bytes(frames_array))
+            write_to_proc(self.proc, self.audio_array_to_bytes(frames_array), len(frames_array), self.stats)
         except IOError as err:
             self.raise_IOError(err)
 
     def raise_IOError(self, err):
-        _, ffmpeg_error = self.proc.communicate()
-        if ffmpeg_error is not None:
-            ffmpeg_error = ffmpeg_error.decode()
-        else:
-            # The error was redirected to a logfile with `write_logfile=True`,
-            # so read the error from that file instead
-            self.logfile.seek(0)
-            ffmpeg_error = self.logfile.read()
+        finish_proc(self.proc, self.progress_thread, self.close_timeout, self.output_copier)
+        self.progress_thread = None
+        self.output_copier = None
+        ffmpeg_error = read_ffmpeg_error(self.proc, self.logfile)
 
         error = (
             f"{err}\n\nMoviePy error: FFMPEG encountered the following error while "
@@ -146,14 +445,18 @@ class FFMPEG_AudioWriter:
     def close(self):
         """Closes the writer, terminating the subprocess if is still alive."""
         if hasattr(self, "proc") and self.proc:
-            self.proc.stdin.close()
-            self.proc.stdin = None
-            if self.proc.stderr is not None:
-                self.proc.stderr.close()
-                self.proc.stderr = None
-            # If this causes deadlocks, consider terminating instead.
-            self.proc.wait()
-            self.proc = None
+            proc, self.proc = self.proc, None
+            progress_thread, self.progress_thread = self.progress_thread, None
+            output_copier, self.output_copier = self.output_copier, None
+            finish_proc(proc, progress_thread, self.close_timeout, output_copier)
+            # streamed wav sizes are unknown while writing, fill them in if the target can seek
+            if self.output is not None and self.ext == "wav" and getattr(self.output, "seekable", lambda: False)():
+                fix_wav_header(self.output)
+
+    def getvalue(self):
+        """Encoded bytes of a writer created with filename=None. Call after `close()`."""
+        assert self.buffer is not None, "getvalue() is only available with filename=None"
+        return self.buffer.getvalue()
 
     def __del__(self):
         # If the garbage collector comes, make sure the subprocess is terminated.
@@ -167,8 +470,76 @@ class FFMPEG_AudioWriter:
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
 
-class FFMPEG_VideoWriter:
+class AudioPipe:
+    """
+    (n_samples, n_channels) audio given to an encoder as a second raw input, through a pipe written by a
+    background thread, so the audio of a video file never goes through a temporary file (POSIX only, pass_fds).
+    Pass it as the `audiofile` of `FFMPEG_VideoWriter`. Samples are converted as by `FFMPEG_AudioWriter`.
+    """
+    # same conversion (and reused buffers) as the audio writer
+    audio_array_to_bytes = FFMPEG_AudioWriter.audio_array_to_bytes
+
+    def __init__(self, audio_array, fps, nbytes=2, nchannels=2, is_raw_audio=False, chunk_size=1 << 18):
+        assert IS_POSIX_OS, "AudioPipe needs pass_fds, which is POSIX only"
+        self.audio_array = audio_array
+        self.fps = fps
+        self.nbytes = nbytes
+        self.nchannels = nchannels
+        self.is_raw_audio = is_raw_audio
+        self.chunk_size = chunk_size
+        self.scaled_buffer = None
+        self.samples_buffer = None
+        self.error = None
+        self.thread = None
+        self.read_fd, self.write_fd = os.pipe()
+
+    def input_params(self):
+        return [
+            "-f", "s%dle" % (8 * self.nbytes),
+            "-ar", "%d" % self.fps,
+            "-ac", "%d" % self.nchannels,
+            "-i", "pipe:%d" % self.read_fd,
+        ]
+
+    def start(self):
+        """Feed the pipe, once ffmpeg has inherited its read end"""
+        os.close(self.read_fd)
+        self.thread = threading.Thread(target=self._feed, daemon=True)
+        self.thread.start()
+
+    def _feed(self):
+        try:
+            with os.fdopen(self.write_fd, "wb") as f:
+                for inx in range(0, len(self.audio_array), self.chunk_size):
+                    f.write(self.audio_array_to_bytes(self.audio_array[inx:inx + self.chunk_size]))
+        except BrokenPipeError: # ffmpeg exited, the writer reports its error
+            pass
+        except Exception as err:
+            self.error = err
+
+    def close(self):
+        """Close both ends, if ffmpeg could not be started"""
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+    def join(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
 
+def audio_input_params(audiofile):
+    """ffmpeg input of the audio of a video writer: a file, or an `AudioPipe`"""
+    if isinstance(audiofile, AudioPipe):
+        return audiofile.input_params()
+    return ["-i", audiofile]
+
+class FFMPEG_VideoWriter:
+    """
+    filename: a path, a writable file object, or None to keep the encoded file in memory (`getvalue()`).
+    File objects and None need a streamable `format` (e.g. 'mp4' (fragmented), 'mkv', 'webm', 'ts'),
+    unless `file.name` has an extension.
+    audiofile: a file, or an `AudioPipe` to give audio samples from memory.
+    audio_codec: codec of the audio from `audiofile` (default 'aac', 'copy' to keep it as is, e.g. 'libopus' for webm)
+    """
     def __init__(
         self,
         filename,
@@ -183,62 +554,66 @@ class FFMPEG_VideoWriter:
         threads=None,
         ffmpeg_params=None,
         pixel_format=None,
+        collect_stats=False,
+        progress_callback=None,
+        close_timeout=None,
+        format=None,
+        audio_codec="aac",
     ):
         if logfile is None:
             logfile = sp.PIPE
         self.logfile = logfile
-        self.filename = filename
+        self.close_timeout = close_timeout
+        self.buffer = io.BytesIO() if filename is None else None
+        self.filename = filename if filename is not None else "<memory>"
+        self.output = self.buffer if filename is None else filename if stream_target(filename) else None
         self.codec = codec
-        self.ext = self.filename.split(".")[-1]
+        self.ext = target_ext(filename, format)
+        self.audio_pipe = audiofile if isinstance(audiofile, AudioPipe) else None
         if not pixel_format:  # pragma: no cover
             pixel_format = "rgba" if with_mask else "rgb24"
 
+        cmd = self.input_params(size, fps, pixel_format, collect_stats, progress_callback)
+        if audiofile is not None:
+            cmd.extend(audio_input_params(audiofile) + ["-acodec", audio_codec])
+        cmd.extend(video_codec_params(codec, preset, size, bitrate=bitrate, threads=threads, ffmpeg_params=ffmpeg_params))
+        cmd.extend(output_params(filename, format))
+        self.start(cmd, progress_callback)
+
+    def input_params(self, size, fps, pixel_format, collect_stats=False, progress_callback=None):
+        """ffmpeg command up to the raw frames input on stdin."""
         # order is important
         cmd = [
             FFMPEG_BINARY,
             "-y",
             "-loglevel",
-            "error" if logfile == sp.PIPE else "info",
-            "-f",
-            "rawvideo",
-            "-vcodec",
-            "rawvideo",
-            "-s",
-            "%dx%d" % (size[0], size[1]),
-            "-pix_fmt",
-            pixel_format,
-            "-r",
-            "%.02f" % fps,
-            "-an",
-            "-i",
-            "-",
+            "error" if self.logfile == sp.PIPE else "info",
         ]
-        if audiofile is not None:
-            cmd.extend(["-i", audiofile, "-acodec", "aac"])
-        cmd.extend(["-vcodec", codec, "-preset", preset])
-        if ffmpeg_params is not None:
-            cmd.extend(ffmpeg_params)
-        if bitrate is not None:
-            cmd.extend(["-b", bitrate])
-
-        if threads is not None:
-            cmd.extend(["-threads", str(threads)])
-
-        if (codec == "libx264"):
-            # cmd.extend(["-crf", "0",])
-            if (size[0] % 2 == 0) and (size[1] % 2 == 0):
-                cmd.extend(["-pix_fmt", "yuv420p"])
-
-        cmd.extend([filename])
-
-        popen_params = cross_platform_popen_params(
-            {"stdout": sp.DEVNULL, "stderr": logfile, "stdin": sp.PIPE}
-        )
-        self.proc = sp.Popen(cmd, **popen_params)
+        # machine-readable encoder progress
+        self.stats = None
+        if collect_stats or progress_callback is not None:
+            self.stats = WriterStats(fps)
+        params, self.progress_fds = progress_params(self.stats, self.output is not None)
+        cmd.extend(params)
+        cmd.extend(raw_video_input_params(size, fps, pixel_format))
+        return cmd
+
+    def start(self, cmd, progress_callback=None):
+        pass_fds = [self.audio_pipe.read_fd] if self.audio_pipe is not None else []
+        try:
+            self.proc, self.progress_thread, self.output_copier = start_encoder(
+                cmd, self.logfile, self.stats, progress_callback, self.progress_fds, self.output, pass_fds
+            )
+        except Exception:
+            if self.audio_pipe is not None:
+                self.audio_pipe.close()
+            raise
+        if self.audio_pipe is not None:
+            self.audio_pipe.start()
 
     def write_frames(self, frames_array):
         try:
-            self.proc.stdin.write(frames_array.tobytes())
+            write_to_proc(self.proc, frames_array.tobytes(), len(frames_array), self.stats)
         except IOError as err:
             self.raise_IOError(err)
 
@@ -256,19 +631,15 @@ class FFMPEG_VideoWriter:
     def write_frame(self, img_array):
         """Writes one frame in the file."""
         try:
-            self.proc.stdin.write(img_array.tobytes())
+            write_to_proc(self.proc, img_array.tobytes(), 1, self.stats)
         except IOError as err:
             self.raise_IOError(err)
 
     def raise_IOError(self, err):
-        _, ffmpeg_error = self.proc.communicate()
-        if ffmpeg_error is not None:
-            ffmpeg_error = ffmpeg_error.decode()
-        else:
-            # The error was redirected to a logfile with `write_logfile=True`,
-            # so read the error from that file instead
-            self.logfile.seek(0)
-            ffmpeg_error = self.logfile.read()
+        finish_proc(self.proc, self.progress_thread, self.close_timeout, self.output_copier)
+        self.progress_thread = None
+        self.output_copier = None
+        ffmpeg_error = read_ffmpeg_error(self.proc, self.logfile)
 
         error = (
             f"{err}\n\nMoviePy error: FFMPEG encountered the following error while "
@@ -315,12 +686,20 @@ class FFMPEG_VideoWriter:
     def close(self):
         """Closes the writer, terminating the subprocess if is still alive."""
         if self.proc:
-            self.proc.stdin.close()
-            if self.proc.stderr is not None:
-                self.proc.stderr.close()
-            self.proc.wait()
-
-            self.proc = None
+            proc, self.proc = self.proc, None
+            progress_thread, self.progress_thread = self.progress_thread, None
+            output_copier, self.output_copier = self.output_copier, None
+            finish_proc(proc, progress_thread, self.close_timeout, output_copier)
+            if self.audio_pipe is not None:
+                # ffmpeg exited: the feeder ends on the closed pipe if the audio was not read to the end
+                self.audio_pipe.join()
+                if self.audio_pipe.error is not None:
+                    raise IOError(f"Error writing the audio to ffmpeg: {self.audio_pipe.error}") from self.audio_pipe.error
+
+    def getvalue(self):
+        """Encoded bytes of a writer created with filename=None. Call after `close()`."""
+        assert self.buffer is not None, "getvalue() is only available with filename=None"
+        return self.buffer.getvalue()
 
     # Support the Context Manager protocol, to ensure that resources are cleaned up.
 
@@ -330,6 +709,75 @@ class FFMPEG_VideoWriter:
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
 
+class FFMPEG_MultiVideoWriter(FFMPEG_VideoWriter):
+    """
+    Encode one raw frame stream into several renditions with a single ffmpeg process
+    (split and scale filters), so the frames are generated and piped only once.
+
+    renditions: list of dicts with keys
+      - filename (required)
+      - size: (w, h) of the rendition. None keeps the input size.
+      - codec, preset, bitrate, threads, ffmpeg_params: as in `FFMPEG_VideoWriter`
+      - audio_codec: codec of the audio from `audiofile` (default 'aac', e.g. 'libopus' for webm)
+    e.g. [{"filename": "1080p.mp4"}, {"filename": "360p.mp4", "size": (640, 360), "bitrate": "800k"}]
+    """
+
+    def __init__(
+        self,
+        renditions,
+        size,
+        fps,
+        audiofile=None,
+        resize_algo="bicubic",
+        with_mask=False,
+        logfile=None,
+        pixel_format=None,
+        collect_stats=False,
+        progress_callback=None,
+        close_timeout=None,
+    ):
+        assert len(renditions) > 0, "at least one rendition is needed"
+        if logfile is None:
+            logfile = sp.PIPE
+        self.logfile = logfile
+        self.close_timeout = close_timeout
+        self.renditions = renditions
+        self.buffer = None
+        self.output = None
+        self.filename = ", ".join(rendition["filename"] for rendition in renditions)
+        self.codec = ", ".join(rendition.get("codec", "libx264") for rendition in renditions)
+        self.ext = renditions[0]["filename"].split(".")[-1]
+        self.audio_pipe = audiofile if isinstance(audiofile, AudioPipe) else None
+        if not pixel_format:  # pragma: no cover
+            pixel_format = "rgba" if with_mask else "rgb24"
+
+        cmd = self.input_params(size, fps, pixel_format, collect_stats, progress_callback)
+        if audiofile is not None:
+            cmd.extend(audio_input_params(audiofile))
+
+        graph = ["[0:v]split=%d%s" % (len(renditions), "".join("[s%d]" % inx for inx in range(len(renditions))))]
+        for inx, rendition in enumerate(renditions):
+            if rendition.get("size") is not None:
+                graph.append("[s%d]scale=%d:%d:flags=%s[v%d]" % (inx, *rendition["size"], resize_algo, inx))
+            else:
+                graph.append("[s%d]null[v%d]" % (inx, inx))
+        cmd.extend(["-filter_complex", ";".join(graph)])
+
+        for inx, rendition in enumerate(renditions):
+            cmd.extend(["-map", "[v%d]" % inx])
+            if audiofile is not None:
+                cmd.extend(["-map", "1:a:0", "-acodec", rendition.get("audio_codec", "aac")])
+            cmd.extend(video_codec_params(
+                rendition.get("codec", "libx264"),
+                rendition.get("preset", "slow"),
+                rendition.get("size") or size,
+                bitrate=rendition.get("bitrate"),
+                threads=rendition.get("threads"),
+                ffmpeg_params=rendition.get("ffmpeg_params"),
+            ))
+            cmd.append(rendition["filename"])
+        self.start(cmd, progress_callback)
+
 if __name__ == "__main__":
     test_video = "/Users/kwonmingi/Codes/macocr/test_vid/vid12_xoobAzitHzs.mp4"
     from easy_video import EasyReader
@@ -0,0 +1,254 @@
+import os
+import time
+import threading
+import subprocess as sp
+from collections import deque
+
+# number of stderr lines kept per ffmpeg process
+STDERR_RING_BUFFER_LINES = 200
+
+class StderrDrainer:
+    """
+    Reads an ffmpeg stderr pipe in a background thread into a bounded ring buffer,
+    so ffmpeg never blocks on a full stderr pipe and the last lines stay available for errors.
+    """
+    def __init__(self, stream, maxlen=STDERR_RING_BUFFER_LINES):
+        self.stream = stream
+        self.lines = deque(maxlen=maxlen)
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    def _drain(self):
+        try:
+            for line in iter(self.stream.readline, b""):
+                self.lines.append(line.decode("utf8", errors="ignore"))
+        except (OSError, ValueError): # stream closed under us
+            pass
+        finally:
+            try:
+                self.stream.close()
+            except Exception:
+                pass
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+
+    def text(self):
+        return "".join(list(self.lines))
+
+class FFMPEGGovernor:
+    """
+    Process-wide limiter on concurrent ffmpeg subprocesses, and thread budgeting.
+
+    - max_processes: at most this many ffmpeg processes run at once in this python process.
+      Extra spawns block until a slot is released. None means unlimited.
+      An EasyReader with video and audio holds 2 slots at once, so it must be >= 2.
+    - core_budget: number of cores shared by the ffmpeg processes. Each process gets
+      `core_budget // max_processes` threads (`-threads`), unless the reader or writer
+      sets its own `threads`.
+    - acquire_timeout: seconds a spawn waits for a slot before raising TimeoutError. None waits forever.
+
+    They can be set with `set_ffmpeg_process_limit` or with the environment variables
+    `EASY_VIDEO_MAX_FFMPEG_PROCESSES`, `EASY_VIDEO_FFMPEG_CORE_BUDGET` and `EASY_VIDEO_FFMPEG_ACQUIRE_TIMEOUT`,
+    which are inherited by DataLoader worker processes.
+
+    Probes that don't decode (`probe=True`: header reads of ffmpeg_parse_infos(decode_file=False), the stream
+    parameters and the packet listings, which stream copy) don't wait when the calling thread already holds slots:
+    waiting for a slot it holds itself would never end. Decodes, e.g. ffmpeg_parse_infos(decode_file=True)
+    (EasyReader's default) and EasyReader.count_frames, always wait for a slot: use acquire_timeout to get a
+    TimeoutError instead of a hang if the thread holds all of them.
+
+    It is also the registry of live ffmpeg processes: every process started with `popen`
+    is listed by `list_ffmpeg_processes()` until it is released, and can be killed with
+    `kill_all_ffmpeg_processes()`.
+    """
+    def __init__(self, max_processes=None, core_budget=None, acquire_timeout=None):
+        self._cond = threading.Condition()
+        self._procs = {}
+        # thread id -> number of registered processes it started
+        self._owned = {}
+        self._n_running = 0
+        self._n_waiting = 0
+        self.n_acquired = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.configure(max_processes, core_budget, acquire_timeout)
+
+    def configure(self, max_processes=None, core_budget=None, acquire_timeout=None):
+        assert max_processes is None or max_processes >= 2, "max_processes must be >= 2 (a reader may hold a video and an audio process)"
+        with self._cond:
+            self.max_processes = max_processes
+            self.core_budget = core_budget
+            self.acquire_timeout = acquire_timeout
+            self._cond.notify_all()
+
+    def threads(self):
+        """Default `-threads` for one ffmpeg process. None lets ffmpeg decide."""
+        if self.core_budget is None and self.max_processes is None:
+            return None
+        core_budget = self.core_budget if self.core_budget is not None else (os.cpu_count() or 1)
+        if self.max_processes is None:
+            return max(1, core_budget)
+        return max(1, core_budget // self.max_processes)
+
+    def acquire(self, timeout=None, probe=False):
+        """
+        Wait for a free slot. Returns the queueing delay in seconds.
+        timeout: default `acquire_timeout`, TimeoutError when it expires.
+        probe: don't wait if the calling thread already holds slots.
+        """
+        start = time.perf_counter()
+        owner = threading.get_ident()
+        with self._cond:
+            timeout = self.acquire_timeout if timeout is None else timeout
+            self._n_waiting += 1
+            while (
+                self.max_processes is not None
+                and self._n_running >= self.max_processes
+                and not (probe and self._owned.get(owner))
+            ):
+                remaining = None if timeout is None else timeout - (time.perf_counter() - start)
+                if remaining is not None and remaining <= 0:
+                    self._n_waiting -= 1
+                    raise TimeoutError(
+                        f"no ffmpeg slot after {timeout}s: {self._n_running} of {self.max_processes} processes running. "
+                        "Close the readers and writers that are not used, or raise max_processes."
+                    )
+                self._cond.wait(remaining)
+            self._n_waiting -= 1
+            self._n_running += 1
+            wait_time = time.perf_counter() - start
+            self.n_acquired += 1
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+        return wait_time
+
+    def release(self):
+        with self._cond:
+            self._n_running -= 1
+            self._cond.notify()
+
+    def popen(self, cmd, popen_params, drain_stderr=True, timeout=None, probe=False):
+        """Start an ffmpeg process in a slot. Returns (proc, queueing delay in seconds).
+        The slot is held until `release_proc(proc)`.
+        If stderr is a pipe and `drain_stderr`, it is drained into `proc.stderr_drainer`.
+        timeout, probe: see `acquire`."""
+        wait_time = self.acquire(timeout=timeout, probe=probe)
+        try:
+            proc = sp.Popen(cmd, **popen_params)
+        except Exception:
+            self.release()
+            raise
+        proc.stderr_drainer = None
+        if drain_stderr and popen_params.get("stderr") == sp.PIPE:
+            proc.stderr_drainer = StderrDrainer(proc.stderr)
+        owner = threading.get_ident()
+        with self._cond:
+            self._procs[proc] = {"cmd": cmd, "start_time": time.time(), "owner": owner}
+            self._owned[owner] = self._owned.get(owner, 0) + 1
+        return proc, wait_time
+
+    def communicate(self, cmd, popen_params, input=None, probe=False):
+        """
+        Run an ffmpeg process to completion in a slot: returns (proc, stdout, stderr).
+        If communicate raises (e.g. KeyboardInterrupt), the process is killed. The slot is always released.
+        """
+        proc, _ = self.popen(cmd, popen_params, drain_stderr=False, probe=probe)
+        try:
+            output, error = proc.communicate(input=input)
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        finally:
+            self.release_proc(proc)
+        return proc, output, error
+
+    def release_proc(self, proc, timeout=1):
+        """Release the slot of `proc`. Safe to call more than once."""
+        with self._cond:
+            if proc not in self._procs:
+                return
+            owner = self._procs.pop(proc)["owner"]
+            self._owned[owner] -= 1
+            if not self._owned[owner]:
+                del self._owned[owner]
+        if getattr(proc, "stderr_drainer", None) is not None and proc.poll() is not None:
+            proc.stderr_drainer.join(timeout)
+        self.release()
+
+    def list_processes(self):
+        with self._cond:
+            procs = list(self._procs.items())
+        now = time.time()
+        return [
+            {
+                "pid": proc.pid,
+                "cmd": " ".join(str(c) for c in info["cmd"]),
+                "age": now - info["start_time"],
+                "returncode": proc.poll(),
+                "stderr": proc.stderr_drainer.text() if proc.stderr_drainer is not None else None,
+            }
+            for proc, info in procs
+        ]
+
+    def kill_all(self, timeout=5):
+        """Kill every registered ffmpeg process and release its slot. Returns the killed pids."""
+        with self._cond:
+            procs = list(self._procs)
+        killed = []
+        for proc in procs:
+            if proc.poll() is None:
+                proc.kill()
+                killed.append(proc.pid)
+            try:
+                proc.wait(timeout=timeout)
+            except sp.TimeoutExpired:
+                pass
+            self.release_proc(proc)
+        return killed
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_processes": self.max_processes,
+                "core_budget": self.core_budget,
+                "acquire_timeout": self.acquire_timeout,
+                "threads": self.threads(),
+                "n_running": self._n_running,
+                "n_registered": len(self._procs),
+                "n_waiting": self._n_waiting,
+                "n_acquired": self.n_acquired,
+                "total_wait_time": self.total_wait_time,
+                "max_wait_time": self.max_wait_time,
+                "mean_wait_time": self.total_wait_time / self.n_acquired if self.n_acquired else 0.0,
+            }
+
+
+_GOVERNOR = FFMPEGGovernor(
+    max_processes=int(os.getenv("EASY_VIDEO_MAX_FFMPEG_PROCESSES", "0")) or None,
+    core_budget=int(os.getenv("EASY_VIDEO_FFMPEG_CORE_BUDGET", "0")) or None,
+    acquire_timeout=float(os.getenv("EASY_VIDEO_FFMPEG_ACQUIRE_TIMEOUT", "0")) or None,
+)
+
+def get_ffmpeg_governor():
+    return _GOVERNOR
+
+def set_ffmpeg_process_limit(max_processes=None, core_budget=None, acquire_timeout=None):
+    """
+    e.g. 32 DataLoader workers on a 32-core machine:
+    set_ffmpeg_process_limit(max_processes=2, core_budget=1) in each worker,
+    or EASY_VIDEO_MAX_FFMPEG_PROCESSES=2 EASY_VIDEO_FFMPEG_CORE_BUDGET=1 in the environment.
+    acquire_timeout: raise TimeoutError instead of waiting forever for a slot (EASY_VIDEO_FFMPEG_ACQUIRE_TIMEOUT).
+    """
+    _GOVERNOR.configure(max_processes=max_processes, core_budget=core_budget, acquire_timeout=acquire_timeout)
+
+def get_ffmpeg_governor_stats():
+    return _GOVERNOR.stats()
+
+def list_ffmpeg_processes():
+    """Live (not yet closed) ffmpeg processes: pid, cmd, age, returncode and the stderr tail."""
+    return _GOVERNOR.list_processes()
+
+def kill_all_ffmpeg_processes(timeout=5):
+    return _GOVERNOR.kill_all(timeout=timeout)
@@ -0,0 +1,193 @@
+from collections import OrderedDict
+import numpy as np
+
+class LazyVideoArray:
+    """
+    Array-like view of the frames of a video, decoded only when they are indexed.
+
+    # Example
+    frames = EasyReader("input.mp4", target_resolution=(256, 256)).lazy_video_array()
+    frames.shape # (n_frames, 256, 256, 3), n_frames is exact
+    frame = frames[10] # (256, 256, 3)
+    clip = frames[1000:1064] # seeks to the keyframe before frame 1000, decodes 64 frames (+ the frames since the keyframe)
+    every_10th = frames[::10]
+    some = frames[[900, 5, 900]]
+    video_array = np.asarray(frames) # everything
+
+    Indexing returns numpy arrays (ints, slices with steps, integer and boolean arrays, and the
+    following axes e.g. frames[:10, ::2, ::2]). Every access decodes the missing frames in ascending
+    order, each once. Going forward, frames are decoded sequentially, unless a keyframe lies between
+    the current position and the next frame: then the decoder seeks to it. Going backward, it seeks to
+    the last keyframe before the frame (or restarts from the start).
+    The last `cache_size` decoded frames are kept, so neighbouring accesses don't decode twice.
+
+    The length is exact: it is known when a read reaches the end of the video, or counted by decoding the
+    video once (`EasyReader.count_frames`) when it is needed first (len(), shape, negative indices).
+    Slices with non-negative bounds do not need it.
+
+    Keyframe seeks are used only for keyframes on the output frame grid, and not with target_video_fps
+    (the fps conversion of a seeked decode starts on other frames). For variable frame rate videos,
+    use_keyframes=False decodes from the start instead of seeking, so frame indices always match a full decode.
+    """
+    def __init__(self, reader, start=0, end=-1, cache_size=64, use_keyframes=True):
+        assert start >= 0 and (end == -1 or end >= start), f"invalid frame range [{start}, {end})"
+        self.reader = reader
+        self.start = start
+        self.length = end - start if end != -1 else None
+        self.cache_size = cache_size
+        self.use_keyframes = use_keyframes and reader.target_video_fps is None
+        self.cache = OrderedDict()
+        self.frame_shape = (reader.h, reader.w, reader.depth)
+        self.dtype = np.dtype(np.uint8)
+
+    def __len__(self):
+        if self.length is None:
+            self.length = max(self.reader.count_frames() - self.start, 0)
+        return self.length
+
+    @property
+    def shape(self):
+        return (len(self),) + self.frame_shape
+
+    @property
+    def ndim(self):
+        return 1 + len(self.frame_shape)
+
+    def __repr__(self):
+        length = self.length if self.length is not None else "?"
+        return f"LazyVideoArray({self.reader.filename}, shape=({length}, {', '.join(map(str, self.frame_shape))}), dtype=uint8)"
+
+    def __getitem__(self, key):
+        rest = ()
+        if isinstance(key, tuple):
+            key, rest = (key[0], key[1:]) if key else (slice(None), ())
+        if key is Ellipsis:
+            key, rest = slice(None), (Ellipsis,) + rest
+
+        if isinstance(key, (int, np.integer)):
+            result = self.take([self.check_index(int(key))])[0]
+            return result[rest] if rest else result
+
+        if isinstance(key, slice):
+            start, stop, step = key.start, key.stop, key.step
+            if (
+                (step is None or step > 0)
+                and (start is None or start >= 0)
+                and stop is not None
+                and 0 <= stop <= (self.length if self.length is not None else self.reader.n_frames - self.start)
+            ):
+                # within the (estimated) frames, read up to the end of the video without the exact length
+                result = self.take(np.arange(start or 0, stop, step or 1), truncate=True)
+            else:
+                result = self.take(np.arange(*key.indices(len(self))))
+        else:
+            indices = np.asarray(key)
+            if indices.dtype == bool:
+                if indices.shape != (len(self),):
+                    raise IndexError(f"boolean index of shape {indices.shape} for {len(self)} frames")
+                indices = np.flatnonzero(indices)
+            elif not np.issubdtype(indices.dtype, np.integer):
+                raise IndexError("only integers, slices, ellipsis and integer or boolean arrays are valid indices")
+            if (indices < 0).any():
+                indices = np.where(indices < 0, indices + len(self), indices)
+            result = self.take(indices.reshape(-1)).reshape(indices.shape + self.frame_shape)
+            return result[(slice(None),) * indices.ndim + rest] if rest else result
+        return result[(slice(None),) + rest] if rest else result
+
+    def check_index(self, index):
+        if index < 0:
+            index += len(self)
+        if index < 0 or (self.length is not None and index >= self.length):
+            raise IndexError(f"frame {index} is out of bounds for {self.length} frames")
+        return index
+
+    def take(self, indices, truncate=False):
+        """
+        Frames at `indices`, (n, h, w, depth). Missing frames are decoded in ascending order.
+        At the end of the video, the result stops at the last frame if `truncate`, IndexError otherwise.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        out = np.empty((len(indices),) + self.frame_shape, dtype=np.uint8)
+        if len(indices) and indices.min() < 0:
+            raise IndexError(f"frame {indices.min()} is out of bounds")
+        order = np.argsort(indices, kind="stable")
+        sorted_indices = indices[order]
+        inx = 0
+        while inx < len(order):
+            index = int(sorted_indices[inx])
+            if inx > 0 and index == sorted_indices[inx - 1]: # repeated
+                out[order[inx]] = out[order[inx - 1]]
+                inx += 1
+                continue
+            if index in self.cache:
+                self.cache.move_to_end(index)
+                out[order[inx]] = self.cache[index]
+                inx += 1
+                continue
+            # run of consecutive frames to decode
+            end = inx + 1
+            while (
+                end < len(order)
+                and sorted_indices[end] == sorted_indices[end - 1] + 1
+                and int(sorted_indices[end]) not in self.cache
+            ):
+                end += 1
+            frames = self.read(index, end - inx)
+            out[order[inx:inx + len(frames)]] = frames
+            if len(frames) < end - inx:
+                if not truncate:
+                    raise IndexError(f"frame {index + len(frames)} is out of bounds for {self.length} frames")
+                # ascending indices: the frames before the end are the first ones of `out`
+                return out[:inx + len(frames)]
+            inx = end
+        return out
+
+    def read(self, index, n_frames):
+        """Decode frames index to index + n_frames, seeking when it is faster than decoding forward"""
+        if self.length is not None:
+            n_frames = max(min(n_frames, self.length - index), 0)
+        if n_frames == 0:
+            return np.empty((0,) + self.frame_shape, dtype=np.uint8)
+        reader = self.reader
+        position = self.start + index
+        seek_time, keyframe = reader.keyframe_seek_point(position) if self.use_keyframes else (None, 0)
+        if reader.video_proc is None or position < reader.video_position or keyframe > reader.video_position:
+            reader.start_video(seek_time, keyframe)
+        reader.throw_away_video_frames(position - reader.video_position)
+        frames = reader.get_frames(n_frames)
+        if len(frames) < n_frames: # end of the video
+            self.length = index + len(frames)
+        for inx in range(max(len(frames) - self.cache_size, 0), len(frames)):
+            self.cache[index + inx] = frames[inx].copy()
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return frames
+
+    def __iter__(self):
+        """Frames in order, decoded sequentially, `cache_size` at a time"""
+        inx = 0
+        while self.length is None or inx < self.length:
+            frames = self[inx:inx + max(self.cache_size, 1)]
+            yield from frames
+            if len(frames) < max(self.cache_size, 1):
+                break
+            inx += len(frames)
+
+    def __array__(self, dtype=None, copy=None):
+        if self.length is None:
+            # read to the end once, instead of counting the frames first
+            frames = list(self)
+            video_array = np.stack(frames) if frames else self.take([])
+        else:
+            video_array = self.take(np.arange(self.length))
+        return video_array.astype(dtype) if dtype is not None else video_array
+
+    def close(self):
+        """Terminate the video process"""
+        self.reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,325 @@
+import os
+import math
+import time
+import subprocess as sp
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .ffmpeg_infos import FFmpegInfosParser, cross_platform_popen_params, FFMPEG_BINARY
+from .governor import get_ffmpeg_governor
+from .video_reader import EasyReader
+from .utils import scan_files
+
+MANIFEST_NAME = ".easy_video_manifest.npy"
+
+# one row per file. -1 / nan / b"" where a value is unknown (None in `infos`)
+MANIFEST_FIELDS = [
+    ("size", np.int64), # bytes
+    ("mtime_ns", np.int64),
+    ("probed", np.bool_), # False if ffmpeg could not read the file
+    ("duration", np.float64), # as probed by EasyReader with decode_file=True (header duration if not count_frames)
+    ("start", np.float64),
+    ("bitrate", np.int32), # kb/s
+    ("video_found", np.bool_),
+    ("video_stream", np.int16), # index of the default video stream in the file
+    ("width", np.int32),
+    ("height", np.int32),
+    ("fps", np.float64),
+    ("rotation", np.int16),
+    ("video_codec", "S16"),
+    ("pix_fmt", "S16"),
+    ("video_bitrate", np.int32),
+    ("n_frames", np.int64), # exact number of video packets (frames as stored), -1 if not counted
+    ("n_keyframes", np.int32),
+    ("keyframe_interval", np.float32), # mean seconds between keyframes
+    ("max_keyframe_interval", np.float32),
+    ("audio_found", np.bool_),
+    ("audio_stream", np.int16),
+    ("audio_fps", np.int32),
+    ("audio_nchannels", np.int16),
+    ("audio_channel_layout", "S16"),
+    ("audio_codec", "S16"),
+    ("audio_bitrate", np.int32),
+]
+
+def manifest_dtype(path_length):
+    return np.dtype([("path", "S%d" % max(path_length, 1))] + MANIFEST_FIELDS)
+
+def empty_row():
+    row = {name: -1 for name, dtype in MANIFEST_FIELDS if np.dtype(dtype).kind == "i"}
+    row.update({name: np.nan for name, dtype in MANIFEST_FIELDS if np.dtype(dtype).kind == "f"})
+    row.update({name: False for name, dtype in MANIFEST_FIELDS if np.dtype(dtype).kind == "b"})
+    row.update({name: b"" for name, dtype in MANIFEST_FIELDS if np.dtype(dtype).kind == "S"})
+    return row
+
+def probe_file(filename, count_frames=True):
+    """
+    Manifest row of a file (without path, size and mtime), from one ffmpeg process that doesn't decode.
+    With count_frames, the video and audio packets are stream copied to ffmpeg's framecrc muxer: this
+    gives the exact number of video packets, the keyframes, and the end of the streams (the duration a
+    decode reports). Otherwise only the header is read.
+    """
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-i", filename]
+    if count_frames:
+        cmd.extend(["-map", "0:v:0?", "-map", "0:a:0?", "-c", "copy", "-f", "framecrc", "-"])
+    popen_params = cross_platform_popen_params(
+        {"stdout": sp.PIPE, "stderr": sp.PIPE, "stdin": sp.DEVNULL}
+    )
+    proc, output, error = get_ffmpeg_governor().communicate(cmd, popen_params, probe=True)
+    row = empty_row()
+    text = error.decode("utf8", errors="ignore")
+    if count_frames and proc.returncode != 0:
+        return row
+    try:
+        infos = FFmpegInfosParser(text.split("\nStream mapping:", 1)[0], filename).parse()
+    except Exception:
+        return row
+    if not (infos["video_found"] or infos["audio_found"]):
+        return row
+
+    row["probed"] = True
+    if count_frames:
+        # stream -> time base, end time, number of packets, keyframe times
+        time_bases, ends, counts, keyframes = {}, {}, {}, []
+        for line in output.decode("utf8", errors="ignore").splitlines():
+            if line.startswith("#tb "):
+                stream, time_base = line[4:].split(":", 1)
+                num, den = time_base.strip().split("/")
+                time_bases[int(stream)] = int(num) / int(den)
+            elif line and not line.startswith("#"):
+                # stream, dts, pts, duration, size, crc[, F=flags]. F is omitted for keyframes.
+                fields = [field.strip() for field in line.split(",")]
+                stream = int(fields[0])
+                pts, duration = int(fields[2]) * time_bases[stream], int(fields[3]) * time_bases[stream]
+                ends[stream] = max(ends.get(stream, pts + duration), pts + duration)
+                counts[stream] = counts.get(stream, 0) + 1
+                if stream == 0 and infos["video_found"]:
+                    flags = int(fields[6][2:], 16) if len(fields) > 6 and fields[6].startswith("F=") else 1
+                    if flags & 1:
+                        keyframes.append(pts)
+        if 0 in ends:
+            # the time of the last frame printed by a decode, in centiseconds (the first stream is video if found)
+            infos["duration"] = math.floor(ends[0] * 100 + 1e-6) / 100
+            if infos["video_found"]:
+                infos["video_duration"] = infos["duration"]
+                infos["video_n_frames"] = int(infos["duration"] * infos["video_fps"])
+        if infos["video_found"]:
+            row["n_frames"] = counts.get(0, 0)
+            keyframes = np.sort(keyframes)
+            row["n_keyframes"] = len(keyframes)
+            if len(keyframes) > 1:
+                intervals = np.diff(keyframes)
+                row["keyframe_interval"] = intervals.mean()
+                row["max_keyframe_interval"] = intervals.max()
+
+    row["duration"] = infos.get("duration") if infos.get("duration") is not None else np.nan
+    row["start"] = infos.get("start") if infos.get("start") is not None else np.nan
+    row["bitrate"] = infos.get("bitrate") or -1
+    if infos["video_found"]:
+        row["video_found"] = True
+        row["video_stream"] = infos["default_video_stream_number"]
+        row["width"], row["height"] = infos["video_size"]
+        row["fps"] = infos["video_fps"]
+        row["rotation"] = abs(infos.get("video_rotation", 0))
+        row["video_codec"] = (infos.get("video_codec_name") or "").encode()
+        row["pix_fmt"] = (infos.get("video_pix_fmt") or "").encode()
+        row["video_bitrate"] = infos.get("video_bitrate") or -1
+    if infos["audio_found"]:
+        row["audio_found"] = True
+        row["audio_stream"] = infos["default_audio_stream_number"]
+        row["audio_fps"] = infos["audio_fps"]
+        row["audio_nchannels"] = infos.get("audio_nchannels") or -1
+        row["audio_channel_layout"] = (infos.get("audio_channel_layout") or "").encode()
+        row["audio_codec"] = (infos.get("audio_codec_name") or "").encode()
+        row["audio_bitrate"] = infos.get("audio_bitrate") or -1
+    return row
+
+class VideoManifest:
+    """
+    Table of the video files of a dataset root, saved as a numpy structured array next to them
+    (`<root>/.easy_video_manifest.npy`) and memory mapped when loaded.
+
+    # Example - build once (again after adding files: only new and changed files are probed)
+    manifest = VideoManifest.build("dataset/", exts=("mp4", "mkv"), workers=16)
+
+    # Example - training job startup: no ffmpeg process to list and probe the files
+    manifest = VideoManifest("dataset/")
+    lengths = manifest["n_frames"] # exact frame counts of all files, a column of the table
+    reader = manifest.reader(0, target_resolution=(224, 224)) # EasyReader without probing
+    reader = EasyReader(manifest.path(0), infos=manifest.infos(0)) # same
+    reader = EasyConcatReader(manifest.paths(), infos=manifest.clip_infos())
+
+    Columns: path (relative to the root, utf8), size, mtime_ns, probed, duration, start, bitrate, video_found,
+    video_stream, width, height, fps, rotation, video_codec, pix_fmt, video_bitrate, n_frames, n_keyframes,
+    keyframe_interval, max_keyframe_interval, audio_found, audio_stream, audio_fps, audio_nchannels,
+    audio_channel_layout, audio_codec, audio_bitrate. Rows are sorted by path.
+
+    n_frames is the number of video packets (probe_clips), read without decoding. `infos(i)` is what
+    ffmpeg_parse_infos returns for the file with decode_file=True (EasyReader's default), except the
+    metadata; with count_frames=False only the header is read and it matches decode_file=False.
+    """
+    def __init__(self, root, manifest_file=None, mmap=True):
+        self.root = root
+        self.manifest_file = manifest_file or os.path.join(root, MANIFEST_NAME)
+        self.table = np.load(self.manifest_file, mmap_mode="r" if mmap else None)
+
+    @classmethod
+    def build(cls, root, exts=("mp4",), manifest_file=None, workers=8, count_frames=True, silent=False):
+        """
+        Probe the files of `root` with `exts` (scan_files) and save the manifest. Files already in the
+        manifest with the same size and mtime are not probed again, removed files are dropped.
+        """
+        manifest_file = manifest_file or os.path.join(root, MANIFEST_NAME)
+        previous = {}
+        if os.path.exists(manifest_file):
+            for row in np.load(manifest_file):
+                previous[row["path"].decode("utf8")] = row
+
+        filenames = sorted(scan_files(root, exts=exts, workers=workers))
+        rows, to_probe = {}, []
+        for filename in filenames:
+            path = os.path.relpath(filename, root)
+            stat = os.stat(filename)
+            row = previous.get(path)
+            if (
+                row is not None
+                and row["size"] == stat.st_size
+                and row["mtime_ns"] == stat.st_mtime_ns
+                and not (count_frames and row["probed"] and row["video_found"] and row["n_frames"] < 0)
+            ):
+                rows[path] = row
+            else:
+                to_probe.append((path, filename, stat))
+
+        start = time.perf_counter()
+        if not silent:
+            print(f"\033[92m {len(filenames)} files: probing {len(to_probe)}, {len(rows)} unchanged \033[0m")
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            probed = executor.map(lambda item: probe_file(item[1], count_frames=count_frames), to_probe)
+            for (path, filename, stat), row in zip(to_probe, probed):
+                row.update(path=path.encode("utf8"), size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                rows[path] = row
+
+        paths = sorted(rows)
+        dtype = manifest_dtype(max((len(path.encode("utf8")) for path in paths), default=1))
+        table = np.zeros(len(paths), dtype=dtype)
+        for inx, path in enumerate(paths):
+            row = rows[path]
+            table[inx] = tuple(row[name] for name in dtype.names)
+
+        # written next to it and renamed, the manifest being read by other processes stays complete
+        tmp_file = manifest_file[:-len(".npy")] + ".tmp.npy" if manifest_file.endswith(".npy") else manifest_file + ".tmp.npy"
+        np.save(tmp_file, table)
+        os.replace(tmp_file, manifest_file)
+        if not silent:
+            n_failed = int((~table["probed"]).sum())
+            print(f"\033[92m Done...!! Saved at {manifest_file} ({time.perf_counter() - start:.1f}s, {n_failed} unreadable) \033[0m")
+        return cls(root, manifest_file)
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, key):
+        """A column (manifest["n_frames"]) or rows (manifest[0], manifest[mask])"""
+        return self.table[key]
+
+    def __repr__(self):
+        return f"VideoManifest({self.root}, {len(self)} files)"
+
+    def path(self, index):
+        return os.path.join(self.root, self.table["path"][index].decode("utf8"))
+
+    def paths(self, indices=None):
+        indices = range(len(self)) if indices is None else indices
+        return [self.path(index) for index in indices]
+
+    def index(self, path):
+        """Row of a file (a path as returned by `path()`). KeyError if it is not in the manifest."""
+        if not isinstance(path, (str, os.PathLike)):
+            return int(path)
+        key = os.path.relpath(os.path.abspath(path), os.path.abspath(self.root)).encode("utf8")
+        inx = int(np.searchsorted(self.table["path"], key))
+        if inx == len(self) or self.table["path"][inx] != key:
+            raise KeyError(path)
+        return inx
+
+    def infos(self, index):
+        """ffmpeg_parse_infos of a file (row index or path), for `EasyReader(..., infos=...)`.
+        Without a duration, video_n_frames is the n_frames column if counted, else 1 (like check_duration=False)."""
+        row = self.table[self.index(index)]
+        if not row["probed"]:
+            raise IOError(f"{self.path(self.index(index))} could not be read by ffmpeg")
+
+        def value(field):
+            # -1 and nan are None
+            return None if row[field] < 0 or np.isnan(row[field]) else row[field].item()
+
+        infos = {
+            "video_found": bool(row["video_found"]),
+            "audio_found": bool(row["audio_found"]),
+            "metadata": {},
+            "inputs": [],
+            "duration": value("duration"),
+            "bitrate": value("bitrate"),
+            "start": value("start"),
+        }
+        if infos["video_found"]:
+            infos.update(
+                default_video_input_number=0,
+                default_video_stream_number=int(row["video_stream"]),
+                video_size=[int(row["width"]), int(row["height"])],
+                video_bitrate=value("video_bitrate"),
+                video_fps=float(row["fps"]),
+                video_codec_name=row["video_codec"].decode() or None,
+                video_pix_fmt=row["pix_fmt"].decode() or None,
+            )
+            if row["rotation"]:
+                infos["video_rotation"] = int(row["rotation"])
+            if infos["duration"] is not None:
+                infos["video_n_frames"] = int(infos["duration"] * infos["video_fps"])
+                infos["video_duration"] = infos["duration"]
+            elif row["n_frames"] >= 0:
+                # no duration in the headers: the counted packets
+                infos["video_n_frames"] = int(row["n_frames"])
+                infos["video_duration"] = infos["video_n_frames"] / infos["video_fps"]
+            else:
+                # as ffmpeg_parse_infos(check_duration=False)
+                infos["video_n_frames"] = 1
+                infos["video_duration"] = None
+        else:
+            infos["video_n_frames"] = 1
+            infos["video_duration"] = None
+        if infos["audio_found"]:
+            infos.update(
+                default_audio_input_number=0,
+                default_audio_stream_number=int(row["audio_stream"]),
+                audio_fps=int(row["audio_fps"]),
+                audio_nchannels=value("audio_nchannels"),
+                audio_channel_layout=row["audio_channel_layout"].decode() or None,
+                audio_bitrate=value("audio_bitrate"),
+                audio_codec_name=row["audio_codec"].decode() or None,
+            )
+        return infos
+
+    def clip_infos(self, indices=None):
+        """probe_clips results of the files (None for files without video), for `EasyConcatReader(..., infos=...)`"""
+        indices = range(len(self)) if indices is None else indices
+        infos = []
+        for index in indices:
+            row = self.table[self.index(index)]
+            if not (row["probed"] and row["video_found"]) or row["n_frames"] < 0:
+                infos.append(None)
+                continue
+            infos.append({
+                "n_frames": int(row["n_frames"]),
+                "size": (int(row["width"]), int(row["height"])),
+                "fps": float(row["fps"]),
+                "codec_name": row["video_codec"].decode() or None,
+                "pix_fmt": row["pix_fmt"].decode() or None,
+                "rotation": int(row["rotation"]),
+            })
+        return infos
+
+    def reader(self, index, **kwargs):
+        """EasyReader of a file (row index or path), without probing it"""
+        inx = self.index(index)
+        return EasyReader(self.path(inx), infos=self.infos(inx), **kwargs)
@@ -0,0 +1,131 @@
+import os
+import struct
+import tempfile
+import threading
+import subprocess as sp
+from .os_dependency import IS_POSIX_OS
+
+# bytes written to ffmpeg stdin per write call
+FEED_CHUNK_SIZE = 1 << 20
+
+def is_memory_input(source):
+    """True for bytes, bytearray, memoryview, readable file objects and MemoryInput."""
+    return isinstance(source, (bytes, bytearray, memoryview, MemoryInput)) or hasattr(source, "read")
+
+def mp4_needs_seeking(data):
+    """
+    True if `data` is an mp4/mov whose index (moov box) comes after the media data (mdat box).
+    ffmpeg cannot read such a file from a pipe, it needs to seek back to the media data.
+    Files written with `-movflags faststart` or fragmented mp4 do not need seeking.
+    """
+    offset = 0
+    first = True
+    while offset + 8 <= len(data):
+        size, box_type = struct.unpack(">I4s", data[offset:offset + 8])
+        if first and box_type not in (b"ftyp", b"styp"):
+            return False # not an ISO base media file
+        first = False
+        if box_type == b"moov" or box_type == b"moof":
+            return False
+        if box_type == b"mdat":
+            return True
+        if size == 1: # 64-bit size
+            if offset + 16 > len(data):
+                return False
+            size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+        elif size == 0: # box extends to the end of the file
+            return False
+        if size < 8:
+            return False
+        offset += size
+    return False
+
+class MemoryInput:
+    """
+    A video or audio file held in memory (bytes, bytearray, memoryview or a readable file object),
+    fed to ffmpeg over stdin by a feeder thread, so it never touches the disk.
+
+    A file object is read once, as every ffmpeg process (probe, video, audio) gets its own copy of the stream.
+    mp4/mov files with the index at the end cannot be read from a pipe: they are written once to a
+    temporary file (in /dev/shm when available, or `spill_dir`), removed on `close()`.
+    """
+    def __init__(self, source, spill_dir=None):
+        if isinstance(source, MemoryInput):
+            source = source.data
+        if hasattr(source, "read"):
+            source = source.read()
+        self.data = memoryview(source).cast("B")
+        self.path = None
+        if mp4_needs_seeking(self.data):
+            if spill_dir is None and IS_POSIX_OS and os.path.isdir("/dev/shm"):
+                spill_dir = "/dev/shm"
+            with tempfile.NamedTemporaryFile(prefix="easy_video_", suffix=".mp4", dir=spill_dir, delete=False) as f:
+                f.write(self.data)
+                self.path = f.name
+
+    @property
+    def input_name(self):
+        """ffmpeg `-i` argument"""
+        return self.path if self.path is not None else "pipe:0"
+
+    @property
+    def uses_stdin(self):
+        return self.path is None
+
+    def feed(self, proc):
+        """Write the data to `proc.stdin` in a background thread, then close it."""
+        thread = threading.Thread(target=self._feed, args=(proc.stdin,), daemon=True)
+        thread.start()
+        return thread
+
+    def _feed(self, stdin):
+        try:
+            for offset in range(0, len(self.data), FEED_CHUNK_SIZE):
+                stdin.write(self.data[offset:offset + FEED_CHUNK_SIZE])
+        except (BrokenPipeError, OSError, ValueError): # ffmpeg exited or was closed before reading everything
+            pass
+        finally:
+            try:
+                stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+    def close(self):
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+    def __del__(self):
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        return f"<MemoryInput {len(self.data)} bytes{', spilled to ' + self.path if self.path else ''}>"
+
+    __str__ = __repr__
+
+
+def input_name(source):
+    """ffmpeg `-i` argument for a filename or a MemoryInput"""
+    return source.input_name if isinstance(source, MemoryInput) else source
+
+def stdin_param(source):
+    """Popen `stdin` for a filename or a MemoryInput"""
+    return sp.PIPE if isinstance(source, MemoryInput) and source.uses_stdin else sp.DEVNULL
+
+def feed_stdin(source, proc):
+    """Start feeding `proc` if `source` is a MemoryInput read over stdin."""
+    if isinstance(source, MemoryInput) and source.uses_stdin:
+        source.feed(proc)
+
+def stdin_data(source):
+    """`communicate(input=...)` for a filename or a MemoryInput"""
+    return source.data if isinstance(source, MemoryInput) and source.uses_stdin else None
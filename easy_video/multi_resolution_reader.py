@@ -0,0 +1,256 @@
+import os
+import subprocess as sp
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .video_reader import EasyReader
+from .ffmpeg_infos import cross_platform_popen_params, FFMPEG_BINARY
+from .memory_input import input_name, stdin_param, feed_stdin
+
+class EasyMultiResolutionReader(EasyReader):
+    """
+    Decode a video once and read it at several resolutions.
+    ffmpeg splits the decoded frames with a filter graph and writes every resolution to its own pipe,
+    so the frames of all resolutions stay in lockstep.
+    get_frames, get_video_array, the random frame getters, the chunk and window iterators return a tuple
+    of arrays, one per resolution.
+
+    # Example - 224x224 for the model and 64x64 thumbnails from one decode
+    with EasyMultiResolutionReader("filename.mp4", resolutions=[(224, 224), (64, 64)]) as er:
+        for video_224, video_64 in er.video_array_chunk_iterator(chunksize=128):
+            print(video_224.shape, video_64.shape) # (128, 224, 224, 3) (128, 64, 64, 3)
+
+    `resolutions` entries follow `target_resolution`: (w, h), or (w, None) / (None, h) to keep the ratio.
+    None reads the source resolution. Only supported on POSIX systems (extra pipes are passed by fd).
+    state() / from_state() / seek() work as in EasyReader, the saved frame hash is the one of the first resolution.
+    """
+    def __init__(self, filename, resolutions, **kwargs):
+        assert os.name == "posix", "EasyMultiResolutionReader needs pass_fds, which is POSIX only"
+        assert len(resolutions) > 0, "resolutions is empty"
+        assert kwargs.get("target_resolution") is None and kwargs.get("target_resolution_ratio") is None, "use resolutions instead"
+        # json (from_state) turns tuples into lists
+        self.resolutions = [tuple(resolution) if resolution is not None else None for resolution in resolutions]
+        self.extra_pipes = []
+        self.executor = ThreadPoolExecutor(max_workers=len(self.resolutions))
+        super().__init__(filename, **kwargs)
+        self.options["resolutions"] = self.resolutions
+
+    def initialize(self):
+        if self.load_video and self.video_found:
+            self.sizes = [tuple(self.target_size(resolution)) for resolution in self.resolutions]
+            self.size = self.sizes[0]
+            self.w, self.h = self.size
+            self.frame_bytesize = self.w * self.h * self.depth
+            self.frame_bytesizes = [w * h * self.depth for w, h in self.sizes]
+        super().initialize()
+
+    def filter_graph(self):
+        """[0:v] -> (crop) -> split -> one scale per resolution, labeled [v0], [v1], ..."""
+        n = len(self.sizes)
+        head = "[0:v]"
+        if self.centercrop:
+            head += "crop=%d:%d," % tuple(self.crop_size)
+        graph = [head + "split=%d" % n + "".join("[s%d]" % i for i in range(n))]
+        for i, size in enumerate(self.sizes):
+            if size == tuple(self.source_size):
+                graph.append("[s%d]null[v%d]" % (i, i))
+            else:
+                graph.append("[s%d]scale=%d:%d:flags=%s[v%d]" % (i, size[0], size[1], self.resize_algo, i))
+        return ";".join(graph)
+
+    def video_proc_initialize(self):
+        if self.video_proc is None:
+            # the first resolution goes to stdout, the others to extra pipes
+            fds = [os.pipe() for _ in self.sizes[1:]]
+            targets = ["-"] + ["pipe:%d" % write_fd for _, write_fd in fds]
+
+            cmd = (
+                [FFMPEG_BINARY]
+                + self.threads_params()
+                + (["-ss", "%.6f" % self.video_seek_time] if self.video_seek_time else [])
+                + ["-i", input_name(self.filename)]
+                + ["-loglevel", "error", "-filter_complex", self.filter_graph()]
+            )
+            for i, target in enumerate(targets):
+                cmd += ["-map", "[v%d]" % i]
+                if self.target_video_fps is not None:
+                    cmd += ["-r", str(self.target_video_fps)]
+                cmd += [
+                    "-f",
+                    "image2pipe",
+                    "-pix_fmt",
+                    self.pixel_format,
+                    "-vcodec",
+                    "rawvideo",
+                    target,
+                ]
+
+            popen_params = cross_platform_popen_params(
+                {
+                    "bufsize": self.bufsize,
+                    "stdout": sp.PIPE,
+                    "stderr": sp.PIPE,
+                    "stdin": stdin_param(self.filename),
+                    "pass_fds": [write_fd for _, write_fd in fds],
+                }
+            )
+
+            try:
+                self.video_proc = self.popen(cmd, popen_params)
+            finally:
+                # only ffmpeg keeps the write ends, so the reads see EOF when it exits
+                for _, write_fd in fds:
+                    os.close(write_fd)
+            feed_stdin(self.filename, self.video_proc)
+            self.extra_pipes = [
+                os.fdopen(read_fd, "rb", buffering=frame_bytesize + 100)
+                for (read_fd, _), frame_bytesize in zip(fds, self.frame_bytesizes[1:])
+            ]
+
+    def video_pipes(self):
+        return [self.video_proc.stdout] + self.extra_pipes
+
+    def close(self, emit_stats=True, release_inputs=True):
+        # close the extra pipes first, so ffmpeg is not left blocked writing to them
+        for pipe in getattr(self, "extra_pipes", []):
+            pipe.close()
+        self.extra_pipes = []
+        super().close(emit_stats=emit_stats, release_inputs=release_inputs)
+
+    def __del__(self):
+        super().__del__()
+        if getattr(self, "executor", None) is not None:
+            self.executor.shutdown(wait=False)
+
+    def throw_away_video_frames(self, n_frames):
+        """Throw away n_frames of every resolution"""
+        self.now_frame += n_frames
+        self.video_position += n_frames
+        self.last_frame = None
+        # all pipes are drained concurrently: ffmpeg blocks if any one of them is full
+        list(self.executor.map(
+            lambda pipe, frame_bytesize: self.throw_away_stream(pipe, n_frames * frame_bytesize),
+            self.video_pipes(),
+            self.frame_bytesizes,
+        ))
+
+    def get_frames(self, n_frames):
+        """
+        Get n_frames of every resolution
+        return a tuple of numpy arrays of shape (n_frames, h, w, depth), (0~255), one per resolution
+        """
+        if self.video_proc is None:
+            raise Exception("Video not loaded")
+
+        # all pipes are read concurrently: ffmpeg blocks if any one of them is full
+        with self.stats_timer("read_time"):
+            buffers = list(self.executor.map(
+                lambda pipe, frame_bytesize: pipe.read(n_frames * frame_bytesize),
+                self.video_pipes(),
+                self.frame_bytesizes,
+            ))
+        with self.stats_timer("convert_time"):
+            # keep the resolutions in lockstep if a pipe ended early
+            n_read = min(len(s) // frame_bytesize for s, frame_bytesize in zip(buffers, self.frame_bytesizes))
+            result = []
+            for s, (w, h), frame_bytesize in zip(buffers, self.sizes, self.frame_bytesizes):
+                array = np.frombuffer(s, dtype="uint8", count=n_read * frame_bytesize)
+                array.shape = (n_read, h, w, self.depth)
+                result.append(array)
+        self.stats_add("bytes_read", sum(len(s) for s in buffers))
+        self.stats_add("frames_read", n_read)
+        self.video_position += n_read
+        if n_read > 0:
+            self.last_frame = result[0][-1].copy()
+        return tuple(result)
+
+    def video_array_chunk_iterator(self, chunksize=128, dtype=np.uint8):
+        """
+        Get video frames of every resolution
+        return a tuple of numpy arrays of shape (chunksize, h, w, depth), (0~255), one per resolution
+        """
+        for i in range(self.video_position, self.n_frames, chunksize):
+            arrays = self.get_frames(chunksize)
+            if arrays[0].shape[0] == 0: # if the last chunk is empty,
+                break
+            yield tuple(array.astype(dtype) for array in arrays)
+
+    def video_array_audio_array_chunk_iterator(self, chunksize=128, dtype=np.uint8):
+        """
+        Get video frames of every resolution and the audio of the chunk
+        return a tuple of numpy arrays (one per resolution), and audio array (audio_fps/video_fps) * chunksize, n_channels, (-1~1)
+        """
+        for i in range(self.video_position, self.n_frames, chunksize):
+            video_arrays = self.get_frames(chunksize)
+            audio_array = self.get_audios(self.audio_n_frames_by_video_n_frames(chunksize))
+            if video_arrays[0].shape[0] == 0: # if the last chunk is empty,
+                break
+            yield tuple(array.astype(dtype) for array in video_arrays), audio_array
+
+    def lazy_video_array(self, start=0, end=-1, cache_size=64, use_keyframes=True):
+        raise NotImplementedError("lazy_video_array reads one resolution: use EasyReader(filename, target_resolution=...).lazy_video_array()")
+
+    def take_frames(self, video_arrays, start, end):
+        """frames [start, end) of every resolution"""
+        return tuple(array[start:end] for array in video_arrays)
+
+    def get_frames_into(self, outs):
+        """
+        Read len(outs[0]) frames of every resolution straight into preallocated uint8 arrays, one per resolution
+        return the number of frames read (less than len(outs[0]) at the end of the video)
+        """
+        if self.video_proc is None:
+            raise Exception("Video not loaded")
+
+        # all pipes are read concurrently: ffmpeg blocks if any one of them is full
+        with self.stats_timer("read_time"):
+            nbytes = list(self.executor.map(
+                lambda pipe, out: pipe.readinto(memoryview(out).cast("B")),
+                self.video_pipes(),
+                outs,
+            ))
+        n_read = min(n // frame_bytesize for n, frame_bytesize in zip(nbytes, self.frame_bytesizes))
+        self.stats_add("bytes_read", sum(nbytes))
+        self.stats_add("frames_read", n_read)
+        self.video_position += n_read
+        if n_read > 0:
+            self.last_frame = outs[0][n_read - 1].copy()
+        return n_read
+
+    def video_array_window_iterator(self, window=64, stride=16, with_audio=False, drop_last=True, copy=False):
+        """
+        Get overlapping windows of `window` frames of every resolution, one every `stride` frames.
+        As in EasyReader, the windows are views of ring buffers overwritten by the next windows (copy=True to keep them).
+        return a tuple of numpy arrays of shape (window, h, w, depth), (0~255), one per resolution,
+        and with_audio, the audio array of the frames of the window, (n_samples, n_channels), (-1~1)
+        """
+        assert window > 0 and stride > 0, "window and stride must be positive"
+        capacity = max(2 * window, window + stride)
+        buffers = [np.empty((capacity, h, w, self.depth), dtype=np.uint8) for w, h in self.sizes]
+        lo = hi = 0
+        audio = None
+        while True:
+            need = window - (hi - lo)
+            if hi + need > capacity:
+                for buffer in buffers:
+                    buffer[:hi - lo] = buffer[lo:hi]
+                lo, hi = 0, hi - lo
+            n_read = self.get_frames_into([buffer[hi:hi + need] for buffer in buffers])
+            hi += n_read
+            if n_read < need and (drop_last or n_read == 0): # end of the video
+                break
+
+            video_arrays = tuple(buffer[lo:hi].copy() if copy else buffer[lo:hi] for buffer in buffers)
+            if with_audio:
+                first_frame = self.video_position - (hi - lo)
+                audio = self.window_audio(audio, first_frame, self.video_position)
+                yield video_arrays, audio
+            else:
+                yield video_arrays
+            if n_read < need:
+                break
+
+            if stride >= window:
+                self.throw_away_video_frames(stride - window)
+                lo = hi
+            else:
+                lo += stride
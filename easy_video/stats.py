@@ -0,0 +1,200 @@
+import time
+import threading
+from contextlib import contextmanager
+
+class ReaderStats:
+    """
+    Per-stage counters of a reader. Enable with `EasyReader(..., collect_stats=True)`.
+
+    - probe_time: seconds spent in `ffmpeg_parse_infos`
+    - queue_time: seconds waiting for a free ffmpeg slot (see `set_ffmpeg_process_limit`)
+    - spawn_time: seconds spent starting ffmpeg processes
+    - read_time: seconds blocked on `stdout.read`
+    - convert_time: seconds spent converting bytes to numpy arrays
+    - discard_time: seconds spent in `throw_away_chunks`
+    - bytes_read, bytes_discarded, frames_read, audio_frames_read, n_spawns, n_restarts
+
+    Every update is also added to the parent stats (the global stats by default),
+    so `get_global_reader_stats()` aggregates all readers of the process.
+    """
+    FIELDS = (
+        "probe_time",
+        "queue_time",
+        "spawn_time",
+        "read_time",
+        "convert_time",
+        "discard_time",
+        "bytes_read",
+        "bytes_discarded",
+        "frames_read",
+        "audio_frames_read",
+        "n_spawns",
+        "n_restarts",
+    )
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            for field in self.FIELDS:
+                setattr(self, field, 0)
+
+    def add(self, field, value):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + value)
+        if self.parent is not None:
+            self.parent.add(field, value)
+
+    @contextmanager
+    def timer(self, field):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(field, time.perf_counter() - start)
+
+    @property
+    def fps(self):
+        """Frames delivered per second of time spent reading and converting."""
+        busy = self.read_time + self.convert_time
+        return self.frames_read / busy if busy > 0 else 0.0
+
+    @property
+    def read_bandwidth(self):
+        """Bytes per second while blocked on the pipe."""
+        return self.bytes_read / self.read_time if self.read_time > 0 else 0.0
+
+    def to_dict(self):
+        with self._lock:
+            result = {field: getattr(self, field) for field in self.FIELDS}
+        result["fps"] = self.fps
+        result["read_bandwidth"] = self.read_bandwidth
+        return result
+
+    def __repr__(self):
+        return f"ReaderStats({self.to_dict()})"
+
+
+_GLOBAL_READER_STATS = ReaderStats()
+_READER_STATS_HOOKS = []
+
+def get_global_reader_stats():
+    """Stats aggregated over every reader created with `collect_stats=True`."""
+    return _GLOBAL_READER_STATS
+
+def reset_global_reader_stats():
+    _GLOBAL_READER_STATS.reset()
+
+def add_reader_stats_hook(hook):
+    """
+    Register `hook(filename, stats_dict)`, called when a reader with stats is closed.
+    Use it to export to your own metrics system.
+    """
+    _READER_STATS_HOOKS.append(hook)
+
+def remove_reader_stats_hook(hook):
+    _READER_STATS_HOOKS.remove(hook)
+
+def emit_reader_stats(filename, stats):
+    for hook in list(_READER_STATS_HOOKS):
+        hook(filename, stats.to_dict())
+
+
+class WriterStats:
+    """
+    Encoder progress of a writer, parsed from ffmpeg's `-progress` stream.
+    Enable with `FFMPEG_VideoWriter(..., collect_stats=True)` or by passing a `progress_callback`.
+
+    - frame, fps, speed, total_size, bitrate (kbits/s), out_time (seconds): as reported by ffmpeg
+    - frames_submitted, bytes_submitted: what python has written to the encoder pipe
+      (frames for video writers, samples for audio writers)
+    - write_time: seconds python was blocked on `stdin.write`
+    - queue_time: seconds waited for a free ffmpeg slot before the encoder started
+    - queue_depth: submitted frames the encoder has not finished yet.
+      A large `queue_depth` and `write_time` means the run is encoder-bound,
+      a queue depth near 0 means it is producer-bound.
+    """
+    def __init__(self, input_fps):
+        self.input_fps = input_fps
+        self._lock = threading.Lock()
+        self.frames_submitted = 0
+        self.bytes_submitted = 0
+        self.write_time = 0.0
+        self.queue_time = 0.0
+        self.frame = 0
+        self.fps = 0.0
+        self.speed = None
+        self.total_size = 0
+        self.bitrate = None
+        self.out_time = 0.0
+        self.finished = False
+
+    def add_submitted(self, n_frames, nbytes, write_time):
+        with self._lock:
+            self.frames_submitted += n_frames
+            self.bytes_submitted += nbytes
+            self.write_time += write_time
+
+    def update_progress(self, block):
+        """Update from one `key=value` block of ffmpeg's progress output."""
+        def number(value, suffix=""):
+            value = value.strip()
+            if suffix and value.endswith(suffix):
+                value = value[:-len(suffix)]
+            try:
+                return float(value)
+            except ValueError: # "N/A"
+                return None
+
+        with self._lock:
+            if "frame" in block:
+                self.frame = int(block["frame"])
+            if "fps" in block:
+                self.fps = number(block["fps"]) or 0.0
+            if "speed" in block:
+                self.speed = number(block["speed"], "x")
+            if "total_size" in block:
+                self.total_size = int(number(block["total_size"]) or 0)
+            if "bitrate" in block:
+                self.bitrate = number(block["bitrate"], "kbits/s")
+            if "out_time_us" in block:
+                out_time_us = number(block["out_time_us"])
+                if out_time_us is not None:
+                    self.out_time = max(out_time_us, 0) / 1e6
+            self.finished = block.get("progress") == "end"
+
+    @property
+    def encoded_frames(self):
+        # audio progress has no `frame` field, so estimate it from the output time
+        if self.frame:
+            return self.frame
+        return int(self.out_time * self.input_fps)
+
+    @property
+    def queue_depth(self):
+        return max(self.frames_submitted - self.encoded_frames, 0)
+
+    def to_dict(self):
+        with self._lock:
+            result = {
+                "frame": self.frame,
+                "fps": self.fps,
+                "speed": self.speed,
+                "total_size": self.total_size,
+                "bitrate": self.bitrate,
+                "out_time": self.out_time,
+                "frames_submitted": self.frames_submitted,
+                "bytes_submitted": self.bytes_submitted,
+                "write_time": self.write_time,
+                "queue_time": self.queue_time,
+                "finished": self.finished,
+            }
+        result["encoded_frames"] = self.encoded_frames
+        result["queue_depth"] = self.queue_depth
+        return result
+
+    def __repr__(self):
+        return f"WriterStats({self.to_dict()})"
@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .video_reader import EasyReader
+
+class EasySyncReader:
+    """
+    Read several videos of the same scene (e.g. multi-view cameras) in lockstep.
+    Every view is decoded by its own ffmpeg process, the views are read concurrently in threads,
+    and every chunk is stacked in one preallocated buffer of shape (views, frames, h, w, depth).
+
+    # Example - 4 cameras, 64 frames per chunk, 25 fps, 256x256
+    with EasySyncReader(["cam0.mp4", "cam1.mp4", "cam2.mp4", "cam3.mp4"], video_fps=25, target_resolution=(256, 256)) as reader:
+        for video_array in reader.video_array_chunk_iterator(chunksize=64):
+            print(video_array.shape) # (4, 64, 256, 256, 3)
+
+    - video_fps: common frame rate. Views with another frame rate are resampled by ffmpeg. Default: fps of the first view.
+    - align_start: skip the frames a view has before the latest container start time, so frame i of every view has the same timestamp.
+    - offsets: extra seconds to skip per view (e.g. measured clock offsets of the cameras).
+    - Iteration stops at the end of the shortest view.
+    - The yielded array is a view of the buffer, which is overwritten by the next chunk. Copy it to keep it (`copy=True`).
+    """
+    def __init__(
+            self,
+            filenames,
+            video_fps=None,
+            target_resolution=None,
+            target_resolution_ratio=None,
+            resize_algo="bicubic",
+            centercrop=False,
+            pixel_format="rgb24",
+            align_start=True,
+            offsets=None,
+            decode_file=True,
+            threads=None,
+            collect_stats=False,
+            close_timeout=5,
+        ):
+        self.filenames = list(filenames)
+        assert len(self.filenames) > 0, "filenames is empty"
+        self.executor = ThreadPoolExecutor(max_workers=len(self.filenames))
+        self.readers = []
+
+        def open_reader(filename, target_video_fps=None):
+            return EasyReader(
+                filename,
+                decode_file=decode_file,
+                pixel_format=pixel_format,
+                target_resolution=target_resolution,
+                target_resolution_ratio=target_resolution_ratio,
+                target_video_fps=target_video_fps,
+                resize_algo=resize_algo,
+                centercrop=centercrop,
+                threads=threads,
+                collect_stats=collect_stats,
+                close_timeout=close_timeout,
+            )
+
+        # probe and start every view concurrently
+        self.readers = list(self.executor.map(open_reader, self.filenames))
+        self.video_fps = video_fps if video_fps is not None else self.readers[0].video_fps
+        for inx, reader in enumerate(self.readers):
+            if abs(reader.video_fps - self.video_fps) > 1e-3:
+                # resample this view to the common frame rate
+                reader.close()
+                self.readers[inx] = open_reader(self.filenames[inx], target_video_fps=self.video_fps)
+
+        sizes = set(tuple(reader.size) for reader in self.readers)
+        assert len(sizes) == 1, f"views have different sizes {sizes}, set target_resolution"
+        self.w, self.h = self.readers[0].size
+        self.depth = self.readers[0].depth
+
+        # frames to skip per view, so that all views start at the same timestamp
+        starts = [(reader.infos.get("start") or 0.0) if align_start else 0.0 for reader in self.readers]
+        lags = [max(starts) - start + (offsets[inx] if offsets is not None else 0.0) for inx, start in enumerate(starts)]
+        self.skip_frames = [int(round((lag - min(lags)) * self.video_fps)) for lag in lags]
+        list(self.executor.map(lambda reader, skip: reader.throw_away_video_frames(skip), self.readers, self.skip_frames))
+
+        self.n_frames = min(reader.n_frames - skip for reader, skip in zip(self.readers, self.skip_frames))
+        self.buffer = None
+
+    def get_frames(self, n_frames):
+        """
+        Read n_frames of every view into the buffer
+        return a numpy array of shape (views, n, h, w, depth), (0~255), a view of the buffer. n < n_frames at the end.
+        """
+        if self.buffer is None or self.buffer.shape[1] < n_frames:
+            self.buffer = np.empty((len(self.readers), n_frames, self.h, self.w, self.depth), dtype=np.uint8)
+        buffer = self.buffer[:, :n_frames]
+        n_read = list(self.executor.map(lambda reader, out: reader.get_frames_into(out), self.readers, buffer))
+        return buffer[:, :min(n_read)]
+
+    def video_array_chunk_iterator(self, chunksize=128, copy=False):
+        """
+        Get chunks of all views in lockstep
+        return a numpy array of shape (views, chunksize, h, w, depth), (0~255)
+        """
+        while True:
+            video_array = self.get_frames(chunksize)
+            if video_array.shape[1] == 0: # if the last chunk is empty,
+                break
+            yield video_array.copy() if copy else video_array
+            if video_array.shape[1] < chunksize: # one of the views ended
+                break
+
+    def get_video_array(self):
+        """All remaining frames of every view, (views, n_frames, h, w, depth)"""
+        chunks = [chunk for chunk in self.video_array_chunk_iterator(chunksize=128, copy=True)]
+        if not chunks:
+            return np.empty((len(self.readers), 0, self.h, self.w, self.depth), dtype=np.uint8)
+        return np.concatenate(chunks, axis=1)
+
+    def close(self):
+        for reader in self.readers:
+            reader.close()
+        self.executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import numpy as np
 from natsort import natsorted
 
@@ -42,41 +43,76 @@ def convert_to_seconds(time):
     return sum(mult * part for mult, part in zip(factors, reversed(time)))
 
 
+def scan_dir(path, exts, pass_hidden_folders=True):
+    """Files of path ending with one of exts, and its subfolders to scan (not hidden ones, not symlinks like os.walk)"""
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if not entry.is_symlink() and not (pass_hidden_folders and entry.name.startswith('.')):
+                        dirs.append(entry.path)
+                elif entry.name.endswith(exts):
+                    files.append(entry.path)
+    except OSError: # removed or not readable, skipped like os.walk
+        pass
+    return files, dirs
+
+def scan_files(path, exts=('mp4',), pass_hidden_folders=True, sort=False, workers=8):
+    """
+    Yield the files of path (and its subfolders) ending with one of exts, as they are found.
+    Hidden folders (.name) are not entered. Folders are listed with os.scandir by `workers` threads,
+    one folder per task, so slow file systems (NFS) list many folders at once; the order is arbitrary
+    (workers <= 1: top-down, like os.walk). sort: natsorted at the end, after the whole tree is listed.
+    """
+    if isinstance(exts, str):
+        exts = (exts,)
+    exts = tuple(ext if '.' in ext else '.' + ext for ext in exts)
+    if os.fspath(path).endswith(exts):
+        yield path
+        return
+    if sort:
+        yield from natsorted(scan_files(path, exts, pass_hidden_folders=pass_hidden_folders, workers=workers))
+        return
+
+    if workers <= 1:
+        stack = [path]
+        while stack:
+            files, dirs = scan_dir(stack.pop(), exts, pass_hidden_folders)
+            yield from files
+            stack.extend(reversed(dirs))
+        return
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = {executor.submit(scan_dir, path, exts, pass_hidden_folders)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, dirs = future.result()
+                pending.update(executor.submit(scan_dir, subdir, exts, pass_hidden_folders) for subdir in dirs)
+                yield from files
+    finally:
+        # also when the caller stops early
+        executor.shutdown(wait=False, cancel_futures=True)
+
 def mp4list(path, pass_hidden_folders=True, sort=False, ext='mp4'):
     """
     Get all mp4 files in the given path. but not in the .subfolders (hidden folders)
+    ext: an extension or a tuple of extensions. The order is the os.walk order (stable between calls).
+    See scan_files to list large folders in parallel, yielding the files while they are found.
     """
-    if not '.' in ext:
-        ext = '.' + ext
-    if path.endswith(ext):
-        return [path]
-    mp4_files = []
-    for root, dirs, files in os.walk(path):
-        if pass_hidden_folders and any(part.startswith('.') for part in root.split(os.sep)):
-            continue
-        for file in files:
-            if file.endswith(ext):
-                mp4_files.append(os.path.join(root, file))
-    if sort:
-        mp4_files = natsorted(mp4_files)
-    return mp4_files
+    return list(scan_files(path, exts=ext, pass_hidden_folders=pass_hidden_folders, sort=sort, workers=1))
 
 def wavlist(path, pass_hidden_folders=True, sort=False):
     """
-    Get all mp4 files in the given path. but not in the .subfolders (hidden folders)
+    Get all wav files in the given path. but not in the .subfolders (hidden folders)
     """
-    if path.endswith(".wav"):
-        return [path]
-    mp4_files = []
-    for root, dirs, files in os.walk(path):
-        if pass_hidden_folders and any(part.startswith('.') for part in root.split(os.sep)):
-            continue
-        for file in files:
-            if file.endswith(".wav"):
-                mp4_files.append(os.path.join(root, file))
-    if sort:
-        mp4_files = natsorted(mp4_files)
-    return mp4_files
+    return mp4list(path, pass_hidden_folders=pass_hidden_folders, sort=sort, ext='wav')
 
 
 def array_video_to_tensor(video_array, _min=0, _max=1):
@@ -164,11 +200,39 @@ def centercrop_resize_video_tensor(video_tensor, size=(512,512), mode='bilinear'
     video_tensor = torch.nn.functional.interpolate(video_tensor, size=size, mode=mode, align_corners=align_corners)
     return video_tensor
 
-def resize_video_array(video_array, size=(512,512), mode='bilinear', align_corners=False):
+def _map_video_array_batches(video_array, out_shape, fn, batch_size=64, num_workers=1, out=None):
+    """
+    Apply `fn` to `video_array` in batches of `batch_size` frames and write the
+    results into a preallocated uint8 array of shape `out_shape`.
+    Only one float32 batch per worker is alive at a time.
+    """
+    if out is None:
+        out = np.empty(out_shape, dtype=np.uint8)
+    assert out.shape == tuple(out_shape), f"out has shape {out.shape}, expected {tuple(out_shape)}"
+
+    def run(start):
+        end = min(start + batch_size, len(video_array))
+        out[start:end] = fn(video_array[start:end])
+
+    starts = range(0, len(video_array), batch_size)
+    if num_workers is None or num_workers <= 1 or len(starts) <= 1:
+        for start in starts:
+            run(start)
+    else:
+        # torch releases the GIL inside interpolate, so batches run in parallel
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            list(executor.map(run, starts))
+    return out
+
+def resize_video_array(video_array, size=(512,512), mode='bilinear', align_corners=False, batch_size=64, num_workers=1, out=None):
     """
     Resize a video array.
     (Frames, Height, Width, Channels) -> (Frames, new_Height, new_Width, Channels)
 
+    Frames are processed `batch_size` at a time (with `num_workers` threads) and
+    written into `out`, a preallocated uint8 array, so memory stays bounded for long videos.
+
     input: numpy array, size=(new_Height, new_Width), mode='bilinear', align_corners=False
     output: numpy array
     """
@@ -178,26 +242,47 @@ def resize_video_array(video_array, size=(512,512), mode='bilinear', align_corne
     if type(size) == int:
         size = (size, size) # (new_Height, new_Width)
 
-    video_tensor = array_video_to_tensor(video_array)
-    video_tensor = resize_video_tensor(video_tensor, size=size, mode=mode, align_corners=align_corners)
-    video_array = tensor_video_to_array(video_tensor)
-    return video_array
+    def fn(batch):
+        video_tensor = array_video_to_tensor(batch)
+        video_tensor = resize_video_tensor(video_tensor, size=size, mode=mode, align_corners=align_corners)
+        return tensor_video_to_array(video_tensor)
 
-def centercrop_resize_video_array(video_array, size=(512,512), mode='bilinear', align_corners=False):
+    out_shape = (video_array.shape[0], size[0], size[1], video_array.shape[3])
+    return _map_video_array_batches(video_array, out_shape, fn, batch_size=batch_size, num_workers=num_workers, out=out)
+
+def centercrop_resize_video_array(video_array, size=(512,512), mode='bilinear', align_corners=False, batch_size=64, num_workers=1, out=None):
     """
     Center crop and resize a video array.
     (Frames, Height, Width, Channels) -> (Frames, new_Height, new_Width, Channels)
 
+    The crop is a view on the input, so only the cropped region is converted to float.
+    See `resize_video_array` for `batch_size`, `num_workers` and `out`.
+
     input: numpy array, size=(new_Height, new_Width)
     output: numpy array
     """
     if not TORCH_AVAILABLE:
         raise ImportError("Torch is not installed. Please install it to use this function: pip install torch")
 
-    if type(size) == int:
-        size = (size, size) # (new_Height, new_Width)
+    h, w = video_array.shape[1], video_array.shape[2]
+    min_shape = min(h, w)
+    height_start = (h - min_shape) // 2
+    width_start = (w - min_shape) // 2
+    video_array = video_array[:, height_start:height_start+min_shape, width_start:width_start+min_shape]
+    return resize_video_array(video_array, size=size, mode=mode, align_corners=align_corners, batch_size=batch_size, num_workers=num_workers, out=out)
 
-    video_tensor = array_video_to_tensor(video_array)
-    video_tensor = centercrop_resize_video_tensor(video_tensor, size=size, mode=mode, align_corners=align_corners)
-    video_array = tensor_video_to_array(video_tensor)
-    return video_array
\ No newline at end of file
+def resize_video_array_iterator(video_array_iterator, size=(512,512), mode='bilinear', align_corners=False, batch_size=64, num_workers=1):
+    """
+    Resize every chunk of a video array iterator.
+    e.g. resize_video_array_iterator(reader.video_array_chunk_iterator(chunksize=128), (256, 256))
+    """
+    for video_array in video_array_iterator:
+        yield resize_video_array(video_array, size=size, mode=mode, align_corners=align_corners, batch_size=batch_size, num_workers=num_workers)
+
+def centercrop_resize_video_array_iterator(video_array_iterator, size=(512,512), mode='bilinear', align_corners=False, batch_size=64, num_workers=1):
+    """
+    Center crop and resize every chunk of a video array iterator.
+    e.g. centercrop_resize_video_array_iterator(reader.video_array_chunk_iterator(chunksize=128), (256, 256))
+    """
+    for video_array in video_array_iterator:
+        yield centercrop_resize_video_array(video_array, size=size, mode=mode, align_corners=align_corners, batch_size=batch_size, num_workers=num_workers)
@@ -1,8 +1,40 @@
 from .ffmpeg_reader import FFMPEGReader
+from .ffmpeg_infos import ffmpeg_keyframe_times
+from .ffmpeg_infos import cross_platform_popen_params
+from .memory_input import MemoryInput, feed_stdin, stdin_param, stdin_data
+from .audio_features import AudioFeatureExtractor
+from .lazy_array import LazyVideoArray
+from .governor import get_ffmpeg_governor
+import os
+import re
+import math
+import subprocess as sp
+import hashlib
 import psutil
 import numpy as np
 import random
 
+# version of the dicts returned by EasyReader.state()
+STATE_VERSION = 1
+
+def file_identity(filename):
+    """path, size and modification time of a file, to detect that it changed"""
+    path = os.path.abspath(os.fspath(filename))
+    stat = os.stat(path)
+    return {"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def check_file_identity(identity):
+    """Raise ValueError if the file changed since `file_identity` was taken"""
+    try:
+        current = file_identity(identity["path"])
+    except FileNotFoundError:
+        raise ValueError(f"{identity['path']} does not exist anymore")
+    if current != identity:
+        raise ValueError(f"{identity['path']} changed since the state was saved")
+
+def frame_hash(frame):
+    return hashlib.blake2b(np.ascontiguousarray(frame), digest_size=16).hexdigest()
+
 class EasyReader(FFMPEGReader):
     """
     # Example Video - 128 frames per chunk
@@ -13,6 +45,14 @@ class EasyReader(FFMPEGReader):
     # Example Audio - 16kHz, 1 channel
     er = EasyReader("filename.mp4", load_video=False, load_audio=True, audio_fps=16000, audio_nchannels=1)
     audio_array = er.get_audio_array()
+
+    # Example Context Manager - ffmpeg processes are terminated on exit
+    with EasyReader("filename.mp4") as er:
+        video_array = er.get_video_array(start=0, end=128)
+
+    # Example Checkpoint - save the position between chunks, resume it in a new process
+    state = er.state() # json serializable
+    er = EasyReader.from_state(state)
     """
     def __init__(
             self,
@@ -29,12 +69,45 @@ class EasyReader(FFMPEGReader):
             target_resolution_ratio=None,
             target_video_fps=None,
             resize_algo="bicubic",
+            centercrop=False,
             fps_source="fps",
             ram_memory_max_usage=0.5,
             audio_fps=None,
             audio_nbytes=2,
             audio_nchannels=1,
+            audio_dtype=np.float64,
+            collect_stats=False,
+            threads=None,
+            close_timeout=5,
+            infos=None,
         ):
+        # options to reopen the same stream, saved by state()
+        self.options = dict(
+            audiofilename=os.path.abspath(audiofilename) if isinstance(audiofilename, (str, os.PathLike)) else audiofilename,
+            load_video=load_video,
+            load_audio=load_audio,
+            decode_file=decode_file,
+            bufsize=bufsize,
+            pixel_format=pixel_format,
+            check_duration=check_duration,
+            target_resolution=target_resolution,
+            target_resolution_ratio=target_resolution_ratio,
+            target_video_fps=target_video_fps,
+            resize_algo=resize_algo,
+            centercrop=centercrop,
+            fps_source=fps_source,
+            ram_memory_max_usage=ram_memory_max_usage,
+            audio_fps=audio_fps,
+            audio_nbytes=audio_nbytes,
+            audio_nchannels=audio_nchannels,
+            audio_dtype=np.dtype(audio_dtype).name,
+            collect_stats=collect_stats,
+            threads=threads,
+            close_timeout=close_timeout,
+        )
+        self.keyframe_times = None
+        # dtype of the normalized (-1~1) audio arrays, e.g. np.float32 for half the memory of float64
+        self.audio_dtype = np.dtype(audio_dtype)
         super().__init__(
             filename,
             audiofilename=audiofilename,
@@ -47,10 +120,15 @@ class EasyReader(FFMPEGReader):
             target_resolution_ratio=target_resolution_ratio,
             target_video_fps=target_video_fps,
             resize_algo=resize_algo,
+            centercrop=centercrop,
             fps_source=fps_source,
             audio_fps=audio_fps,
             audio_nbytes=audio_nbytes,
             audio_nchannels=audio_nchannels,
+            collect_stats=collect_stats,
+            threads=threads,
+            close_timeout=close_timeout,
+            infos=infos,
         )
         self.load_video = load_video
         self.load_audio = load_audio
@@ -61,6 +139,12 @@ class EasyReader(FFMPEGReader):
         self.ram_memory_max = int(ram_memory_max_system * ram_memory_max_usage)
 
     def initialize(self):
+        self.video_seek_time = None
+        self.audio_seek_sample = 0
+        # video frames and audio samples consumed from the start of the file
+        self.video_position = 0
+        self.audio_position = 0
+        self.last_frame = None
         if self.load_video:
             assert self.video_found, "Video not found"
             self.video_proc_initialize()
@@ -80,7 +164,8 @@ class EasyReader(FFMPEGReader):
                 end = end - self.now_frame
             self.now_frame += end - start
         elif start < self.now_frame: # request frame is already passed. Need to reinitialize.
-            self.close()
+            self.stats_add("n_restarts", 1)
+            self.close(emit_stats=False, release_inputs=False)
             self.initialize()
         
         if end == -1:
@@ -89,13 +174,121 @@ class EasyReader(FFMPEGReader):
 
         return start, end
 
+    def state(self):
+        """
+        Serializable (json) position of the reader: file identity, video frame and audio sample positions,
+        and the reader options. Resume it with `EasyReader.from_state(state)`.
+        """
+        if isinstance(self.filename, MemoryInput) or isinstance(self.audiofilename, MemoryInput):
+            raise ValueError("state() needs files, in-memory inputs can't be resumed")
+        return {
+            "version": STATE_VERSION,
+            "file": file_identity(self.filename),
+            "audio_file": file_identity(self.audiofilename) if self.audiofilename != self.filename else None,
+            "video_position": self.video_position,
+            "audio_position": self.audio_position,
+            "last_frame_hash": frame_hash(self.last_frame) if self.last_frame is not None else None,
+            "options": dict(self.options),
+        }
+
+    @classmethod
+    def from_state(cls, state, check_files=True, **kwargs):
+        """
+        Open a reader at a position saved by `state()`. The chunks read next are identical to the ones
+        an uninterrupted reader would have returned.
+        check_files: raise ValueError if a file changed since the state was saved.
+        kwargs override saved options that don't change the decoded data (e.g. threads, collect_stats).
+        """
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"unsupported state version {state.get('version')}")
+        if check_files:
+            for identity in (state["file"], state["audio_file"]):
+                if identity is not None:
+                    check_file_identity(identity)
+        options = dict(state["options"], **kwargs)
+        if options["target_resolution"] is not None: # json turns tuples into lists
+            options["target_resolution"] = tuple(options["target_resolution"])
+        reader = cls(state["file"]["path"], **options)
+        reader.seek(state["video_position"], state["audio_position"], last_frame_hash=state["last_frame_hash"])
+        return reader
+
+    def seek(self, video_position=0, audio_position=0, last_frame_hash=None):
+        """
+        Restart the processes at video frame `video_position` and audio sample `audio_position`.
+        The video is seeked to the last keyframe on the output frame grid, then decoded up to the position.
+        With `last_frame_hash` (from `state()`) the frame before the position is checked, and the video is
+        decoded from the start if seeking gave different frames (e.g. variable frame rate).
+        Without it, the video is decoded from the start.
+        The audio is trimmed by ffmpeg after resampling, so the samples are identical to a full decode.
+        """
+        if self.load_video:
+            self.seek_video(video_position, last_frame_hash)
+        if self.load_audio:
+            self.seek_audio(audio_position)
+        self.now_frame = video_position
+
+    def seek_video(self, position, last_frame_hash=None, use_keyframes=True):
+        verify = last_frame_hash is not None and position > 0
+        seek_time, start = None, 0
+        if verify and use_keyframes:
+            seek_time, start = self.keyframe_seek_point(position - 1)
+        self.start_video(seek_time, start)
+        if not verify:
+            self.throw_away_video_frames(position - start)
+            return
+
+        self.throw_away_video_frames(position - 1 - start)
+        self.get_frames(1)
+        if self.last_frame is not None and frame_hash(self.last_frame) == last_frame_hash:
+            return
+        if self.video_seek_time is not None:
+            # the seek did not land on the same frames, decode from the start
+            self.stats_add("n_restarts", 1)
+            return self.seek_video(position, last_frame_hash, use_keyframes=False)
+        raise ValueError(f"{self.filename}: frame {position - 1} differs from the saved state")
+
+    def start_video(self, seek_time=None, position=0):
+        """(Re)start the video process at input time `seek_time` (None: the start), which is frame `position`"""
+        if self.video_proc:
+            self.close_proc(self.video_proc)
+            self.video_proc = None
+        self.video_seek_time = seek_time
+        self.video_proc_initialize()
+        self.video_position = position
+        self.last_frame = None
+
+    def keyframe_seek_point(self, index):
+        """
+        (input seek time, frame index) of the last keyframe at or before frame `index` whose time falls
+        on the output frame grid, or (None, 0) to decode from the start.
+        """
+        if self.keyframe_times is None:
+            self.keyframe_times = ffmpeg_keyframe_times(self.filename)
+        seek_point = (None, 0)
+        for keyframe_time in self.keyframe_times:
+            frame = keyframe_time * self.video_fps
+            if round(frame) > index:
+                break
+            if keyframe_time > 0 and abs(frame - round(frame)) < 1e-3:
+                # rounded down, so the seek does not drop the keyframe itself
+                seek_point = (math.floor(keyframe_time * 1e6) / 1e6, int(round(frame)))
+        return seek_point
+
+    def seek_audio(self, position):
+        if self.audio_proc:
+            self.close_proc(self.audio_proc)
+            self.audio_proc = None
+        self.audio_seek_sample = position
+        self.audio_proc_initialize()
+        self.audio_position = position
+
 
     def video_array_chunk_iterator(self, chunksize=128, dtype=np.uint8):
         """
         Get video frames from the video process stdout
         return a numpy array of shape (chunksize, w, h, depth), (0~255)
         """
-        for i in range(0, self.n_frames, chunksize):
+        for i in range(self.video_position, self.n_frames, chunksize):
             array = self.get_frames(chunksize)
             array = array.astype(dtype)
             if array.shape[0] == 0: # if the last chunk is empty,
@@ -107,13 +300,144 @@ class EasyReader(FFMPEGReader):
         Get video frames from the video process stdout
         return a numpy array of shape (chunksize, w, h, depth), (0~255), and audio array (audio_fps/video_fps) * chunksize, n_channels, (-1~1)
         """
-        for i in range(0, self.n_frames, chunksize):
+        for i in range(self.video_position, self.n_frames, chunksize):
             video_array = self.get_frames(chunksize)
             audio_array = self.get_audios(self.audio_n_frames_by_video_n_frames(chunksize))
             if video_array.shape[0] == 0: # if the last chunk is empty,
                 break
             yield video_array, audio_array
 
+    def video_array_window_iterator(self, window=64, stride=16, with_audio=False, drop_last=True, copy=False):
+        """
+        Get overlapping windows of `window` frames, one every `stride` frames.
+        Every frame is decoded once into a ring buffer, and the windows are views of it,
+        overwritten by the next windows (copy=True to keep them).
+        return a numpy array of shape (window, h, w, depth), (0~255),
+        and with_audio, the audio array of the frames of the window, (n_samples, n_channels), (-1~1)
+        drop_last: skip the last window if it has less than `window` frames.
+        """
+        assert window > 0 and stride > 0, "window and stride must be positive"
+        # frames [lo, hi) of the buffer are decoded, the overlap is moved to the front when the buffer is full
+        capacity = max(2 * window, window + stride)
+        buffer = np.empty((capacity, self.h, self.w, self.depth), dtype=np.uint8)
+        lo = hi = 0
+        audio = None
+        while True:
+            need = window - (hi - lo)
+            if hi + need > capacity:
+                buffer[:hi - lo] = buffer[lo:hi]
+                lo, hi = 0, hi - lo
+            n_read = self.get_frames_into(buffer[hi:hi + need])
+            hi += n_read
+            if n_read < need and (drop_last or n_read == 0): # end of the video
+                break
+
+            video_array = buffer[lo:hi].copy() if copy else buffer[lo:hi]
+            if with_audio:
+                first_frame = self.video_position - (hi - lo)
+                audio = self.window_audio(audio, first_frame, self.video_position)
+                yield video_array, audio
+            else:
+                yield video_array
+            if n_read < need:
+                break
+
+            if stride >= window:
+                self.throw_away_video_frames(stride - window)
+                lo = hi
+            else:
+                lo += stride
+
+    def video_array_audio_features_chunk_iterator(self, chunksize=128, extractor=None, **feature_params):
+        """
+        Get video frames and the audio features aligned to them, computed in a streaming AudioFeatureExtractor
+        (built from feature_params if extractor is None, e.g. features_per_frame=4, n_mels=80)
+        return a numpy array of shape (chunksize, h, w, depth), (0~255),
+        and features of shape (chunksize * features_per_frame, n_features). Feature j belongs to frame j // features_per_frame.
+        """
+        if extractor is None:
+            extractor = AudioFeatureExtractor(self.audio_fps, self.video_fps, **feature_params)
+        # features are computed as soon as their window is complete, a bit ahead of the video
+        pending = np.zeros((0, extractor.n_features), dtype=np.float32)
+        audio_ended = False
+        n_video_frames = 0
+        n_features = 0
+        block = self.sample_by_video_frame(chunksize)
+        for i in range(self.video_position, self.n_frames, chunksize):
+            video_array = self.get_frames(chunksize)
+            if video_array.shape[0] == 0: # if the last chunk is empty,
+                break
+            n_video_frames += video_array.shape[0]
+            need = n_video_frames * extractor.features_per_frame - n_features
+            while len(pending) < need and not audio_ended:
+                audio_array = self.get_audios(block)
+                new_features = [pending, extractor.push(audio_array)]
+                if len(audio_array) < block:
+                    audio_ended = True
+                    new_features.append(extractor.flush())
+                pending = np.concatenate(new_features)
+            features, pending = pending[:need], pending[need:]
+            n_features += len(features)
+            yield video_array, features
+
+    def lazy_video_array(self, start=0, end=-1, cache_size=64, use_keyframes=True):
+        """
+        Frames start to end (-1: the last frame) as a LazyVideoArray, decoded when indexed.
+        It has its own reader, opened with the options of this one, so the position of this reader does not change.
+        """
+        # the video process is started by the first read
+        options = dict(self.options, audiofilename=None, load_video=False, load_audio=False)
+        reader = EasyReader(self.filename, infos=self.infos, **options)
+        reader.load_video = True
+        reader.keyframe_times = self.keyframe_times
+        return LazyVideoArray(reader, start=start, end=end, cache_size=cache_size, use_keyframes=use_keyframes)
+
+    def count_frames(self):
+        """
+        Exact number of frames of the video process (`n_frames` is only an estimate),
+        by decoding the whole video once to the null device.
+        """
+        seek_time, self.video_seek_time = self.video_seek_time, None
+        try:
+            cmd = self.video_cmd()
+        finally:
+            self.video_seek_time = seek_time
+        # raw frames to the null device, the frame count from the progress report on stdout
+        cmd = cmd[:-1] + ["-progress", "pipe:1", "-nostats", "-y", os.devnull]
+        popen_params = cross_platform_popen_params(
+            {"stdout": sp.PIPE, "stderr": sp.PIPE, "stdin": stdin_param(self.filename)}
+        )
+        # a full decode: it waits for a slot (acquire_timeout), it is not a probe
+        proc, output, error = get_ffmpeg_governor().communicate(cmd, popen_params, input=stdin_data(self.filename))
+        frames = re.findall(r"^frame=(\d+)", output.decode("utf8", errors="ignore"), re.M)
+        if proc.returncode != 0 or not frames:
+            raise IOError(f"Error counting the frames of '{self.filename}':\n\n{error.decode('utf8', errors='ignore')}")
+        return int(frames[-1])
+
+    def sample_by_video_frame(self, frame):
+        """index of the first audio sample of video frame `frame`"""
+        return int(round(frame * self.audio_fps / self.video_fps))
+
+    def window_audio(self, audio, first_frame, end_frame):
+        """
+        Audio of video frames [first_frame, end_frame), reusing the samples of the previous window `audio`,
+        which ends at `self.audio_position`. Samples are read once, and only up to the end of the window.
+        """
+        start, end = self.sample_by_video_frame(first_frame), self.sample_by_video_frame(end_frame)
+        if audio is None or self.audio_position <= start:
+            if self.audio_position < start:
+                self.get_audios(start - self.audio_position)
+            audio = self.get_audios(0)
+        else:
+            audio = audio[start - (self.audio_position - len(audio)):]
+        if end > self.audio_position:
+            audio = np.concatenate([audio, self.get_audios(end - self.audio_position)])
+        return audio
+
+    def take_frames(self, video_array, start, end):
+        """frames [start, end) of an array returned by get_frames"""
+        return video_array[start:end]
+
     def get_video_array_random_frame(self, start=0, end=-1):
         start, end = self.check_start_end(start, end)
 
@@ -127,7 +451,7 @@ class EasyReader(FFMPEGReader):
         elif random_index >= start and random_index < end:
             self.throw_away_video_frames(start)
             video_array = self.get_frames(end-start)
-            random_frame = video_array[random_index-start:random_index-start+1]
+            random_frame = self.take_frames(video_array, random_index-start, random_index-start+1)
             return video_array, random_frame
         else:
             self.throw_away_video_frames(start)
@@ -149,7 +473,7 @@ class EasyReader(FFMPEGReader):
         elif random_index >= start and random_index < end:
             self.throw_away_video_frames(start)
             video_array = self.get_frames(end-start)
-            random_frame = video_array[random_index-start:random_index-start+1]
+            random_frame = self.take_frames(video_array, random_index-start, random_index-start+1)
         else:
             self.throw_away_video_frames(start)
             video_array = self.get_frames(end-start)
@@ -213,25 +537,34 @@ class EasyReader(FFMPEGReader):
     def throw_away_audio_per_frames(self, n_frames):
         """Throw away n_frames of data from a process stdout"""
         audio_n_frames = self.audio_n_frames_by_video_n_frames(n_frames)
+        self.audio_position += audio_n_frames
         self.throw_away_chunks(self.audio_proc, audio_n_frames * self.audio_nchannels * self.audio_nbytes)
 
     def throw_away_video_frames(self, n_frames):
         """Throw away n_frames of data from a process stdout"""
         self.now_frame += n_frames
+        self.video_position += n_frames
+        self.last_frame = None
         self.throw_away_chunks(self.video_proc, n_frames * self.frame_bytesize)
 
     def throw_away_chunks(self, proc, nbytes):
         """Throw away nbytes of data from a process stdout"""
-        while True:
-            if nbytes == 0:
-                break
-            if nbytes <= self.ram_memory_max:
-                throwaway = proc.stdout.read(nbytes)
-                proc.stdout.flush()
-                break
-            else:
-                throwaway = proc.stdout.read(self.ram_memory_max)
-                nbytes -= self.ram_memory_max
+        self.throw_away_stream(proc.stdout, nbytes)
+
+    def throw_away_stream(self, stream, nbytes):
+        """Throw away nbytes of data from a pipe"""
+        self.stats_add("bytes_discarded", nbytes)
+        with self.stats_timer("discard_time"):
+            while True:
+                if nbytes == 0:
+                    break
+                if nbytes <= self.ram_memory_max:
+                    throwaway = stream.read(nbytes)
+                    stream.flush()
+                    break
+                else:
+                    throwaway = stream.read(self.ram_memory_max)
+                    nbytes -= self.ram_memory_max
 
     def get_frames(self, n_frames):
         """
@@ -242,11 +575,36 @@ class EasyReader(FFMPEGReader):
             raise Exception("Video not loaded")
         
         read_nbytes = n_frames * self.w * self.h * self.depth
-        s = self.video_proc.stdout.read(read_nbytes)
-        result = np.frombuffer(s, dtype="uint8") # need python3
-        result.shape = (len(s)//self.frame_bytesize,self.h,self.w,self.depth)
+        with self.stats_timer("read_time"):
+            s = self.video_proc.stdout.read(read_nbytes)
+        with self.stats_timer("convert_time"):
+            result = np.frombuffer(s, dtype="uint8") # need python3
+            result.shape = (len(s)//self.frame_bytesize,self.h,self.w,self.depth)
+        self.stats_add("bytes_read", len(s))
+        self.stats_add("frames_read", result.shape[0])
+        self.video_position += result.shape[0]
+        if result.shape[0] > 0:
+            self.last_frame = result[-1].copy()
         return result
     
+    def get_frames_into(self, out):
+        """
+        Read len(out) frames straight into a preallocated uint8 array of shape (n_frames, h, w, depth), without a copy
+        return the number of frames read (less than len(out) at the end of the video)
+        """
+        if self.video_proc is None:
+            raise Exception("Video not loaded")
+
+        with self.stats_timer("read_time"):
+            nbytes = self.video_proc.stdout.readinto(memoryview(out).cast("B"))
+        n_read = nbytes // self.frame_bytesize
+        self.stats_add("bytes_read", nbytes)
+        self.stats_add("frames_read", n_read)
+        self.video_position += n_read
+        if n_read > 0:
+            self.last_frame = out[n_read - 1].copy()
+        return n_read
+
     def get_audios(self, audio_n_frames, is_raw_audio=False):
         """
         Get n_frames from the audio process stdout
@@ -257,16 +615,70 @@ class EasyReader(FFMPEGReader):
         
         read_nbytes = int(audio_n_frames * self.audio_nchannels * self.audio_nbytes)
 
-        s = self.audio_proc.stdout.read(read_nbytes)
+        with self.stats_timer("read_time"):
+            s = self.audio_proc.stdout.read(read_nbytes)
+        self.stats_add("bytes_read", len(s))
+        self.stats_add("audio_frames_read", len(s) // (self.audio_nchannels * self.audio_nbytes))
+        self.audio_position += len(s) // (self.audio_nchannels * self.audio_nbytes)
 
+        with self.stats_timer("convert_time"):
+            return self.audio_bytes_to_array(s, is_raw_audio=is_raw_audio)
+
+    def audio_bytes_to_array(self, s, is_raw_audio=False):
         result = np.frombuffer(s, dtype=self.audio_data_type) # need python3
         if is_raw_audio:
             return result
-        
-        result = (1.0 * result / 2 ** (8 * self.audio_nbytes - 1)).reshape(
-            (int(len(result) / self.audio_nchannels), self.audio_nchannels)
+
+        # normalize in one pass, straight into an array of audio_dtype
+        n_samples = len(result) // self.audio_nchannels
+        audio_array = np.empty((n_samples, self.audio_nchannels), dtype=self.audio_dtype)
+        np.multiply(
+            result[:n_samples * self.audio_nchannels].reshape(audio_array.shape),
+            2.0 ** (1 - 8 * self.audio_nbytes),
+            out=audio_array,
+            dtype=self.audio_dtype,
         )
-        return result
+        return audio_array
+
+    def audio_array_chunk_iterator(self, chunksize=None, is_raw_audio=False):
+        """
+        Get the audio in blocks of `chunksize` samples (default: 10 seconds), so only one block is in memory
+        return a numpy array of shape (chunksize, n_channels), (-1~1). The last block is shorter.
+        """
+        if chunksize is None:
+            chunksize = int(self.audio_fps * 10)
+        while True:
+            audio_array = self.get_audios(chunksize, is_raw_audio=is_raw_audio)
+            n_samples = len(audio_array) // self.audio_nchannels if is_raw_audio else len(audio_array)
+            if n_samples == 0:
+                break
+            yield audio_array
+            if n_samples < chunksize:
+                break
+
+    def get_audio_range(self, start_sec, end_sec, is_raw_audio=False):
+        """
+        Get the audio from start_sec to end_sec, with its own ffmpeg process seeking in the input,
+        so the audio before start_sec is not decoded. The position of the reader does not change.
+        return a numpy array of shape (n_samples, n_channels), (-1~1), with
+        n_samples = round(end_sec * audio_fps) - round(start_sec * audio_fps), or fewer at the end of the file.
+        """
+        start = int(round(start_sec * self.audio_fps))
+        n_samples = max(int(round(end_sec * self.audio_fps)) - start, 0)
+        # one sample more than needed, so ffmpeg does not stop short because of rounding
+        # absolute times: not trimmed to the position of a seek()
+        cmd = self.audio_cmd(start_time=start / self.audio_fps, duration=(n_samples + 1) / self.audio_fps, filters=False)
+        proc = self.popen(cmd, self.audio_popen_params())
+        feed_stdin(self.audiofilename, proc)
+        try:
+            with self.stats_timer("read_time"):
+                s = proc.stdout.read(n_samples * self.audio_nchannels * self.audio_nbytes)
+        finally:
+            self.close_proc(proc)
+        self.stats_add("bytes_read", len(s))
+        self.stats_add("audio_frames_read", len(s) // (self.audio_nchannels * self.audio_nbytes))
+        with self.stats_timer("convert_time"):
+            return self.audio_bytes_to_array(s, is_raw_audio=is_raw_audio)
 
 if __name__ == '__main__':
     er = EasyReader("/mnt/CINELINGO_BACKUP/mingi/anycode/IMF/TalkingHeadTTS/TalkingHeadTTS/inputs/dataset_symbolic/CelebV_Text/celebvtext_6/-5UeNAAUcik_0_0.mp4",
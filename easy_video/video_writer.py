@@ -1,12 +1,87 @@
-from .ffmpeg_writer import FFMPEG_VideoWriter, FFMPEG_AudioWriter
-from .ffmpeg_infos import ffmpeg_parse_infos
+from .ffmpeg_writer import FFMPEG_VideoWriter, FFMPEG_AudioWriter, FFMPEG_MultiVideoWriter, AudioPipe, video_codec_params, stream_target
+from .os_dependency import IS_POSIX_OS
+from .ffmpeg_infos import ffmpeg_parse_infos, ffmpeg_video_packets, ffmpeg_video_stream_params, cross_platform_popen_params, FFMPEG_BINARY
+from .governor import get_ffmpeg_governor
+from .utils import convert_to_seconds
 
 from .video_reader import EasyReader
+from .ffmpeg_reader import FFMPEGReader
 import os
 import subprocess
+import tempfile
+import uuid
+import warnings
 
 TEMP_PREFIX_RANDOMCHARS = "EZVQB_NNIEHVPQD_"
 
+# encoders used to re-encode the boundary GOPs of a frame-accurate trim, by source codec
+SMART_CUT_ENCODERS = {"h264": "libx264", "hevc": "libx265", "mpeg4": "mpeg4", "vp9": "libvpx-vp9"}
+# ffmpeg profile names -> encoder -profile:v values
+SMART_CUT_PROFILES = {
+    "libx264": {"constrained baseline": "baseline", "baseline": "baseline", "main": "main", "high": "high",
+                "high 10": "high10", "high 4:2:2": "high422", "high 4:4:4 predictive": "high444"},
+    "libx265": {"main": "main", "main 10": "main10", "main still picture": "mainstillpicture", "rext": None},
+}
+MOV_EXTENSIONS = ("mp4", "mov", "m4v", "3gp")
+
+def smart_cut_encoder_params(video_codec, stream_params):
+    """Encoder options matching the profile and level of the source stream, so the re-encoded GOPs
+    can share the decoder configuration (one avcC / hvcC in mp4) with the stream copied ones."""
+    params = []
+    profile = SMART_CUT_PROFILES.get(video_codec, {}).get((stream_params["profile"] or "").lower())
+    if profile:
+        params += ["-profile:v", profile]
+    level = stream_params["level"]
+    if level and video_codec == "libx264":
+        params += ["-level:v", "1b" if level == 9 else "%g" % (level / 10)]
+    elif level and video_codec == "libx265":
+        params += ["-x265-params", "level-idc=%g" % (level / 30)]
+    return params
+
+def decode_errors(filename, start=0, duration=None):
+    """Errors printed by ffmpeg decoding the video of filename from `start` for `duration` seconds, '' if none."""
+    cmd = (
+        [FFMPEG_BINARY, "-v", "error", "-ss", "%.6f" % max(start, 0), "-i", filename]
+        + (["-t", "%.6f" % duration] if duration is not None else [])
+        + ["-map", "0:v:0", "-f", "null", "-"]
+    )
+    popen_params = cross_platform_popen_params(
+        {"stdout": subprocess.DEVNULL, "stderr": subprocess.PIPE, "stdin": subprocess.DEVNULL}
+    )
+    proc, _, error = get_ffmpeg_governor().communicate(cmd, popen_params)
+    text = error.decode("utf8", errors="ignore").strip()
+    return text or ("ffmpeg exited with status %d" % proc.returncode if proc.returncode else "")
+
+def run_ffmpeg(cmd):
+    """Run an ffmpeg command to completion, raising IOError with its output if it fails."""
+    popen_params = cross_platform_popen_params(
+        {"stdout": subprocess.DEVNULL, "stderr": subprocess.PIPE, "stdin": subprocess.DEVNULL}
+    )
+    proc, _, stderr = get_ffmpeg_governor().communicate(cmd, popen_params)
+    if proc.returncode != 0:
+        raise IOError(
+            f"ffmpeg exited with status {proc.returncode}:\n{' '.join(cmd)}\n\n"
+            f"{stderr.decode('utf8', errors='ignore')}"
+        )
+
+def temp_filename(filename, suffix):
+    file_dir = os.path.dirname(filename)
+    file_name = os.path.basename(filename).split(".")[0]
+    return os.path.join(file_dir, f"{TEMP_PREFIX_RANDOMCHARS}{file_name}_{suffix}")
+
+def write_concat_list(list_file, entries):
+    """Write a concat demuxer list. entries: (filename, inpoint, outpoint[, duration]), values may be None."""
+    with open(list_file, "w") as f:
+        for filename, inpoint, outpoint, *duration in entries:
+            path = os.path.abspath(filename).replace("'", "'\\''")
+            f.write(f"file '{path}'\n")
+            if inpoint is not None:
+                f.write(f"inpoint {inpoint:.6f}\n")
+            if outpoint is not None:
+                f.write(f"outpoint {outpoint:.6f}\n")
+            if duration and duration[0] is not None:
+                f.write(f"duration {duration[0]:.6f}\n")
+
 class EasyWriter:
     def writefile(
             filename,
@@ -21,7 +96,21 @@ class EasyWriter:
             is_raw_audio=False,
             silent=False,
             video_codec="libx264",
+            progress_callback=None,
+            format=None,
     ):
+        """
+        `progress_callback(stats)` receives the writers' `WriterStats` (encoded frames, fps,
+        speed, size, bitrate, queue depth) every time ffmpeg reports progress.
+
+        `filename` can also be a writable file object, or None to return the encoded bytes.
+        Then `format` picks a streamable container: 'mp4' (fragmented), 'mkv', 'webm', 'wav', ...
+
+        With video and audio, the audio goes to the same ffmpeg process through a second pipe (an mp4 or wav
+        `audio_array` path is read by ffmpeg directly). Windows has no pass_fds: there the audio array is written
+        to a temporary wav first, next to `filename` (in the temp directory for file objects and None).
+        """
+        saved_at = filename if filename is not None else "memory"
 
         if get_info_from != None:
             infos = ffmpeg_parse_infos(get_info_from)
@@ -53,13 +142,17 @@ class EasyWriter:
                 nbytes=audio_nbytes,
                 nchannels=audio_nchannels,
                 is_raw_audio=is_raw_audio,
+                progress_callback=progress_callback,
+                format=format,
             )
             if not silent:
                 print("\033[92m Writing... \033[0m")
             audio_clip.write_frames_chunk(audio_array, silent=silent)
             if not silent:
-                print(f"\033[92m Done...!! Saved at {filename}\033[0m")
+                print(f"\033[92m Done...!! Saved at {saved_at}\033[0m")
             audio_clip.close()
+            if filename is None:
+                return audio_clip.getvalue()
 
         elif type(audio_array) == type(None): # video only
             video_clip = FFMPEG_VideoWriter(
@@ -67,31 +160,42 @@ class EasyWriter:
                 size=video_size,
                 fps=video_fps,
                 codec=video_codec,
+                progress_callback=progress_callback,
+                format=format,
             )
             if not silent:
                 print("\033[92m Writing... \033[0m")
             video_clip.write_frames_chunk(video_array, silent=silent)
             if not silent:
-                print(f"\033[92m Done...!! Saved at {filename}\033[0m")
+                print(f"\033[92m Done...!! Saved at {saved_at}\033[0m")
             video_clip.close()
+            if filename is None:
+                return video_clip.getvalue()
 
         else: # video and audio
-            # save audio as tmp file and merge it with video.
-            # need to remove tmp audio file after merge
-            file_dir = os.path.dirname(filename)
-            file_name = os.path.basename(filename).split(".")[0]
-            
-            del_audio_tmp = True
+            audio_tmp = None
             if type(audio_array) == str:
-                if audio_array.split(".")[-1] == "mp4":
-                    audio_tmp = os.path.join(file_dir, f"{TEMP_PREFIX_RANDOMCHARS}{file_name}.wav")
-                    EasyWriter.extract_audio(audio_array, audio_tmp)
-                elif audio_array.split(".")[-1] == "wav":
-                    audio_tmp = audio_array
-                    del_audio_tmp = False
-                else:
+                # muxed from the file, the video of an mp4 is left out by the maps below
+                if audio_array.split(".")[-1] not in ["mp4", "wav"]:
                     raise Exception("Only mp4 or wav file is allowed for audio_array as string.")
+                audiofile = audio_array
+            elif IS_POSIX_OS:
+                audiofile = AudioPipe(
+                    audio_array,
+                    audio_fps,
+                    nbytes=audio_nbytes,
+                    nchannels=audio_nchannels,
+                    is_raw_audio=is_raw_audio,
+                )
             else:
+                # no pass_fds: save audio as tmp file and merge it with video.
+                # need to remove tmp audio file after merge
+                if stream_target(filename):
+                    file_dir = tempfile.gettempdir()
+                    file_name = uuid.uuid4().hex
+                else:
+                    file_dir = os.path.dirname(filename)
+                    file_name = os.path.basename(filename).split(".")[0]
                 audio_tmp = os.path.join(file_dir, f"{TEMP_PREFIX_RANDOMCHARS}{file_name}.wav")
                 audio_clip = FFMPEG_AudioWriter(
                     audio_tmp,
@@ -99,68 +203,405 @@ class EasyWriter:
                     nbytes=audio_nbytes,
                     nchannels=audio_nchannels,
                     is_raw_audio=is_raw_audio,
+                    progress_callback=progress_callback,
                 )
                 if not silent:
                     print("\033[92m Audio Writing... \033[0m")
                 audio_clip.write_frames_chunk(audio_array, silent=silent)
                 audio_clip.close()
+                audiofile = audio_tmp
 
             video_clip = FFMPEG_VideoWriter(
                 filename,
                 size=video_size,
                 fps=video_fps,
-                audiofile=audio_tmp,
+                audiofile=audiofile,
                 codec=video_codec,
+                ffmpeg_params=["-map", "0:v", "-map", "1:a:0"],
+                progress_callback=progress_callback,
+                format=format,
             )
             if not silent:
                 print("\033[92m Writing... \033[0m")
             video_clip.write_frames_chunk(video_array, silent=silent)
             if not silent:
-                print(f"\033[92m Done...!! Saved at {filename}\033[0m")
+                print(f"\033[92m Done...!! Saved at {saved_at}\033[0m")
             video_clip.close()
             
-            if del_audio_tmp:
+            if audio_tmp is not None:
                 os.remove(audio_tmp)
+            if filename is None:
+                return video_clip.getvalue()
  
-    def combine_video_audio(video_file, audio_file, output_file=""):
+    def combine_video_audio(video_file, audio_file, output_file="", silent=False):
+        """
+        Mux the video of video_file with the audio of audio_file (re-encoded to aac), without decoding the video.
+        output_file: default video_file, replaced when the new file is complete.
+        """
         if output_file == "":
             output_file = video_file
-        
-        print("\033[92m Writing... \033[0m")
-        # ffmpeg 명령어 동작
-        command = [
-            'ffmpeg', '-y',  # -y는 기존 파일을 덮어쓰기 위한 옵션
-            '-i', video_file,  # 비디오 파일 입력
-            '-i', audio_file,  # 오디오 파일 입력
-            '-c:v', 'copy',  # 비디오 코덱 복사 (재인코딩 없음)
-            '-c:a', 'aac',  # 오디오를 aac 코덱으로 인코딩
-            output_file  # 출력 파일 경로
-        ]
-
-        # 명령어 실행
-        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
-            stdout, stderr = process.communicate()
-        print(f"\033[92m Done...!! Saved at {output_file}\033[0m")
-        
-    def extract_audio(video_file, output_file=""):
+
+        if not silent:
+            print("\033[92m Writing... \033[0m")
+        # ffmpeg can't write the file it reads, write next to it and replace it
+        same_file = os.path.abspath(output_file) in (os.path.abspath(video_file), os.path.abspath(audio_file))
+        target = temp_filename(output_file, "combined" + os.path.splitext(output_file)[1]) if same_file else output_file
+        try:
+            run_ffmpeg([
+                FFMPEG_BINARY, "-y", "-loglevel", "error",
+                "-i", video_file,
+                "-i", audio_file,
+                "-map", "0:v:0", "-map", "1:a:0",
+                "-c:v", "copy", # no re-encoding of the video
+                "-c:a", "aac",
+                target,
+            ])
+            if same_file:
+                os.replace(target, output_file)
+        finally:
+            if same_file and os.path.exists(target):
+                os.remove(target)
+        if not silent:
+            print(f"\033[92m Done...!! Saved at {output_file}\033[0m")
+        return output_file
+
+    def extract_audio(video_file, output_file="", audio_fps=None, audio_nchannels=2, silent=False):
+        """
+        Write the audio of video_file as a wav file (pcm s16le).
+        output_file: default video_file with the .wav extension. audio_fps: default the source rate.
+        """
         if output_file == "":
-            output_file = video_file.split(".")[0] + ".wav"
-
-        print("\033[92m Writing... \033[0m")
-        # ffmpeg 명령어 동작
-        command = [
-            'ffmpeg', '-y',  # -y는 기존 파일을 덮어쓰기 위한 옵션
-            '-i', video_file,  # 비디오 파일 입력
-            '-vn',  # 비디오 스트림 무시
-            '-ac', '2',  # 스테레오 오디오
-            '-f', 'wav',  # wav 포맷
-            output_file  # 출력 파일 경로
-        ]
-
-        # 명령어 실행
-        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
-            stdout, stderr = process.communicate()
-        print(f"\033[92m Done...!! Saved at {output_file}\033[0m")
+            output_file = os.path.splitext(video_file)[0] + ".wav"
+
+        if not silent:
+            print("\033[92m Writing... \033[0m")
+        run_ffmpeg(
+            [FFMPEG_BINARY, "-y", "-loglevel", "error", "-i", video_file, "-vn"]
+            + ["-ac", "%d" % audio_nchannels]
+            + (["-ar", "%d" % audio_fps] if audio_fps is not None else [])
+            + ["-f", "wav", output_file]
+        )
+        if not silent:
+            print(f"\033[92m Done...!! Saved at {output_file}\033[0m")
+        return output_file
+
+    def trim(input_file, output_file, start=0, end=None, accurate=False, video_codec=None, silent=False):
+        """
+        Cut [start, end) seconds of input_file into output_file without decoding it.
+
+        accurate=False: stream copy. The file starts at the keyframe before `start`
+            (mp4 hides the frames before `start` with an edit list, other containers show them).
+        accurate=True: smart-cut. Only the GOPs at the boundaries are re-encoded (with video_codec,
+            by default the encoder matching the source codec), the rest is stream copied.
+            If no encoder is known for the source codec, or the joined result does not decode,
+            the whole segment is re-encoded.
+        start, end: seconds or any format accepted by `convert_to_seconds` (e.g. '00:01:02.5').
+        """
+        start = convert_to_seconds(start)
+        infos = ffmpeg_parse_infos(input_file, decode_file=False)
+        end = infos["duration"] if end is None else min(convert_to_seconds(end), infos["duration"])
+        assert 0 <= start < end, f"invalid trim range [{start}, {end})"
+
+        if not silent:
+            print("\033[92m Writing... \033[0m")
+
+        if not accurate or not infos["video_found"]:
+            run_ffmpeg([
+                FFMPEG_BINARY, "-y", "-loglevel", "error",
+                "-ss", "%.6f" % start, "-i", input_file, "-t", "%.6f" % (end - start),
+                "-map", "0", "-c", "copy",
+                output_file,
+            ])
+        else:
+            EasyWriter.smart_cut(input_file, output_file, start, end, infos, video_codec=video_codec)
+
+        if not silent:
+            print(f"\033[92m Done...!! Saved at {output_file}\033[0m")
+        return output_file
+
+    def smart_cut(input_file, output_file, start, end, infos, video_codec=None):
+        """Frame-accurate trim: re-encode [start, first keyframe) and [last keyframe, end),
+        stream copy the keyframes in between, and join them with the concat demuxer.
+        Audio is cut separately (re-encoded to aac), so it is sample accurate.
+        The re-encoded GOPs use the profile, level, pixel format and time scale of the source. The joins
+        are decoded and the frames counted: if they don't match, the whole range is re-encoded instead."""
+        video_codec = video_codec or SMART_CUT_ENCODERS.get(infos.get("video_codec_name"))
+        file_start = infos.get("start") or 0
+        packets = ffmpeg_video_packets(input_file)
+        keyframes = sorted(pts - file_start for pts, _, is_keyframe in packets if is_keyframe)
+        # keyframes inside the range. A keyframe at `start` needs no re-encoding.
+        eps = 0.5 / infos["video_fps"]
+        inner_keyframes = [t for t in keyframes if start - eps <= t < end - eps]
+
+        ext = output_file.split(".")[-1]
+        timescale_params = []
+        encoder_params = []
+        if video_codec is not None and inner_keyframes:
+            stream_params = ffmpeg_video_stream_params(input_file)
+            encoder_params = smart_cut_encoder_params(video_codec, stream_params)
+            if ext.lower() in MOV_EXTENSIONS and stream_params["time_base_den"]:
+                timescale_params = ["-video_track_timescale", "%d" % stream_params["time_base_den"]]
+
+        def reencode(filename, seg_start, seg_end, with_audio=False, match_source=True):
+            cmd = [
+                FFMPEG_BINARY, "-y", "-loglevel", "error",
+                "-ss", "%.6f" % seg_start, "-i", input_file, "-t", "%.6f" % (seg_end - seg_start),
+                "-c:v", video_codec or "libx264",
+            ]
+            if match_source:
+                cmd.extend(encoder_params + timescale_params)
+            if infos.get("video_pix_fmt"):
+                cmd.extend(["-pix_fmt", infos["video_pix_fmt"]])
+            cmd.extend(["-c:a", "aac"] if with_audio and infos["audio_found"] else ["-an"])
+            cmd.append(filename)
+            run_ffmpeg(cmd)
+
+        if video_codec is None or not inner_keyframes:
+            reencode(output_file, start, end, with_audio=True, match_source=False)
+            return output_file
+
+        first_key, last_key = inner_keyframes[0], inner_keyframes[-1]
+        video_file = temp_filename(output_file, "video." + ext) if infos["audio_found"] else output_file
+        list_file = temp_filename(output_file, "concat.txt")
+        temp_files = [list_file] + ([video_file] if video_file != output_file else [])
+        try:
+            entries = []
+            joins = []  # times of the joins in the output, decoded to check them
+            if first_key - start > eps:
+                head = temp_filename(output_file, "head." + ext)
+                temp_files.append(head)
+                reencode(head, start, first_key)
+                entries.append((head, None, None))
+                joins.append(first_key - start)
+            if last_key > first_key:
+                # the concat demuxer cuts on dts, so stop at the dts of the last keyframe,
+                # otherwise the keyframe and the packets decoded before it would be copied too.
+                # outpoint - inpoint is then short by the reorder delay: give the duration on pts
+                outpoint = min(dts for pts, dts, _ in packets if abs(pts - file_start - last_key) < eps)
+                entries.append((input_file, first_key + file_start, outpoint, last_key - first_key))
+            tail = temp_filename(output_file, "tail." + ext)
+            temp_files.append(tail)
+            reencode(tail, last_key, end)
+            entries.append((tail, None, None))
+            if len(entries) > 1:
+                joins.append(last_key - start)
+
+            # video only: audio packets before the inpoint would shift the whole timeline
+            write_concat_list(list_file, entries)
+            run_ffmpeg([
+                FFMPEG_BINARY, "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", list_file,
+                "-map", "0:v", "-c", "copy",
+            ] + timescale_params + [video_file])
+
+            # the stream copied GOPs must decode with the decoder configuration of the first segment
+            # an input seek keeps the frame overlapping `start`, like the re-encoded head
+            times = sorted(pts - file_start for pts, _, _ in packets)
+            tol = 0.01 / infos["video_fps"]
+            expected_n_frames = sum(
+                1 for t, next_t in zip(times, times[1:] + [float("inf")]) if next_t > start + tol and t < end - tol
+            )
+            error = ""
+            if len(ffmpeg_video_packets(video_file)) != expected_n_frames:
+                error = "the joined video does not have the frames of the range"
+            for join in joins:
+                error = error or decode_errors(video_file, join - 1, 2)
+            if error:
+                warnings.warn(f"smart cut of {input_file} failed ({error.splitlines()[0]}), re-encoding the whole range")
+                reencode(output_file, start, end, with_audio=True, match_source=False)
+                return output_file
+            if infos["audio_found"]:
+                run_ffmpeg([
+                    FFMPEG_BINARY, "-y", "-loglevel", "error",
+                    "-i", video_file,
+                    "-ss", "%.6f" % start, "-t", "%.6f" % (end - start), "-i", input_file,
+                    "-map", "0:v", "-map", "1:a:0", "-c:v", "copy", "-c:a", "aac",
+                    output_file,
+                ])
+        finally:
+            for temp_file in temp_files:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+        return output_file
+
+    def split(input_file, split_points, output_pattern=None, accurate=False, video_codec=None, silent=False):
+        """
+        Split input_file at split_points (seconds) into len(split_points)+1 files, without decoding.
+        output_pattern: e.g. 'out_%03d.mp4'. Default: input name + '_%03d' + input extension.
+        accurate=False: segment muxer with stream copy, each cut snaps to the next keyframe.
+        accurate=True: each segment is a smart-cut `trim`.
+        Returns the list of output files.
+        """
+        if output_pattern is None:
+            root, ext = os.path.splitext(input_file)
+            output_pattern = root + "_%03d" + ext
+        split_points = sorted(convert_to_seconds(t) for t in split_points)
+
+        if accurate:
+            duration = ffmpeg_parse_infos(input_file, decode_file=False)["duration"]
+            bounds = [0] + split_points + [duration]
+            return [
+                EasyWriter.trim(input_file, output_pattern % inx, start, end, accurate=True, video_codec=video_codec, silent=silent)
+                for inx, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]))
+            ]
+
+        if not silent:
+            print("\033[92m Writing... \033[0m")
+        run_ffmpeg([
+            FFMPEG_BINARY, "-y", "-loglevel", "error", "-i", input_file,
+            "-map", "0", "-c", "copy", "-f", "segment",
+            "-segment_times", ",".join("%.6f" % t for t in split_points),
+            "-reset_timestamps", "1",
+            output_pattern,
+        ])
+        outputs = [output_pattern % inx for inx in range(len(split_points) + 1)]
+        outputs = [output for output in outputs if os.path.exists(output)]
+        if not silent:
+            print(f"\033[92m Done...!! Saved {len(outputs)} files\033[0m")
+        return outputs
+
+    def concat(input_files, output_file, silent=False):
+        """
+        Concatenate files with the same codecs and parameters (e.g. from `split`) without decoding.
+        """
+        list_file = temp_filename(output_file, "concat.txt")
+        if not silent:
+            print("\033[92m Writing... \033[0m")
+        try:
+            write_concat_list(list_file, [(input_file, None, None) for input_file in input_files])
+            run_ffmpeg([
+                FFMPEG_BINARY, "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", list_file,
+                "-map", "0", "-c", "copy", output_file,
+            ])
+        finally:
+            if os.path.exists(list_file):
+                os.remove(list_file)
+        if not silent:
+            print(f"\033[92m Done...!! Saved at {output_file}\033[0m")
+        return output_file
+
+    def transcode(
+            src,
+            dst,
+            target_resolution=None,
+            target_resolution_ratio=None,
+            target_video_fps=None,
+            resize_algo="bicubic",
+            centercrop=False,
+            video_codec="libx264",
+            preset="slow",
+            bitrate=None,
+            threads=None,
+            ffmpeg_params=None,
+            audio_codec="aac",
+            video_array_fn=None,
+            chunksize=128,
+            silent=False,
+    ):
+        """
+        Resize / change fps / centercrop src into dst, with the same options as `EasyReader`
+        and the same codec options as `writefile`.
+
+        Without video_array_fn, this runs a single ffmpeg process, frames never go through python.
+        With video_array_fn, frames are decoded in chunks of `chunksize`, passed through
+        `video_array_fn(video_array) -> video_array` ((n_frames, h, w, c) uint8) and encoded.
+        audio_codec: audio of src is re-encoded with it ('copy' to keep it as is), with or without video_array_fn.
+        """
+        reader_params = dict(
+            decode_file=False,
+            target_resolution=target_resolution,
+            target_resolution_ratio=target_resolution_ratio,
+            target_video_fps=target_video_fps,
+            resize_algo=resize_algo,
+            centercrop=centercrop,
+            threads=threads,
+        )
+        if not silent:
+            print("\033[92m Writing... \033[0m")
+
+        if video_array_fn is None:
+            reader = FFMPEGReader(src, **reader_params)
+            assert reader.video_found, "Video not found"
+            cmd = (
+                [FFMPEG_BINARY, "-y", "-loglevel", "error"]
+                + reader.threads_params()
+                + ["-i", src, "-map", "0:v:0", "-map", "0:a:0?"]
+                + reader.video_filter_params()
+                + video_codec_params(video_codec, preset, reader.size, bitrate=bitrate, threads=threads, ffmpeg_params=ffmpeg_params)
+                + ["-acodec", audio_codec, dst]
+            )
+            run_ffmpeg(cmd)
+        else:
+            with EasyReader(src, load_video=True, **reader_params) as reader:
+                writer = None
+                try:
+                    while True:
+                        video_array = reader.get_frames(chunksize)
+                        if video_array.shape[0] == 0:
+                            break
+                        video_array = video_array_fn(video_array)
+                        if writer is None: # the output size is known after the first chunk
+                            writer = FFMPEG_VideoWriter(
+                                dst,
+                                size=(video_array.shape[2], video_array.shape[1]),
+                                fps=reader.video_fps,
+                                codec=video_codec,
+                                preset=preset,
+                                bitrate=bitrate,
+                                threads=threads,
+                                audiofile=src if reader.audio_found else None,
+                                audio_codec=audio_codec,
+                                ffmpeg_params=(["-map", "0:v", "-map", "1:a:0"] if reader.audio_found else []) + (ffmpeg_params or []),
+                            )
+                        writer.write_frames(video_array)
+                finally:
+                    if writer is not None:
+                        writer.close()
+
+        if not silent:
+            print(f"\033[92m Done...!! Saved at {dst}\033[0m")
+        return dst
+
+    def write_renditions(
+            renditions,
+            video_array,
+            video_fps,
+            audio_file=None,
+            resize_algo="bicubic",
+            silent=False,
+            progress_callback=None,
+    ):
+        """
+        Encode the same frames into several files (sizes, codecs, bitrates) with one ffmpeg process.
+        renditions: see `FFMPEG_MultiVideoWriter`, e.g.
+            [{"filename": "full.mp4"}, {"filename": "small.mp4", "size": (320, 180), "bitrate": "500k"}]
+        video_array: numpy array (n_frames, h, w, c), or an iterable of such chunks (e.g. a generator),
+            so frames are generated only once and never all held in memory.
+        audio_file: optional audio (or video) file muxed into every rendition.
+        """
+        chunks = [video_array] if hasattr(video_array, "shape") else iter(video_array)
+        chunks = iter(chunks)
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
+            raise ValueError("video_array is empty")
+
+        if not silent:
+            print("\033[92m Writing... \033[0m")
+        with FFMPEG_MultiVideoWriter(
+            renditions,
+            size=(first_chunk.shape[2], first_chunk.shape[1]),
+            fps=video_fps,
+            audiofile=audio_file,
+            resize_algo=resize_algo,
+            progress_callback=progress_callback,
+        ) as writer:
+            writer.write_frames_chunk(first_chunk, silent=silent)
+            for chunk in chunks:
+                writer.write_frames_chunk(chunk, silent=silent)
+        if not silent:
+            print(f"\033[92m Done...!! Saved at {writer.filename}\033[0m")
+        return [rendition["filename"] for rendition in renditions]
 
 if __name__ == "__main__":
     test_video = "/Users/kwonmingi/Codes/macocr/test_vid/vid12_xoobAzitHzs.mp4"
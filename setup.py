@@ -9,4 +9,7 @@ setup(
         "psutil",
         "tqdm"
     ],
+    entry_points={
+        "console_scripts": ["easy-video=easy_video.cli:main"],
+    },
 )
\ No newline at end of file
@@ -0,0 +1,22 @@
+import os
+import shutil
+import subprocess as sp
+import pytest
+from easy_video.ffmpeg_infos import FFMPEG_BINARY
+
+HAS_FFMPEG = bool(shutil.which(FFMPEG_BINARY) or os.path.isfile(FFMPEG_BINARY))
+
+@pytest.fixture(scope="session")
+def test_video(tmp_path_factory):
+    """3s 64x48 25fps video (keyframe every 10 frames) with a stereo 44.1kHz sine, generated with lavfi"""
+    if not HAS_FFMPEG:
+        pytest.skip("ffmpeg is not available")
+    filename = str(tmp_path_factory.mktemp("media") / "test.mp4")
+    sp.run([
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc2=size=64x48:rate=25:duration=3",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100:duration=3",
+        "-c:v", "libx264", "-g", "10", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-ac", "2", "-shortest", filename,
+    ], check=True)
+    return filename
@@ -0,0 +1,15 @@
+import asyncio
+import numpy as np
+from easy_video import EasyReader, AsyncEasyReader
+
+def test_get_video_array_audio_array(test_video):
+    async def read():
+        async with await AsyncEasyReader.open(test_video, load_audio=True) as reader:
+            return await reader.get_video_array_audio_array(5, 15)
+
+    result = asyncio.run(read())
+    assert isinstance(result, tuple)
+    with EasyReader(test_video, load_audio=True) as reader:
+        video_array, audio_array = reader.get_video_array_audio_array(5, 15)
+    assert np.array_equal(result[0], video_array)
+    assert np.array_equal(result[1], audio_array)
@@ -0,0 +1,79 @@
+import os
+import numpy as np
+import pytest
+from easy_video import EasyReader
+from easy_video.audio_cache import AudioCache
+
+VARIANTS = [(16000, 1), (48000, 2), (22050, 2)]
+
+def read_audio(filename, audio_fps, audio_nchannels):
+    with EasyReader(filename, load_video=False, load_audio=True, audio_fps=audio_fps, audio_nchannels=audio_nchannels) as reader:
+        return reader.get_audio_array()
+
+@pytest.fixture
+def runs(monkeypatch):
+    """(source, outputs) of every ffmpeg process of the cache"""
+    calls = []
+    run_ffmpeg = AudioCache.run_ffmpeg
+    def counting_run_ffmpeg(self, key, source, outputs):
+        calls.append((source, list(outputs)))
+        return run_ffmpeg(self, key, source, outputs)
+    monkeypatch.setattr(AudioCache, "run_ffmpeg", counting_run_ffmpeg)
+    return calls
+
+def test_variants_match_easy_reader(test_video, tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    for audio_fps, audio_nchannels in VARIANTS:
+        audio = cache.get_audio_array(test_video, audio_fps=audio_fps, audio_nchannels=audio_nchannels)
+        expected = read_audio(test_video, audio_fps, audio_nchannels)
+        assert audio.dtype == np.float32 and audio.shape == expected.shape
+        # EasyReader reads s16: equal within one least significant bit
+        np.testing.assert_allclose(audio, expected, rtol=0, atol=2.0 ** -15)
+
+def test_cold_prefetch_is_one_process(test_video, tmp_path, runs):
+    cache = AudioCache(str(tmp_path / "cache"))
+    meta = cache.prefetch(test_video, VARIANTS)
+    assert (meta["audio_fps"], meta["audio_nchannels"]) == (44100, 2)
+    assert len(runs) == 1
+    source, outputs = runs[0]
+    assert source[:2] == ["-i", test_video] # decodes the file
+    assert outputs == [(44100, 2)] + VARIANTS
+    for audio_fps, audio_nchannels in VARIANTS:
+        cache.get_audio_array(test_video, audio_fps=audio_fps, audio_nchannels=audio_nchannels)
+    assert len(runs) == 1
+
+def test_warm_variant_is_resampled_from_cache(test_video, tmp_path, runs):
+    cache = AudioCache(str(tmp_path / "cache"))
+    cache.get_audio_array(test_video)
+    audio = cache.get_audio_array(test_video, audio_fps=8000, audio_nchannels=1)
+    assert len(runs) == 2
+    source, outputs = runs[1]
+    # read from the cached float32 samples, not from the video
+    assert test_video not in source
+    assert source[source.index("-i") + 1] == cache.samples_path(cache.key(test_video), 44100, 2)
+    assert source[:2] == ["-f", "f32le"]
+    assert outputs == [(8000, 1)]
+    np.testing.assert_allclose(audio, read_audio(test_video, 8000, 1), rtol=0, atol=2.0 ** -15)
+
+def test_second_call_does_not_decode(test_video, tmp_path, runs):
+    cache = AudioCache(str(tmp_path / "cache"))
+    first = np.array(cache.get_audio_array(test_video, audio_fps=16000, audio_nchannels=1))
+    second = cache.get_audio_array(test_video, audio_fps=16000, audio_nchannels=1)
+    assert len(runs) == 1
+    np.testing.assert_array_equal(first, second)
+    # a new cache object on the same directory reuses the files
+    AudioCache(cache.cache_dir).get_audio_array(test_video, audio_fps=16000, audio_nchannels=1)
+    assert len(runs) == 1
+
+def test_touched_source_gets_a_new_key(test_video, tmp_path, runs):
+    source = tmp_path / "source.mp4"
+    source.write_bytes(open(test_video, "rb").read())
+    cache = AudioCache(str(tmp_path / "cache"))
+    key = cache.key(str(source))
+    cache.get_audio_array(str(source))
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.key(str(source)) != key
+    cache.get_audio_array(str(source))
+    assert len(runs) == 2
+    assert runs[1][0][:2] == ["-i", str(source)] # decoded again
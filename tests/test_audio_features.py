@@ -0,0 +1,67 @@
+import numpy as np
+from easy_video import EasyReader, AudioFeatureExtractor, mel_filterbank
+
+AUDIO_FPS = 16000
+
+def make_audio(seconds=2.0, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * AUDIO_FPS)) / AUDIO_FPS
+    tone = 0.5 * np.sin(2 * np.pi * 440 * t)[:, None] + 0.1 * rng.standard_normal((len(t), 2))
+    return tone.astype(np.float32)
+
+def extract(extractor, audio, push_sizes=None):
+    extractor.reset()
+    if push_sizes is None:
+        push_sizes = [len(audio)]
+    features, start = [], 0
+    for size in push_sizes:
+        features.append(extractor.push(audio[start:start + size]))
+        start += size
+    features.append(extractor.push(audio[start:]))
+    features.append(extractor.flush())
+    return np.concatenate(features)
+
+def test_push_sizes_do_not_change_the_features():
+    audio = make_audio()
+    extractor = AudioFeatureExtractor(AUDIO_FPS, video_fps=29.97, features_per_frame=4)
+    expected = extract(extractor, audio)
+    rng = np.random.default_rng(1)
+    for push_sizes in [[1] * 700, [0, 3, 0, 160, 2047, 1], list(rng.integers(0, 3000, size=20))]:
+        np.testing.assert_allclose(extract(extractor, audio, push_sizes), expected, rtol=1e-5, atol=1e-5)
+
+def test_features_match_a_direct_stft():
+    audio = make_audio()
+    video_fps, features_per_frame, n_fft, win_length = 29.97, 4, 512, 400
+    extractor = AudioFeatureExtractor(
+        AUDIO_FPS, video_fps, features_per_frame=features_per_frame, n_fft=n_fft, win_length=win_length
+    )
+    features = extract(extractor, audio, [1000] * 40)
+    mono = audio.mean(axis=1).astype(np.float64)
+    # zero padding around the audio, so every window can be cut out directly
+    padded = np.concatenate([np.zeros(n_fft), mono, np.zeros(n_fft)])
+    window = np.zeros(n_fft)
+    window[(n_fft - win_length) // 2:(n_fft - win_length) // 2 + win_length] = np.hanning(win_length + 1)[:-1]
+    mel_basis = mel_filterbank(AUDIO_FPS, n_fft, 80).astype(np.float64)
+
+    centers = [round(j * AUDIO_FPS / (video_fps * features_per_frame)) for j in range(len(features))]
+    assert centers[-1] < len(mono) <= round(len(features) * AUDIO_FPS / (video_fps * features_per_frame))
+    for j in [0, 1, 2, 3, 4, 117, 118, 119, len(features) - 1]:
+        start = centers[j] - n_fft // 2 + n_fft
+        spectrum = np.abs(np.fft.rfft(padded[start:start + n_fft] * window)) ** 2
+        expected = np.log(mel_basis @ spectrum + 1e-6)
+        np.testing.assert_allclose(features[j], expected, rtol=1e-4, atol=1e-3)
+
+def test_chunk_iterator_has_features_per_frame_rows(test_video):
+    features_per_frame = 4
+    with EasyReader(test_video, load_audio=True, audio_fps=AUDIO_FPS) as reader:
+        chunks = list(reader.video_array_audio_features_chunk_iterator(chunksize=16, features_per_frame=features_per_frame))
+    assert [len(video_array) for video_array, _ in chunks] == [16, 16, 16, 16, 11]
+    for video_array, features in chunks:
+        assert features.shape == (len(video_array) * features_per_frame, 80)
+
+    # the same features as one extractor over the whole audio
+    with EasyReader(test_video, load_video=False, load_audio=True, audio_fps=AUDIO_FPS) as reader:
+        audio = reader.get_audio_array()
+    extractor = AudioFeatureExtractor(AUDIO_FPS, 25, features_per_frame=features_per_frame)
+    expected = extract(extractor, audio)
+    np.testing.assert_allclose(np.concatenate([features for _, features in chunks]), expected[:75 * features_per_frame], rtol=1e-5, atol=1e-5)
@@ -0,0 +1,30 @@
+import numpy as np
+from easy_video import EasyReader
+
+# the resampler of an input seek starts without the previous samples
+WARMUP = 64
+
+def full_audio(test_video):
+    with EasyReader(test_video, load_video=False, load_audio=True, audio_fps=16000) as reader:
+        return reader.get_audio_array()
+
+def test_get_audio_range_after_seek(test_video):
+    full = full_audio(test_video)
+    with EasyReader(test_video, load_video=False, load_audio=True, audio_fps=16000) as reader:
+        reader.seek(audio_position=12000)
+        audio = reader.get_audio_range(1.0, 1.5)
+        assert audio.shape[0] == 8000
+        assert np.abs(audio[WARMUP:] - full[16000 + WARMUP:24000]).max() < 1e-3
+        # the position of the seek is kept
+        assert np.array_equal(reader.get_audios(100), full[12000:12100])
+
+def test_get_audio_range_after_from_state(test_video):
+    full = full_audio(test_video)
+    with EasyReader(test_video, load_video=False, load_audio=True, audio_fps=16000) as reader:
+        reader.get_audios(8000)
+        state = reader.state()
+    assert state["audio_position"] == 8000
+    with EasyReader.from_state(state) as reader:
+        audio = reader.get_audio_range(0.25, 0.5)
+        assert audio.shape[0] == 4000
+        assert np.abs(audio[WARMUP:] - full[4000 + WARMUP:8000]).max() < 1e-3
@@ -0,0 +1,88 @@
+import os
+import json
+import pytest
+from easy_video import cli
+
+@pytest.fixture
+def calls(monkeypatch):
+    """extract-audio jobs run by a fake EasyWriter.extract_audio, which writes the source bytes"""
+    calls = []
+
+    def extract_audio(src, dst, silent=False, **params):
+        calls.append(os.path.basename(src))
+        if os.path.basename(src).startswith("bad"):
+            raise ValueError("cannot decode")
+        with open(src, "rb") as f_src, open(dst, "wb") as f_dst:
+            f_dst.write(f_src.read())
+    monkeypatch.setattr(cli.EasyWriter, "extract_audio", staticmethod(extract_audio))
+    return calls
+
+def make_inputs(root, names):
+    os.makedirs(root, exist_ok=True)
+    for name in names:
+        with open(os.path.join(root, name), "wb") as f:
+            f.write(name.encode())
+    return root
+
+def run(inputs, out_dir, *extra):
+    return cli.main(["extract-audio", inputs, "--out-dir", out_dir] + list(extra))
+
+def test_resume_skips_the_done_jobs(tmp_path, calls):
+    inputs = make_inputs(str(tmp_path / "in"), ["a.mp4", "b.mp4"])
+    out_dir = str(tmp_path / "out")
+    assert run(inputs, out_dir) == 0
+    assert sorted(calls) == ["a.mp4", "b.mp4"]
+    assert sorted(os.listdir(out_dir)) == [cli.JOURNAL_NAME, "a.wav", "b.wav"] # no partial folder left
+
+    calls.clear()
+    assert run(inputs, out_dir) == 0
+    assert calls == []
+    assert run(inputs, out_dir, "--force") == 0
+    assert sorted(calls) == ["a.mp4", "b.mp4"]
+
+def test_changed_source_and_params_run_again(tmp_path, calls):
+    inputs = make_inputs(str(tmp_path / "in"), ["a.mp4", "b.mp4"])
+    out_dir = str(tmp_path / "out")
+    run(inputs, out_dir)
+    calls.clear()
+    with open(os.path.join(inputs, "a.mp4"), "ab") as f:
+        f.write(b"more")
+    run(inputs, out_dir)
+    assert calls == ["a.mp4"]
+
+    calls.clear()
+    run(inputs, out_dir, "--audio-fps", "16000")
+    assert sorted(calls) == ["a.mp4", "b.mp4"]
+
+def test_failed_and_cut_records_run_again(tmp_path, calls):
+    inputs = make_inputs(str(tmp_path / "in"), ["a.mp4", "bad.mp4"])
+    out_dir = str(tmp_path / "out")
+    assert run(inputs, out_dir) == 1
+    journal_path = os.path.join(out_dir, cli.JOURNAL_NAME)
+    with open(journal_path) as f:
+        records = {record["src"]: record for record in map(json.loads, f)}
+    assert records[os.path.join(inputs, "bad.mp4")]["status"] == "failed"
+    assert not os.path.exists(os.path.join(out_dir, "bad.wav"))
+    assert not os.path.exists(os.path.join(out_dir, cli.PARTIAL_DIR))
+
+    calls.clear()
+    run(inputs, out_dir)
+    assert calls == ["bad.mp4"]
+
+    # a line cut by a kill is ignored, the other jobs are still done
+    with open(journal_path, "a") as f:
+        f.write('{"key": "extract-audio:')
+    os.remove(os.path.join(out_dir, "a.wav"))
+    calls.clear()
+    run(inputs, out_dir)
+    assert sorted(calls) == ["a.mp4", "bad.mp4"]
+
+def test_journal_last_record_wins(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = cli.JobJournal(path)
+    journal.write({"key": "k", "status": "failed"})
+    journal.write({"key": "k", "status": "done"})
+    journal.close()
+    journal = cli.JobJournal(path)
+    assert journal.records["k"]["status"] == "done"
+    journal.close()
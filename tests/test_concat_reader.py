@@ -0,0 +1,48 @@
+import subprocess as sp
+import numpy as np
+import pytest
+from easy_video import EasyReader
+from easy_video.concat_reader import EasyConcatReader, probe_clips
+from easy_video.ffmpeg_infos import FFMPEG_BINARY
+
+def make_clip(filename, size="64x48", duration=1, pattern="testsrc2"):
+    sp.run([
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "%s=size=%s:rate=25:duration=%s" % (pattern, size, duration),
+        "-c:v", "libx264", "-g", "10", "-pix_fmt", "yuv420p", str(filename),
+    ], check=True)
+    return str(filename)
+
+@pytest.fixture
+def clips(test_video, tmp_path):
+    return [
+        test_video,
+        make_clip(tmp_path / "a.mp4", duration=1.2, pattern="testsrc"),
+        make_clip(tmp_path / "b.mp4", duration=0.4),
+    ]
+
+def read_separately(filename):
+    with EasyReader(filename, load_audio=False) as reader:
+        return reader.get_video_array()
+
+def test_group_matches_separate_reads(clips):
+    with EasyConcatReader(clips) as reader:
+        assert reader.groups == [[0, 1, 2]]
+        results = list(reader)
+    assert [filename for filename, _ in results] == clips
+    assert [len(video_array) for _, video_array in results] == [75, 30, 10]
+    for filename, video_array in results:
+        np.testing.assert_array_equal(video_array, read_separately(filename))
+
+def test_mixed_sizes_fall_back(clips, tmp_path):
+    small = make_clip(tmp_path / "small.mp4", size="32x24", duration=0.8)
+    filenames = clips[:2] + [small] + clips[2:]
+    assert probe_clips([small])[0]["size"] == (32, 24)
+    with EasyConcatReader(filenames) as reader:
+        # the 32x24 clip breaks the run: read on its own, its neighbours too
+        assert reader.groups == [[0, 1], [2], [3]]
+        results = list(reader)
+    assert [filename for filename, _ in results] == filenames
+    assert results[2][1].shape == (20, 24, 32, 3)
+    for filename, video_array in results:
+        np.testing.assert_array_equal(video_array, read_separately(filename))
@@ -0,0 +1,24 @@
+import os
+import numpy as np
+import easy_video.ffmpeg_reader
+from easy_video import EasyReader
+
+def test_audiofilename_equal_to_filename_is_not_probed_again(test_video, monkeypatch):
+    calls = []
+    parse_infos = easy_video.ffmpeg_reader.ffmpeg_parse_infos
+    monkeypatch.setattr(easy_video.ffmpeg_reader, "ffmpeg_parse_infos", lambda *args, **kwargs: calls.append(args[0]) or parse_infos(*args, **kwargs))
+    # an equal string, not the same object
+    with EasyReader(test_video, audiofilename="".join(test_video), load_audio=True):
+        pass
+    assert calls == [test_video]
+
+def test_close_removes_the_spilled_memory_input(test_video):
+    with open(test_video, "rb") as f:
+        reader = EasyReader(f.read())
+    spilled = reader.filename.path
+    assert spilled is not None and os.path.exists(spilled) # the index of the mp4 is at the end
+    first = reader.get_video_array(0, 10)
+    # going back restarts ffmpeg on the same temporary file
+    assert np.array_equal(reader.get_video_array(0, 10), first)
+    reader.close()
+    assert not os.path.exists(spilled)
@@ -0,0 +1,21 @@
+import io
+import pytest
+from easy_video.ffmpeg_writer import read_progress
+from easy_video.stats import WriterStats
+
+def progress_stream(n_blocks):
+    return io.BytesIO(b"".join(b"frame=%d\nfps=25.0\nprogress=continue\n" % (inx + 1) for inx in range(n_blocks)))
+
+def test_progress_callback_errors_do_not_stop_the_reader():
+    stats, frames = WriterStats(25), []
+
+    def callback(stats):
+        frames.append(stats.frame)
+        raise ValueError("broken callback")
+
+    stream = progress_stream(3)
+    with pytest.warns(UserWarning, match="broken callback") as record:
+        read_progress(stream, stats, callback)
+    assert len(record) == 1
+    assert frames == [1, 2, 3] and stats.frame == 3
+    assert stream.closed
@@ -0,0 +1,114 @@
+import sys
+import time
+import threading
+import subprocess as sp
+import pytest
+from easy_video.governor import FFMPEGGovernor
+
+def test_contention_never_exceeds_max_processes():
+    governor = FFMPEGGovernor(max_processes=3)
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def work():
+        for _ in range(5):
+            governor.acquire()
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.002)
+            with lock:
+                running[0] -= 1
+            governor.release()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    stats = governor.stats()
+    assert peak[0] <= 3
+    assert stats["n_running"] == 0 and stats["n_waiting"] == 0 and stats["n_acquired"] == 40
+
+def test_acquire_timeout():
+    governor = FFMPEGGovernor(max_processes=2, acquire_timeout=0.05)
+    governor.acquire()
+    governor.acquire()
+    with pytest.raises(TimeoutError):
+        governor.acquire()
+    assert governor.stats()["n_waiting"] == 0
+    governor.release()
+    assert governor.acquire() < 0.05
+
+def test_a_waiting_thread_gets_the_released_slot():
+    governor = FFMPEGGovernor(max_processes=2)
+    governor.acquire()
+    governor.acquire()
+    waited = []
+    thread = threading.Thread(target=lambda: waited.append(governor.acquire()))
+    thread.start()
+    time.sleep(0.05)
+    assert not waited and governor.stats()["n_waiting"] == 1
+    governor.release()
+    thread.join(5)
+    assert waited and waited[0] >= 0.04
+
+def python_cmd(code):
+    return [sys.executable, "-c", code]
+
+def test_probe_does_not_wait_for_the_slots_of_its_own_thread():
+    governor = FFMPEGGovernor(max_processes=2, acquire_timeout=0.05)
+    params = {"stdout": sp.PIPE, "stderr": sp.PIPE, "stdin": sp.DEVNULL}
+    procs = [governor.popen(python_cmd("import time; time.sleep(10)"), params)[0] for _ in range(2)]
+    try:
+        # e.g. a thread with an open reader opening a second one
+        proc, output, _ = governor.communicate(python_cmd("print('probe')"), params, probe=True)
+        assert output.strip() == b"probe"
+        # another thread waits, the slots are not its own
+        errors = []
+        def other():
+            try:
+                governor.communicate(python_cmd("pass"), params, probe=True)
+            except TimeoutError as err:
+                errors.append(err)
+        thread = threading.Thread(target=other)
+        thread.start()
+        thread.join(5)
+        assert errors
+    finally:
+        for proc in procs:
+            proc.kill()
+            proc.wait()
+            governor.release_proc(proc)
+    stats = governor.stats()
+    assert stats["n_running"] == 0 and stats["n_registered"] == 0
+
+def test_communicate_releases_the_slot_on_errors():
+    governor = FFMPEGGovernor(max_processes=2)
+    params = {"stdout": sp.PIPE, "stderr": sp.PIPE, "stdin": sp.PIPE}
+    with pytest.raises(TypeError):
+        governor.communicate(python_cmd("pass"), params, input="not bytes")
+    with pytest.raises(FileNotFoundError):
+        governor.communicate(["/nonexistent/ffmpeg"], params)
+    stats = governor.stats()
+    assert stats["n_running"] == 0 and stats["n_registered"] == 0
+
+def test_decodes_are_not_probes(test_video):
+    from easy_video import EasyReader
+    from easy_video.ffmpeg_infos import ffmpeg_parse_infos
+    from easy_video.governor import get_ffmpeg_governor, set_ffmpeg_process_limit
+
+    governor = get_ffmpeg_governor()
+    previous = (governor.max_processes, governor.core_budget, governor.acquire_timeout)
+    set_ffmpeg_process_limit(max_processes=2, acquire_timeout=0.2)
+    try:
+        # video and audio: the reader holds both slots in this thread
+        with EasyReader(test_video, load_audio=True) as reader:
+            assert ffmpeg_parse_infos(test_video, decode_file=False)["video_found"]
+            with pytest.raises(TimeoutError):
+                ffmpeg_parse_infos(test_video, decode_file=True)
+            with pytest.raises(TimeoutError):
+                reader.count_frames()
+    finally:
+        set_ffmpeg_process_limit(*previous)
+    assert governor.stats()["n_running"] == 0
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from easy_video import EasyReader
+from easy_video.lazy_array import LazyVideoArray
+
+class FakeReader:
+    """Frames whose pixels are their index, no ffmpeg"""
+    target_video_fps = None
+    h, w, depth = 2, 3, 3
+    filename = "fake.mp4"
+
+    def __init__(self, n_frames=10):
+        self.total = n_frames
+        self.n_frames = n_frames + 1 # an estimate, like FFMPEGReader
+        self.video_proc = None
+        self.video_position = 0
+        self.n_starts = 0
+
+    def frames(self, start, stop):
+        return np.broadcast_to(
+            np.arange(start, stop, dtype=np.uint8)[:, None, None, None], (stop - start, self.h, self.w, self.depth)
+        ).copy()
+
+    def keyframe_seek_point(self, index):
+        return None, 0
+
+    def start_video(self, seek_time=None, position=0):
+        self.video_proc = object()
+        self.video_position = position
+        self.n_starts += 1
+
+    def throw_away_video_frames(self, n_frames):
+        self.video_position += n_frames
+
+    def get_frames(self, n_frames):
+        stop = min(self.video_position + n_frames, self.total)
+        frames = self.frames(min(self.video_position, stop), stop)
+        self.video_position = stop
+        return frames
+
+    def count_frames(self):
+        return self.total
+
+def values(frames):
+    """index of each frame of a FakeReader"""
+    return np.asarray(frames)[..., 0, 0, 0].tolist()
+
+@pytest.mark.parametrize("key, expected", [
+    (3, 3),
+    (-1, 9),
+    (slice(2, 5), [2, 3, 4]),
+    (slice(None, None, 3), [0, 3, 6, 9]),
+    (slice(8, None), [8, 9]),
+    (slice(-3, None), [7, 8, 9]),
+    (slice(5, 20), [5, 6, 7, 8, 9]),
+    ([4, 1, 4, -1], [4, 1, 4, 9]),
+    (np.arange(10) % 4 == 0, [0, 4, 8]),
+])
+def test_indexing(key, expected):
+    frames = LazyVideoArray(FakeReader())
+    assert values(frames[key]) == expected
+
+def test_following_axes_and_shape():
+    frames = LazyVideoArray(FakeReader())
+    assert frames[:4, 0, ::2].shape == (4, 2, 3)
+    assert frames[..., 1].shape == (10, 2, 3)
+    assert frames.shape == (10, 2, 3, 3) and len(frames) == 10 and frames.ndim == 4
+
+def test_start_end():
+    frames = LazyVideoArray(FakeReader(), start=3, end=7)
+    assert len(frames) == 4
+    assert values(frames) == [3, 4, 5, 6]
+    assert values(frames[-1:]) == [6]
+    with pytest.raises(IndexError):
+        frames[4]
+
+def test_out_of_bounds():
+    frames = LazyVideoArray(FakeReader())
+    with pytest.raises(IndexError):
+        frames[10]
+    with pytest.raises(IndexError):
+        frames[[1, 12]]
+    with pytest.raises(IndexError):
+        frames[np.ones(3, dtype=bool)]
+
+def test_length_without_counting():
+    reader = FakeReader()
+    reader.count_frames = None # not called
+    frames = LazyVideoArray(reader)
+    assert values(frames[6:11]) == [6, 7, 8, 9] # reads past the end: the length is known
+    assert len(frames) == 10
+
+def test_cache_and_restarts():
+    reader = FakeReader(100)
+    frames = LazyVideoArray(reader, cache_size=8)
+    frames[10:20]
+    assert reader.n_starts == 1
+    assert values(frames[[15, 19, 12]]) == [15, 19, 12] # cached
+    frames[20:25] # forward, same process
+    assert reader.n_starts == 1
+    frames[5] # before the position: restart
+    assert reader.n_starts == 2
+    assert values(frames) == list(range(100))
+
+@pytest.mark.parametrize("start, end", [(-1, 5), (5, 2), (3, -2)])
+def test_invalid_range(start, end):
+    with pytest.raises(AssertionError):
+        LazyVideoArray(FakeReader(), start=start, end=end)
+
+def test_lazy_video_array_has_its_own_reader(test_video):
+    with EasyReader(test_video, collect_stats=True) as reader:
+        reader.get_frames(5)
+        with reader.lazy_video_array(start=10, end=20) as frames:
+            assert frames.reader is not reader and frames.reader.stats is not reader.stats
+            assert frames.reader.video_proc is None
+            clip = frames[2:5]
+        assert reader.video_proc is not None and reader.video_position == 5
+        assert np.array_equal(reader.get_frames(10)[7:], clip)
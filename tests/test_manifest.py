@@ -0,0 +1,73 @@
+import os
+import shutil
+import numpy as np
+import pytest
+import easy_video.manifest
+from easy_video.manifest import VideoManifest, MANIFEST_NAME, manifest_dtype, empty_row
+from easy_video.ffmpeg_infos import ffmpeg_parse_infos
+
+def video_row(path, **fields):
+    row = empty_row()
+    row.update(
+        path=path.encode("utf8"), size=100, mtime_ns=1, probed=True, video_found=True, video_stream=0,
+        width=64, height=48, fps=25.0, rotation=0, video_codec=b"h264", pix_fmt=b"yuv420p",
+    )
+    row.update(fields)
+    return row
+
+def save_manifest(root, rows):
+    dtype = manifest_dtype(max(len(row["path"]) for row in rows))
+    table = np.zeros(len(rows), dtype=dtype)
+    for inx, row in enumerate(sorted(rows, key=lambda row: row["path"])):
+        table[inx] = tuple(row[name] for name in dtype.names)
+    np.save(os.path.join(root, MANIFEST_NAME), table)
+    return VideoManifest(str(root))
+
+def test_infos_without_duration(tmp_path):
+    manifest = save_manifest(tmp_path, [
+        video_row("counted.mp4", n_frames=50),
+        video_row("unknown.mp4"),
+        video_row("known.mp4", duration=3.0, n_frames=75),
+    ])
+    infos = manifest.infos(manifest.path(0))
+    assert infos["duration"] is None
+    assert infos["video_n_frames"] == 50 and infos["video_duration"] == 2.0
+    infos = manifest.infos(str(tmp_path / "unknown.mp4"))
+    assert infos["video_n_frames"] == 1 and infos["video_duration"] is None
+    infos = manifest.infos(str(tmp_path / "known.mp4"))
+    assert infos["video_n_frames"] == 75 and infos["video_duration"] == 3.0
+
+def test_unchanged_rows_round_trip_through_build(tmp_path, monkeypatch):
+    rows = []
+    for name, n_frames in (("b.mp4", 50), ("a/é.mp4", 75)):
+        filename = tmp_path / name
+        filename.parent.mkdir(exist_ok=True)
+        filename.write_bytes(b"x" * n_frames)
+        stat = os.stat(filename)
+        rows.append(video_row(name, size=stat.st_size, mtime_ns=stat.st_mtime_ns, duration=n_frames / 25, n_frames=n_frames))
+    saved = save_manifest(tmp_path, rows).table.copy()
+
+    def probe_file(filename, count_frames=True):
+        raise AssertionError(f"{filename} is unchanged, it must not be probed")
+    monkeypatch.setattr(easy_video.manifest, "probe_file", probe_file)
+    manifest = VideoManifest.build(str(tmp_path), silent=True)
+    assert manifest.table.dtype == saved.dtype
+    assert all(
+        np.array_equal(manifest.table[name], saved[name], equal_nan=saved.dtype[name].kind == "f")
+        for name in saved.dtype.names
+    )
+    assert manifest.paths() == [str(tmp_path / "a/é.mp4"), str(tmp_path / "b.mp4")]
+    assert manifest.index(str(tmp_path / "b.mp4")) == 1
+    assert list(manifest["n_frames"]) == [75, 50]
+
+def test_infos_match_ffmpeg_parse_infos(test_video, tmp_path):
+    shutil.copy(test_video, tmp_path / "test.mp4")
+    manifest = VideoManifest.build(str(tmp_path), silent=True)
+    parsed = ffmpeg_parse_infos(str(tmp_path / "test.mp4"))
+    infos = manifest.infos(0)
+    for key, value in infos.items():
+        if key not in ("metadata", "inputs"):
+            assert value == pytest.approx(parsed[key]), key
+    assert manifest["n_frames"][0] == 75
+    with manifest.reader(0) as reader:
+        assert len(reader.get_video_array()) == 75
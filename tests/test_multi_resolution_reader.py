@@ -0,0 +1,44 @@
+import json
+import numpy as np
+import pytest
+from easy_video import EasyMultiResolutionReader
+
+RESOLUTIONS = [(32, 24), (16, 12)]
+
+def full_arrays(test_video):
+    with EasyMultiResolutionReader(test_video, RESOLUTIONS) as reader:
+        return reader.get_video_array()
+
+@pytest.mark.parametrize("random_index", [3, 20, 60])
+def test_random_frame(test_video, monkeypatch, random_index):
+    full = full_arrays(test_video)
+    monkeypatch.setattr("easy_video.video_reader.random.randint", lambda a, b: random_index)
+    with EasyMultiResolutionReader(test_video, RESOLUTIONS) as reader:
+        video_arrays, random_frames = reader.get_video_array_random_frame(10, 30)
+    for array, frame, expected in zip(video_arrays, random_frames, full):
+        assert np.array_equal(array, expected[10:30])
+        assert np.array_equal(frame, expected[random_index:random_index + 1])
+
+def test_state_resume(test_video):
+    full = full_arrays(test_video)
+    with EasyMultiResolutionReader(test_video, RESOLUTIONS) as reader:
+        reader.get_frames(23)
+        state = json.loads(json.dumps(reader.state()))
+    assert state["video_position"] == 23
+    with EasyMultiResolutionReader.from_state(state) as reader:
+        assert reader.video_seek_time is not None # seeked to the keyframe at frame 20
+        chunks = list(reader.video_array_chunk_iterator(chunksize=16))
+    for i, expected in enumerate(full):
+        assert np.array_equal(np.concatenate([chunk[i] for chunk in chunks]), expected[23:])
+
+@pytest.mark.parametrize("window, stride", [(16, 5), (8, 12)])
+def test_window_iterator(test_video, window, stride):
+    full = full_arrays(test_video)
+    with EasyMultiResolutionReader(test_video, RESOLUTIONS, load_audio=True) as reader:
+        windows = list(reader.video_array_window_iterator(window=window, stride=stride, with_audio=True, copy=True))
+        samples_per_frame = reader.audio_fps / reader.video_fps
+    assert len(windows) == (len(full[0]) - window) // stride + 1
+    for inx, (video_arrays, audio) in enumerate(windows):
+        for array, expected in zip(video_arrays, full):
+            assert np.array_equal(array, expected[inx * stride:inx * stride + window])
+        assert len(audio) == round(window * samples_per_frame)
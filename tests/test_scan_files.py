@@ -0,0 +1,60 @@
+import os
+from easy_video import mp4list, wavlist
+from easy_video.utils import scan_files
+
+TREE = [
+    "a.mp4", "b.wav", "notes.txt",
+    "sub1/c.mp4", "sub1/deep/d.mp4", "sub1/deep/e.MP4",
+    "sub2/f.mp4", "sub2/g.wav",
+    ".hidden/h.mp4", "sub2/.cache/i.mp4",
+    ".j.mp4", # hidden files are listed, only hidden folders are skipped
+]
+
+def make_tree(root):
+    for path in TREE:
+        filename = os.path.join(root, path)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        open(filename, "wb").close()
+    return str(root)
+
+def walk_list(root, ext):
+    """the os.walk listing mp4list used to be"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+        found.extend(os.path.join(dirpath, name) for name in filenames if name.endswith(ext))
+    return found
+
+def relative(root, filenames):
+    return sorted(os.path.relpath(filename, root) for filename in filenames)
+
+def test_mp4list_is_the_os_walk_order(tmp_path):
+    root = make_tree(tmp_path)
+    assert mp4list(root) == walk_list(root, ".mp4")
+    assert all(mp4list(root) == mp4list(root) for _ in range(10))
+    assert wavlist(root) == walk_list(root, ".wav")
+
+def test_hidden_folders(tmp_path):
+    root = make_tree(tmp_path)
+    assert relative(root, mp4list(root)) == [".j.mp4", "a.mp4", "sub1/c.mp4", "sub1/deep/d.mp4", "sub2/f.mp4"]
+    hidden = relative(root, mp4list(root, pass_hidden_folders=False))
+    assert ".hidden/h.mp4" in hidden and "sub2/.cache/i.mp4" in hidden
+
+def test_scan_files_parallel_finds_the_same_files(tmp_path):
+    root = make_tree(tmp_path)
+    for workers in (1, 4):
+        assert relative(root, scan_files(root, exts=("mp4", "wav"), workers=workers)) == relative(root, walk_list(root, (".mp4", ".wav")))
+
+def test_scan_files_sort_and_single_file(tmp_path):
+    root = make_tree(tmp_path)
+    assert list(scan_files(root, sort=True)) == sorted(list(scan_files(root, sort=True)))
+    assert list(scan_files(os.path.join(root, "a.mp4"))) == [os.path.join(root, "a.mp4")]
+
+def test_partial_folder_of_the_cli_is_not_listed(tmp_path):
+    from easy_video.cli import partial_filename
+    root = make_tree(tmp_path)
+    partial = partial_filename(os.path.join(root, "sub1", "out.mp4"))
+    os.makedirs(os.path.dirname(partial))
+    open(partial, "wb").close()
+    assert partial not in mp4list(root)
+    assert partial not in list(scan_files(root, workers=4))
@@ -0,0 +1,26 @@
+import warnings
+import numpy as np
+import pytest
+from easy_video import EasyReader, EasyWriter
+from easy_video.ffmpeg_infos import ffmpeg_video_packets
+
+def video_array(filename):
+    with EasyReader(filename, load_audio=False) as reader:
+        return reader.get_video_array().astype(int)
+
+def test_smart_cut_joins(test_video, tmp_path):
+    output = str(tmp_path / "cut.mp4")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")  # no fallback to the full re-encode
+        EasyWriter.trim(test_video, output, 0.3, 2.5, accurate=True, silent=True)
+    assert len(ffmpeg_video_packets(output)) == 56
+    source, cut = video_array(test_video)[7:63], video_array(output)
+    assert cut.shape == source.shape
+    assert np.abs(cut - source).mean(axis=(1, 2, 3)).max() < 8
+
+def test_smart_cut_falls_back(test_video, tmp_path):
+    output = str(tmp_path / "cut.mp4")
+    with pytest.warns(UserWarning, match="re-encoding the whole range"):
+        EasyWriter.trim(test_video, output, 0.3, 2.5, accurate=True, video_codec="mpeg4", silent=True)
+    # the encoder may drop the frame overlapping the start
+    assert len(ffmpeg_video_packets(output)) in (55, 56)
@@ -0,0 +1,59 @@
+import subprocess as sp
+import numpy as np
+import pytest
+from easy_video import EasyReader
+from easy_video.sync_reader import EasySyncReader
+from easy_video.ffmpeg_infos import FFMPEG_BINARY
+
+def make_clip(filename, rate, duration):
+    sp.run([
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc=size=64x48:rate=%s:duration=%s" % (rate, duration),
+        "-c:v", "libx264", "-g", "10", "-pix_fmt", "yuv420p", str(filename),
+    ], check=True)
+    return str(filename)
+
+@pytest.fixture
+def views(test_video, tmp_path):
+    # 75 frames at 25 fps, 100 frames at 50 fps (50 at 25 fps), 40 frames at 25 fps
+    return [test_video, make_clip(tmp_path / "fast.mp4", 50, 2), make_clip(tmp_path / "short.mp4", 25, 1.6)]
+
+def read_view(filename, **kwargs):
+    with EasyReader(filename, load_audio=False, **kwargs) as reader:
+        return reader.get_video_array()
+
+def test_views_are_stacked_in_lockstep(views):
+    with EasySyncReader(views, align_start=False) as reader:
+        assert reader.video_fps == 25
+        chunks = list(reader.video_array_chunk_iterator(chunksize=16, copy=True))
+    # iteration stops at the end of the shortest view (40 frames)
+    assert [chunk.shape for chunk in chunks] == [(3, 16, 48, 64, 3), (3, 16, 48, 64, 3), (3, 8, 48, 64, 3)]
+    video_array = np.concatenate(chunks, axis=1)
+    np.testing.assert_array_equal(video_array[0], read_view(views[0])[:40])
+    # the 50 fps view is resampled to 25 fps by ffmpeg
+    np.testing.assert_array_equal(video_array[1], read_view(views[1], target_video_fps=25)[:40])
+    np.testing.assert_array_equal(video_array[2], read_view(views[2]))
+
+def test_get_video_array(views):
+    with EasySyncReader(views, align_start=False) as reader:
+        assert reader.get_video_array().shape == (3, 40, 48, 64, 3)
+        assert reader.get_video_array().shape == (3, 0, 48, 64, 3)
+
+def test_buffer_is_reused_unless_copy(views):
+    with EasySyncReader(views, align_start=False) as reader:
+        chunks = reader.video_array_chunk_iterator(chunksize=8)
+        first = next(chunks)
+        first_values = first.copy()
+        second = next(chunks)
+        # the yielded array is a view of the buffer, overwritten by the next chunk
+        assert np.shares_memory(first, second)
+        np.testing.assert_array_equal(first, second)
+        assert not np.array_equal(first, first_values)
+
+    with EasySyncReader(views, align_start=False) as reader:
+        chunks = reader.video_array_chunk_iterator(chunksize=8, copy=True)
+        first = next(chunks)
+        first_values = first.copy()
+        second = next(chunks)
+        assert not np.shares_memory(first, second)
+        np.testing.assert_array_equal(first, first_values)
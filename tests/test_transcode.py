@@ -0,0 +1,17 @@
+import pytest
+from easy_video import EasyReader, EasyWriter
+from easy_video.ffmpeg_infos import ffmpeg_parse_infos
+
+@pytest.mark.parametrize("audio_codec, expected", [("copy", "aac"), ("libopus", "opus"), ("flac", "flac")])
+def test_audio_codec_with_video_array_fn(test_video, tmp_path, audio_codec, expected):
+    dst = str(tmp_path / "out.mkv")
+    EasyWriter.transcode(
+        test_video, dst, video_array_fn=lambda video_array: 255 - video_array,
+        audio_codec=audio_codec, chunksize=16, silent=True,
+    )
+    infos = ffmpeg_parse_infos(dst, decode_file=False)
+    assert infos["audio_codec_name"] == expected
+    with EasyReader(test_video) as source, EasyReader(dst) as reader:
+        video, expected_video = reader.get_video_array(), source.get_video_array()
+    # copied aac keeps its priming samples: the mkv can last one frame longer
+    assert video.shape[1:] == expected_video.shape[1:] and len(video) >= len(expected_video)
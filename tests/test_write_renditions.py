@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from easy_video import EasyReader, EasyWriter
+
+def frame_chunks(n_chunks, chunksize=10):
+    for inx in range(n_chunks):
+        chunk = np.zeros((chunksize, 48, 64, 3), dtype=np.uint8)
+        chunk[:] = np.linspace(0, 255, chunksize, dtype=np.uint8)[:, None, None, None]
+        chunk[:, :, : 8 * (inx + 1)] = 255
+        yield chunk
+
+def test_two_sizes_from_a_generator(test_video, tmp_path):
+    renditions = [
+        {"filename": str(tmp_path / "full.mp4")},
+        {"filename": str(tmp_path / "small.mp4"), "size": (32, 24), "bitrate": "100k"},
+    ]
+    filenames = EasyWriter.write_renditions(
+        renditions, frame_chunks(4), video_fps=25, audio_file=test_video, silent=True
+    )
+    assert filenames == [rendition["filename"] for rendition in renditions]
+    for filename, size in zip(filenames, [(64, 48), (32, 24)]):
+        with EasyReader(filename, load_audio=False) as reader:
+            assert tuple(reader.size) == size
+            assert reader.count_frames() == 40
+            assert reader.get_video_array().shape == (40, size[1], size[0], 3)
+            assert reader.audio_found
+
+def test_empty_video_array(tmp_path):
+    with pytest.raises(ValueError, match="video_array is empty"):
+        EasyWriter.write_renditions([{"filename": str(tmp_path / "out.mp4")}], frame_chunks(0), video_fps=25, silent=True)
@@ -0,0 +1,60 @@
+import io
+import os
+import numpy as np
+from easy_video import EasyReader, EasyWriter
+from easy_video.concat_reader import probe_clips
+
+def make_arrays(n_frames=50, video_fps=25, audio_fps=16000):
+    video_array = np.zeros((n_frames, 48, 64, 3), dtype=np.uint8)
+    video_array[:] = np.linspace(0, 255, n_frames, dtype=np.uint8)[:, None, None, None]
+    t = np.arange(n_frames * audio_fps // video_fps) / audio_fps
+    audio_array = 0.5 * np.sin(2 * np.pi * 440 * t)[:, None]
+    return video_array, audio_array
+
+def rms(audio):
+    return np.sqrt(np.mean(audio[4000:-4000] ** 2))
+
+def check_output(filename, expected_audio, n_frames=50):
+    # video packets: the aac priming can make the container (and the constant rate decode) a bit longer
+    assert probe_clips([filename])[0]["n_frames"] == n_frames
+    with EasyReader(filename, load_video=False, load_audio=True, audio_fps=16000, audio_nchannels=1) as reader:
+        audio = reader.get_audio_array()
+    assert abs(len(audio) - len(expected_audio)) < 0.15 * 16000 # aac priming and padding
+    # the sine survives the aac encoding
+    assert abs(rms(audio) - rms(expected_audio)) < 0.02
+
+def test_video_and_audio_arrays_to_a_file(test_video, tmp_path):
+    video_array, audio_array = make_arrays()
+    filename = str(tmp_path / "out.mp4")
+    EasyWriter.writefile(filename, video_array=video_array, audio_array=audio_array, video_fps=25, audio_fps=16000, silent=True)
+    # the audio went through a pipe, no temporary wav next to the output
+    assert os.listdir(tmp_path) == ["out.mp4"]
+    check_output(filename, audio_array)
+
+def test_video_and_audio_arrays_to_a_stream(test_video, tmp_path, monkeypatch):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    video_array, audio_array = make_arrays()
+    data = EasyWriter.writefile(
+        None, video_array=video_array, audio_array=audio_array, video_fps=25, audio_fps=16000, format="mkv", silent=True
+    )
+    assert os.listdir(tmp_path) == []
+    stream = io.BytesIO()
+    EasyWriter.writefile(
+        stream, video_array=video_array, audio_array=audio_array, video_fps=25, audio_fps=16000, format="mkv", silent=True
+    )
+    assert os.listdir(tmp_path) == []
+    for inx, encoded in enumerate([data, stream.getvalue()]):
+        (tmp_path / f"out_{inx}.mkv").write_bytes(encoded)
+        check_output(str(tmp_path / f"out_{inx}.mkv"), audio_array)
+
+def test_audio_from_an_mp4(test_video, tmp_path):
+    video_array, _ = make_arrays()
+    filename = str(tmp_path / "out.mp4")
+    EasyWriter.writefile(filename, video_array=video_array, audio_array=test_video, video_fps=25, audio_fps=44100, silent=True)
+    assert os.listdir(tmp_path) == ["out.mp4"]
+    # the frames of video_array, not the video of the mp4; its 3s of audio
+    with EasyReader(filename, load_audio=False) as reader:
+        assert tuple(reader.size) == (64, 48)
+        np.testing.assert_allclose(reader.get_frames(1)[0].mean(), 0, atol=2)
+    with EasyReader(test_video, load_video=False, load_audio=True, audio_fps=16000, audio_nchannels=1) as reader:
+        check_output(filename, reader.get_audio_array())